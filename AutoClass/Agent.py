@@ -1,55 +1,206 @@
-import langchain, langchain_openai
-from langchain_community.chat_models import ChatOpenAI
-from langchain.schema import HumanMessage
-from langchain.agents import initialize_agent, AgentType
-from langchain_core.prompts import PromptTemplate
 import inspect
-import ast
+import asyncio
+import contextvars
+import functools
+import json
+import copy
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-import inspect
-import re
+from AutoClass.scheduler import DependencyGraph, PipelineScheduler, iter_references, resolve_inputs, run_awaitable
+from AutoClass.process_pool import ProcessStepRunner, EXECUTION_POLICIES
+from AutoClass.plan_cache import PlanCache, catalog_fingerprint, normalize_query
+from AutoClass.retrieval import MethodIndex
+from AutoClass.introspection import batch_variants, extract_class_metadata, parse_docstring
+from AutoClass.prompt_catalog import PromptCatalog, count_tokens
+from AutoClass.prepared import PreparedPipeline
+from AutoClass.memo import ResultCache, stable_hash
+from AutoClass.streaming import PlanStreamParser
+from AutoClass.instrumentation import Instrumentation, usage_tokens
+from AutoClass.llm import shared_llm
+from AutoClass.context import ResultStore, RunContext
+from AutoClass.session import AgentSession
+from AutoClass.plan_parser import PlanParseError, PlanValidator, extract_structure, merge_repaired
+from AutoClass.results import SpillStore, Summary, to_handles
+from AutoClass.journal import RunJournal
+from AutoClass.fanout import chunk_size_for, fan_out, item_count, mapped_params, run_chunk, split_chunks
+
+CATALOG_SNAPSHOT_VERSION = 1
 
 class Agent:
-    def __init__(self, model_name: str = "gpt-4o-mini", temperature: float = 0.7):
-        self.llm = ChatOpenAI(model_name=model_name, temperature=temperature)
+    def __init__(self, model_name: str = "gpt-4o-mini", temperature: float = 0.7, max_workers: int = None,
+                 process_workers: int = None, plan_cache=None, shortlist_k: int = None,
+                 shortlist_threshold: float = 0.0, planner: str = "two_step", prompt_token_budget: int = None,
+                 compact_prompts: bool = False, result_cache=None, instrumentation=None, logger=None,
+                 llm_retries: int = 0, llm=None, persist=None, result_store=None, plan_repair_attempts: int = 1,
+                 spill_threshold: int = None, spill_dir: str = None, map_chunk_size: int = None,
+                 journal=None, step_timeout: float = None, pipeline_timeout: float = None):
+        # Any object with the LangChain chat model interface (invoke/ainvoke/batch/abatch/stream);
+        # AutoClass.llm.ScriptedLLM answers offline with canned responses
+        # The default client is created on first use (see the llm property), so building an agent to
+        # list, load or run cached plans doesn't import LangChain
+        self._llm = llm
+        self._llm_settings = (model_name, temperature)
         self.context = {}
+        # Guards registration; readers never lock and work on the catalog snapshot they picked up
+        self._catalog_lock = threading.RLock()
         self.registered_class = {}
         self.method_docs = {}
+        # Last pipeline built by the llm_* methods (single-user convenience, see session() for concurrent use)
         self.pipeline = None
+        self.max_workers = max_workers
+        self.execution_policies = {}
+        self.process_runner = ProcessStepRunner(max_workers=process_workers)
+        # None -> in-memory cache, False -> disabled, or pass a PlanCache(path=...) to persist plans
+        self.plan_cache = PlanCache() if plan_cache is None else (None if plan_cache is False else plan_cache)
+        self._fingerprint = None
+        # Local BM25 shortlist used by llm_choose_class_method; shortlist_k=None sends the whole catalog
+        self.method_index = MethodIndex()
+        self.shortlist_k = shortlist_k
+        self.shortlist_threshold = shortlist_threshold
+        # "two_step" (choose methods, then fill inputs) or "single" (one LLM round trip)
+        self.planner = planner
+        # Pre-rendered prompt fragments, maintained by register_class
+        self.prompt_catalog = PromptCatalog(model_name=model_name)
+        self.prompt_token_budget = prompt_token_budget
+        self.compact_prompts = compact_prompts
+        # Memoized outputs of methods marked pure (@pure or ":pure:"); pass ResultCache(...) to size it
+        self.pure_methods = {}
+        self.result_cache = result_cache if result_cache is not None else ResultCache()
+        # Step/LLM timings, token counts and cache hits; add_hook() for callbacks, to_prometheus()/to_json() to export
+        self.instrumentation = instrumentation if instrumentation is not None else Instrumentation()
+        # Step and cache messages are DEBUG/INFO, so nothing is printed on hot paths unless logging is configured
+        self.logger = logger or logging.getLogger("AutoClass")
+        self.llm_retries = llm_retries
+        # self.context only holds the catalog; each run resolves against its own RunContext.
+        # Outputs of the steps named in persist ("Class.method" keys, or True for all) are also kept
+        # in a bounded result_store, where later runs can reference them.
+        self.persist = persist
+        self.result_store = result_store if result_store is not None else ResultStore()
+        # LLM answers are validated against the catalog and repaired locally; what can't be fixed
+        # is re-asked for the invalid method entries only, up to plan_repair_attempts times
+        self.plan_repair_attempts = plan_repair_attempts
+        self._validator = None
+        # NumPy outputs of at least spill_threshold bytes are moved to memory-mapped files in
+        # spill_dir (a temporary directory by default) and handed to dependents by reference
+        self.spill = SpillStore(spill_threshold, spill_dir) if spill_threshold is not None else None
+        # Steps with "map" run their method over list inputs in chunks spread over workers
+        # (map_chunk_size items each, sized automatically by default); methods with a
+        # @batch_of variant get one call per chunk instead of one per item
+        self.batch_methods = {}
+        self.map_chunk_size = map_chunk_size
+        # Append-only record of runs (a RunJournal or a SQLite path): every finished step is
+        # committed with its inputs hash and output, and resume_run(run_id) completes a failed or
+        # interrupted run without re-planning or recomputing the steps that already succeeded
+        self.journal = RunJournal(journal) if isinstance(journal, str) else journal
+        # Seconds a step (or a "timeout" entry on its method) and a whole run may take. Late steps
+        # are reported as timed out, their dependents as skipped, and their threads abandoned
+        self.step_timeout = step_timeout
+        self.pipeline_timeout = pipeline_timeout
+
+    @property
+    def llm(self):
+        if self._llm is None:
+            self._llm = shared_llm(*self._llm_settings)
+        return self._llm
+
+    @llm.setter
+    def llm(self, llm):
+        self._llm = llm
+
+    def register_class(self, instance, alias=None, execution=None):
+        """
+        Registers an instance and parses its method docstrings into the context.
 
-    def register_class(self, instance, alias=None):
+        execution selects where the methods run: "thread" (default) or "process" for
+        CPU-bound work that holds the GIL. Pass a string to apply it to every method or a
+        {method_name: policy} dict; a ":execution: process" docstring tag works per method
+        and is overridden by the value given here.
+        """
         class_name = alias or instance.__class__.__name__
-        self.registered_class[class_name] = instance
 
-        # Get class-level docstring
-        class_doc = inspect.getdoc(instance.__class__)
+        # Parsed metadata is memoized per class, so repeat registrations skip inspect/regex work
+        class_doc, methods = extract_class_metadata(instance.__class__)
 
         # Build structured class metadata
         class_meta = {
             "class_name": class_name,
-            "class_description": class_doc or "",
+            "class_description": class_doc,
             "methods": []
         }
 
-        # Extract method-level metadata
-        for name, func in inspect.getmembers(instance, predicate=inspect.ismethod):
-            if name.startswith("_"):
-                continue
-            doc = inspect.getdoc(func)
-            if doc:
-                parsed = self.parse_docstring(doc)
-                method_data = {
-                    "method": name,
-                    "method_description": parsed["description"],
-                    "inputs": parsed["inputs"],
-                    "output": parsed["output"],
-                    "raw_doc": doc
-                }
-                class_meta["methods"].append(method_data)
-                self.method_docs[f"{class_name}.{name}"] = method_data
-
-        # Store in global context
-        self.context.setdefault("classes", []).append(class_meta)
+        policies, pure_methods = {}, {}
+        for method_data in methods:
+            name = method_data["method"]
+            tagged = method_data.pop("execution", None)
+            if "pure" in method_data:
+                pure_methods[name] = method_data.pop("pure")
+            policy = execution.get(name) if isinstance(execution, dict) else execution
+            policy = policy or tagged or "thread"
+            if policy not in EXECUTION_POLICIES:
+                raise ValueError(f"Unknown execution policy '{policy}' for {class_name}.{name}")
+            policies[name] = policy
+            class_meta["methods"].append(method_data)
+
+        self._add_class_meta(class_meta, policies, pure_methods, instance, batch_variants(instance.__class__))
+        if "process" in policies.values():
+            self.process_runner.add_instance(class_name, instance)
+
+    def _add_class_meta(self, class_meta, policies, pure_methods=None, instance=None, batch_methods=None):
+        """
+        Stores parsed class metadata in the context, replacing any earlier registration under the same name.
+
+        The catalog is copy-on-write: new classes/method lists (tuples) and lookup dicts are built
+        and then swapped in, so queries running on other threads keep a consistent snapshot and
+        nothing they hold is ever mutated.
+        """
+        class_name = class_meta["class_name"]
+        with self._catalog_lock:
+            classes = list(self.context.get("classes", ()))
+            method_docs = dict(self.method_docs)
+            execution_policies = dict(self.execution_policies)
+            all_pure = dict(self.pure_methods)
+            all_batch = dict(self.batch_methods)
+            for previous in [cls for cls in classes if cls["class_name"] == class_name]:
+                for method_data in previous["methods"]:
+                    key = f"{class_name}.{method_data['method']}"
+                    method_docs.pop(key, None)
+                    execution_policies.pop(key, None)
+                    all_pure.pop(key, None)
+                    all_batch.pop(key, None)
+                classes.remove(previous)
+            # Methods the new registration no longer has must not be shortlisted
+            self.method_index.remove_prefix(f"{class_name}.")
+
+            class_meta = dict(class_meta, methods=tuple(class_meta["methods"]))
+            class_doc = class_meta["class_description"]
+            for method_data in class_meta["methods"]:
+                name = method_data["method"]
+                key = f"{class_name}.{name}"
+                method_docs[key] = method_data
+                execution_policies[key] = policies.get(name, "thread")
+                if pure_methods and name in pure_methods:
+                    all_pure[key] = pure_methods[name]
+                if batch_methods and name in batch_methods:
+                    all_batch[key] = batch_methods[name]
+                self.method_index.add(
+                    key, class_name, name, method_data["method_description"], " ".join(method_data["inputs"]), class_doc
+                )
+            classes.append(class_meta)
+            self.prompt_catalog.add_class(class_meta)
+
+            # Publish the new catalog
+            if instance is not None:
+                self.registered_class = {**self.registered_class, class_name: instance}
+            self.method_docs = method_docs
+            self.execution_policies = execution_policies
+            self.pure_methods = all_pure
+            self.batch_methods = all_batch
+            self.context["classes"] = tuple(classes)
+            self._fingerprint = None
 
     def parse_docstring(self, docstring):
         """
@@ -57,50 +208,78 @@ class Agent:
         - Description
         - Parameters (with types)
         - Return or rtype
+        - Optional execution policy tag (":execution: process")
 
         Returns:
         {
             description: str,
             inputs: dict,
-            output: str
+            output: str,
+            execution: str (only when tagged)
         }
         """
-        parsed = {
-            "description": "",
-            "inputs": {},
-            "output": ""
-        }
-
-        lines = docstring.strip().splitlines()
+        return parse_docstring(docstring)
 
-        for line in lines:
-            line = line.strip()
-            if line.lower().startswith("- description:"):
-                parsed["description"] = line.split(":", 1)[1].strip()
+    def save_catalog(self, path):
+        """
+        Writes the registered catalog (class/method metadata and execution policies) to a JSON
+        snapshot that load_catalog can restore without re-inspecting any class.
+        """
+        snapshot = {
+            "version": CATALOG_SNAPSHOT_VERSION,
+            "classes": self.context.get("classes", []),
+            "execution_policies": self.execution_policies,
+            "pure_methods": self.pure_methods,
+            "batch_methods": self.batch_methods
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f)
 
-            elif line.startswith("- param"):
-                match = re.match(r"- param (\w+): .*?:type:\s*(.*)", line)
-                if match:
-                    param, param_type = match.groups()
-                    parsed["inputs"][param] = param_type
+    def load_catalog(self, path, instances=None):
+        """
+        Restores a snapshot written by save_catalog.
 
-            elif line.startswith(":rtype:"):
-                parsed["output"] = line.split(":", 1)[1].strip()
-            elif line.startswith(":return:") and not parsed["output"]:
-                parsed["output"] = line.split(":", 1)[1].strip()
+        instances maps class names to the objects that should execute their methods; without them
+        the catalog can still be listed and planned against. Classes already registered keep their
+        instance.
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            snapshot = json.load(f)
+        if snapshot.get("version") != CATALOG_SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported catalog snapshot version: {snapshot.get('version')}")
 
-        return parsed
+        instances = instances or {}
+        policies = snapshot.get("execution_policies", {})
+        for class_meta in snapshot.get("classes", []):
+            class_name = class_meta["class_name"]
+            class_policies = {
+                key.split(".", 1)[1]: policy for key, policy in policies.items()
+                if key.startswith(f"{class_name}.")
+            }
+            class_pure = {
+                key.split(".", 1)[1]: options for key, options in snapshot.get("pure_methods", {}).items()
+                if key.startswith(f"{class_name}.")
+            }
+            class_batch = {
+                key.split(".", 1)[1]: name for key, name in snapshot.get("batch_methods", {}).items()
+                if key.startswith(f"{class_name}.")
+            }
+            self._add_class_meta(class_meta, class_policies, class_pure, instances.get(class_name), class_batch)
+            if class_name in instances:
+                if "process" in class_policies.values():
+                    self.process_runner.add_instance(class_name, instances[class_name])
 
     def list_methods(self):
         """
         Returns list of all methods, flattened and with class name included.
+        The entries are deep copies, so callers can't change the shared catalog.
         """
         methods = []
         for cls in self.context.get("classes", []):
             class_name = cls["class_name"]
             for m in cls["methods"]:
                 methods.append({
-                    **m,
+                    **copy.deepcopy(m),
                     "class": class_name
                 })
         return methods
@@ -117,9 +296,315 @@ class Agent:
             for cls in self.context.get("classes", [])
         ]
     
+    def catalog_fingerprint(self):
+        """
+        Hash of the registered classes and method signatures, recomputed only after register_class.
+        """
+        classes = self.context.get("classes", ())
+        cached = self._fingerprint
+        # Tied to the snapshot it was computed from, so a concurrent registration can't leave a stale hash
+        if cached is None or cached[0] is not classes:
+            cached = self._fingerprint = (classes, catalog_fingerprint(classes))
+        return cached[1]
+
+    def _plan_cache_key(self, query, use_cache):
+        if not use_cache or self.plan_cache is None:
+            return None
+        return self.plan_cache.make_key(query, self.catalog_fingerprint())
+
+    def session(self, query=None):
+        """
+        New AgentSession holding the per-query state (selection, pipeline, results) for query.
+        Sessions are cheap, and any number of them can use one Agent from different threads or tasks.
+        """
+        return AgentSession(self, query)
+
+    def plan(self, query, use_cache=True, planner=None):
+        """
+        Returns the filled pipeline for a query. A plan cache hit skips the LLM entirely;
+        a miss plans with the selected planner and stores the result.
+
+        planner="two_step" runs llm_choose_class_method then llm_determine_input_parameters;
+        planner="single" uses llm_plan_pipeline and falls back to the two-step flow if its
+        response can't be parsed. Defaults to the planner given to Agent().
+
+        Planning happens in a fresh session, so concurrent calls are safe and self.pipeline is
+        left untouched.
+        """
+        return self.session(query).plan(use_cache=use_cache, planner=planner)
+
+    async def aplan(self, query, use_cache=True, planner=None):
+        """
+        Async counterpart of plan.
+        """
+        return await self.session(query).aplan(use_cache=use_cache, planner=planner)
+
+    def run_pipeline(self, query, max_workers=None, use_cache=True, planner=None, run_id=None):
+        """
+        Plans (or fetches a cached plan for) a query and executes it. With a journal, pass
+        run_id to be able to resume_run(run_id) if a step fails.
+        """
+        session = self.session(query)
+        session.plan(use_cache=use_cache, planner=planner)
+        return session.run(max_workers=max_workers, run_id=run_id)
+
+    def _usage(self, message, response):
+        """
+        Token counts for one LLM call: the provider's usage report when present, else counted locally.
+        """
+        prompt_tokens, completion_tokens = usage_tokens(response)
+        if prompt_tokens is None:
+            prompt_tokens = count_tokens(message.content, self.prompt_catalog.model_name)
+        if completion_tokens is None:
+            completion_tokens = count_tokens(response.content or "", self.prompt_catalog.model_name)
+        return prompt_tokens, completion_tokens
+
+    def _call_llm(self, call, message):
+        """
+        Invokes the LLM with a single message, retrying up to llm_retries times, and records
+        latency, token counts and retries under the given call name. Returns the stripped content.
+        """
+        started = self.instrumentation.llm_started(call)
+        for attempt in range(self.llm_retries + 1):
+            try:
+                response = self.llm.invoke([message])
+                break
+            except Exception as e:
+                if attempt == self.llm_retries:
+                    self.instrumentation.llm_finished(call, started, retries=attempt, error=e)
+                    raise
+                self.logger.warning("LLM call %s failed (attempt %d), retrying: %s", call, attempt + 1, e)
+        prompt_tokens, completion_tokens = self._usage(message, response)
+        self.instrumentation.llm_finished(call, started, prompt_tokens, completion_tokens, retries=attempt)
+        return response.content.strip()
+
+    async def _acall_llm(self, call, message):
+        """
+        Async counterpart of _call_llm using the LLM's ainvoke interface.
+        """
+        started = self.instrumentation.llm_started(call)
+        for attempt in range(self.llm_retries + 1):
+            try:
+                response = await self.llm.ainvoke([message])
+                break
+            except Exception as e:
+                if attempt == self.llm_retries:
+                    self.instrumentation.llm_finished(call, started, retries=attempt, error=e)
+                    raise
+                self.logger.warning("LLM call %s failed (attempt %d), retrying: %s", call, attempt + 1, e)
+        prompt_tokens, completion_tokens = self._usage(message, response)
+        self.instrumentation.llm_finished(call, started, prompt_tokens, completion_tokens, retries=attempt)
+        return response.content.strip()
+
+    def _batch_llm(self, call, messages, max_concurrency):
+        """
+        Sends one single-message conversation per prompt through the LLM's batch interface.
+        Failed calls come back as None instead of aborting the whole batch.
+        """
+        if not messages:
+            return []
+        started = self.instrumentation.llm_started(f"{call}_batch")
+        responses = self.llm.batch(
+            [[message] for message in messages],
+            config={"max_concurrency": max_concurrency},
+            return_exceptions=True
+        )
+        return self._batch_contents(call, started, messages, responses)
+
+    async def _abatch_llm(self, call, messages, max_concurrency):
+        if not messages:
+            return []
+        started = self.instrumentation.llm_started(f"{call}_batch")
+        responses = await self.llm.abatch(
+            [[message] for message in messages],
+            config={"max_concurrency": max_concurrency},
+            return_exceptions=True
+        )
+        return self._batch_contents(call, started, messages, responses)
+
+    def _batch_contents(self, call, started, messages, responses):
+        contents, prompt_total, completion_total, error = [], 0, 0, None
+        for message, response in zip(messages, responses):
+            if isinstance(response, Exception):
+                self.logger.warning("LLM call failed in batch: %s", response)
+                self.instrumentation.inc("autoclass_llm_batch_failures_total", {"call": call})
+                error = error or response
+                contents.append(None)
+            else:
+                prompt_tokens, completion_tokens = self._usage(message, response)
+                prompt_total += prompt_tokens
+                completion_total += completion_tokens
+                contents.append(response.content.strip())
+        # The whole batch is recorded as one call; it only counts as failed when nothing came back
+        failed = error if all(content is None for content in contents) else None
+        self.instrumentation.llm_finished(f"{call}_batch", started, prompt_total, completion_total, error=failed)
+        return contents
+
+    def _unique_queries(self, queries, use_cache):
+        """
+        Groups identical queries (see normalize_query) and splits them into cached plans and
+        (normalized, query, cache_key) entries that still need planning.
+        """
+        plans, pending, seen = {}, [], set()
+        for query in queries:
+            normalized = normalize_query(query)
+            if normalized in seen:
+                continue
+            seen.add(normalized)
+            key = self._plan_cache_key(query, use_cache)
+            cached = self.plan_cache.get(key) if key else None
+            if key:
+                self.instrumentation.cache_lookup("plan", cached is not None)
+            if cached is not None:
+                plans[normalized] = cached
+            else:
+                pending.append((normalized, query, key))
+        return plans, pending
+
+    def _finish_batch(self, queries, plans, pending):
+        for normalized, _, key in pending:
+            if key and plans.get(normalized):
+                self.plan_cache.set(key, plans[normalized])
+        # Duplicates get their own copy so callers can't mutate each other's plans
+        return [copy.deepcopy(plans.get(normalize_query(q)) or {}) for q in queries]
+
+    def _plan_batches(self, queries, use_cache, planner):
+        """
+        Planning logic shared by plan_many and aplan_many. Yields (call, messages) for each LLM
+        batch it needs, is sent back the response contents, and returns the plans.
+
+        Plans go through the same validation and LLM repair as AgentSession.plan; the repair
+        prompts of all queries with unresolved issues are batched as well.
+        """
+        plans, pending = self._unique_queries(queries, use_cache)
+        issues = {}
+        if pending and (planner or self.planner) == "single":
+            responses = yield "plan_pipeline", [self._plan_pipeline_message(q) for _, q, _ in pending]
+            for (normalized, _, _), response in zip(pending, responses):
+                if response is None:
+                    continue
+                pipeline, found = self._check_pipeline(response)
+                if not pipeline.get("classes"):
+                    self.logger.warning("Single-shot plan unusable, falling back to two-step planning")
+                    continue
+                plans[normalized], issues[normalized] = pipeline, found
+        two_step = [entry for entry in pending if not plans.get(entry[0])]
+
+        if two_step:
+            responses = yield "choose_class_method", [self._choose_class_method_message(q) for _, q, _ in two_step]
+            selected = []
+            for entry, response in zip(two_step, responses):
+                if response is None:
+                    continue
+                selection = self._parse_class_method_choice(response, store=False)
+                # Nothing selected means nothing to fill in; don't spend an LLM call on an empty context
+                if not isinstance(selection, dict) or not selection:
+                    self.logger.info("No methods selected for %r", entry[1])
+                    continue
+                selected.append((entry, self.get_method_context_subset(selection)))
+            if selected:
+                messages = [self._input_parameters_message(entry[1], pruned) for entry, pruned in selected]
+                responses = yield "determine_input_parameters", messages
+                for ((normalized, _, _), _), response in zip(selected, responses):
+                    if response is None:
+                        continue
+                    pipeline, found = self._check_pipeline(response)
+                    if pipeline:
+                        plans[normalized], issues[normalized] = pipeline, found
+
+        # Batched form of _repair_pipeline
+        queries_by_key = {normalized: query for normalized, query, _ in pending}
+        unresolved = {normalized: found for normalized, found in issues.items() if found}
+        for _ in range(self.plan_repair_attempts):
+            if not unresolved:
+                break
+            broken = list(unresolved)
+            self.instrumentation.inc("autoclass_plan_repairs_total", {"kind": "llm"}, len(broken))
+            messages = [self._repair_message(queries_by_key[n], plans[n], unresolved[n]) for n in broken]
+            responses = yield "repair_plan", messages
+            for normalized, response in zip(broken, responses):
+                remaining = None
+                if response is not None:
+                    plans[normalized], remaining = self._apply_repair(plans[normalized], response)
+                if remaining is None:
+                    # Unusable answer; like _repair_pipeline, stop asking for this plan
+                    self._report_plan_issues(unresolved.pop(normalized))
+                elif remaining:
+                    unresolved[normalized] = remaining
+                else:
+                    del unresolved[normalized]
+        for found in unresolved.values():
+            self._report_plan_issues(found)
+
+        return self._finish_batch(queries, plans, pending)
+
+    def plan_many(self, queries, max_concurrency=8, use_cache=True, planner=None):
+        """
+        Plans many queries at once and returns one pipeline per query, in order ({} when planning failed).
+
+        Identical queries are planned once, cached plans are reused, and the remaining LLM calls
+        (including plan repairs, see AgentSession.plan) go through the LLM's batch interface with
+        at most max_concurrency in flight.
+        self.pipeline is left untouched.
+        """
+        batches = self._plan_batches(queries, use_cache, planner)
+        try:
+            call, messages = next(batches)
+            while True:
+                call, messages = batches.send(self._batch_llm(call, messages, max_concurrency))
+        except StopIteration as done:
+            return done.value
+
+    async def aplan_many(self, queries, max_concurrency=8, use_cache=True, planner=None):
+        """
+        Async counterpart of plan_many using the LLM's abatch interface.
+        """
+        batches = self._plan_batches(queries, use_cache, planner)
+        try:
+            call, messages = next(batches)
+            while True:
+                call, messages = batches.send(await self._abatch_llm(call, messages, max_concurrency))
+        except StopIteration as done:
+            return done.value
+
+    def run_many(self, queries, max_concurrency=8, max_workers=None, use_cache=True, planner=None):
+        """
+        plan_many followed by execution of every pipeline.
+        Returns [{"query", "pipeline", "results"}] in the order of queries.
+        """
+        pipelines = self.plan_many(queries, max_concurrency=max_concurrency, use_cache=use_cache, planner=planner)
+        return [
+            {
+                "query": query,
+                "pipeline": pipeline,
+                "results": self.run_pipeline_with_dependencies(pipeline, max_workers=max_workers) if pipeline else {}
+            }
+            for query, pipeline in zip(queries, pipelines)
+        ]
+
+    async def arun_many(self, queries, max_concurrency=8, max_workers=None, use_cache=True, planner=None):
+        """
+        Async counterpart of run_many; pipelines are executed concurrently.
+        """
+        pipelines = await self.aplan_many(queries, max_concurrency=max_concurrency, use_cache=use_cache, planner=planner)
+
+        async def execute(pipeline):
+            if not pipeline:
+                return {}
+            return await self.arun_pipeline_with_dependencies(pipeline, max_workers=max_workers)
+
+        results = await asyncio.gather(*(execute(pipeline) for pipeline in pipelines))
+        return [
+            {"query": query, "pipeline": pipeline, "results": result}
+            for query, pipeline, result in zip(queries, pipelines, results)
+        ]
+
     def get_current_pipeline(self):
         """
         Just returns the current pipeline in use. Will change per new query from User.
+
+        Only the llm_* methods called on the agent itself update it; when one agent serves
+        concurrent queries, use agent.session(query) and read session.pipeline instead.
         """
         return self.pipeline
     
@@ -129,17 +614,16 @@ class Agent:
         """
         return self.context
     
-    def llm_determine_input_parameters(self, query):
-        context = "\n".join(
-            [
-                f"""Class: {cls['class_name']}
-        Method: {met['method']}
-        Inputs: {', '.join([f"{k} ({v})" for k, v in met.get('inputs', {}).items()])}
-        Output: {met.get('output', 'N/A')}"""
-                for cls in self.pipeline.get("classes", [])
-                for met in cls.get("methods", [])
-            ]
+    def _input_parameters_message(self, query, pipeline=None):
+        # LangChain is only loaded once a prompt is built, so cached and offline runs never import it
+        from langchain.schema import HumanMessage
+        from langchain_core.prompts import PromptTemplate
+        pipeline = pipeline or self.pipeline
+        dropped = []
+        context = self.prompt_catalog.render_inputs(
+            pipeline, budget=self.prompt_token_budget, compact=self.compact_prompts, dropped=dropped
         )
+        self._report_dropped("determine_input_parameters", dropped)
         prompt = PromptTemplate(
             input_variables=["conexts", "query"],
             template="""
@@ -157,7 +641,8 @@ class Agent:
                 - If an input value is not found in the query, check if any previous method's output can be used instead.
                 - If a method depends on a previous result, represent that input as "ClassName.methodName".
                 - Only use such references if they logically make sense — do NOT force linking all methods.
-                - Preserve the structure: Do NOT rename keys, drop methods, or add extra fields.
+                - To apply a method to every item of a list, give the whole list as the input and add "map": "param1" to that method; its output is then the list of results.
+                - Preserve the structure: Do NOT rename keys, drop methods, or add extra fields other than "map".
                 - Your output should include ONLY the updated JSON pipeline structure with filled `inputs`.
 
 
@@ -185,22 +670,144 @@ class Agent:
                 """
                     )
 
-        # Format and send prompt to LLM
+        # Format prompt for the LLM
         formatted_prompt = prompt.format(contexts=context, query=query)
-        message = HumanMessage(content=formatted_prompt)
-        response = self.llm([message]).content.strip()
+        return HumanMessage(content=formatted_prompt)
+
+    def _plan_validator(self):
+        """
+        PlanValidator for the current catalog snapshot, rebuilt only after registration.
+        """
+        cached = self._validator
+        if cached is None or cached[0] is not self.method_docs or cached[1] is not self.registered_class:
+            cached = self._validator = (
+                self.method_docs, self.registered_class, PlanValidator(self.method_docs, self.registered_class)
+            )
+        return cached[2]
 
+    def _check_pipeline(self, response):
+        """
+        Parses and validates a pipeline answer. Returns (pipeline, issues); pipeline is {} when
+        the response can't be parsed at all.
+        """
+        started = time.perf_counter()
         try:
-            parsed = ast.literal_eval(response)
-            self.pipeline = parsed
-            print("\n✅ Filled pipeline with inputs:\n")
-            return parsed
-        except Exception as e:
-            print("❌ Error parsing LLM response:", e)
-            print("Raw response:\n", response)
-            return {}
-    
-    def llm_choose_class_method(self, query):
+            pipeline, issues, repairs = self._plan_validator().validate_pipeline(extract_structure(response))
+        except PlanParseError as e:
+            self.instrumentation.inc("autoclass_plan_parse_failures_total")
+            self.logger.warning("Error parsing LLM response: %s", e)
+            self.logger.debug("Raw response:\n%s", response)
+            return {}, []
+        finally:
+            self.instrumentation.observe("autoclass_plan_parse_seconds", time.perf_counter() - started, {"kind": "pipeline"})
+        if repairs:
+            self.instrumentation.inc("autoclass_plan_repairs_total", {"kind": "local"}, len(repairs))
+            self.logger.info("Repaired plan locally: %s", "; ".join(repairs))
+        return pipeline, issues
+
+    def _report_plan_issues(self, issues):
+        if issues:
+            self.logger.warning(
+                "Plan still has invalid inputs:\n%s",
+                "\n".join(f" - {i['key']}.{i['param']}: {i['problem']}" for i in issues)
+            )
+
+    def _repair_message(self, query, pipeline, issues):
+        from langchain.schema import HumanMessage
+        from langchain_core.prompts import PromptTemplate
+        keys = list(dict.fromkeys(issue["key"] for issue in issues))
+        entries = [
+            {"class_name": cls["class_name"], "method": method["method"], "inputs": method.get("inputs", {})}
+            for cls in pipeline.get("classes", []) for method in cls["methods"]
+            if f"{cls['class_name']}.{method['method']}" in keys
+        ]
+        signatures = "\n".join(
+            f"{key}({', '.join(f'{p}: {t}' for p, t in self.method_docs[key].get('inputs', {}).items())})"
+            for key in keys
+        )
+        problems = "\n".join(f"- {i['key']}" + (f".{i['param']}" if i["param"] else "") + f": {i['problem']}" for i in issues)
+        prompt = PromptTemplate(
+            input_variables=["query", "signatures", "problems", "entries"],
+            template="""
+                You previously filled in method inputs for the query below, but some of them are invalid.
+
+                Query:
+                {query}
+
+                Method signatures:
+                {signatures}
+
+                Problems:
+                {problems}
+
+                Entries to correct:
+                {entries}
+
+                Return ONLY a JSON list with the corrected entries, keeping "class_name" and "method" unchanged.
+                An input may reference another method's output as "ClassName.methodName". Do not explain anything.
+                """
+        )
+        return HumanMessage(content=prompt.format(
+            query=query, signatures=signatures, problems=problems, entries=json.dumps(entries)
+        ))
+
+    def _apply_repair(self, pipeline, response):
+        try:
+            pipeline = merge_repaired(pipeline, extract_structure(response))
+        except PlanParseError as e:
+            self.logger.warning("Could not parse plan repair: %s", e)
+            return pipeline, None
+        pipeline, issues, _ = self._plan_validator().validate_pipeline(pipeline)
+        return pipeline, issues
+
+    def _repair_pipeline(self, query, pipeline, issues):
+        """
+        Re-asks the LLM for just the method entries with unresolved issues (at most
+        plan_repair_attempts times) and merges the corrections into the pipeline.
+        """
+        for _ in range(self.plan_repair_attempts if issues else 0):
+            self.instrumentation.inc("autoclass_plan_repairs_total", {"kind": "llm"})
+            response = self._call_llm("repair_plan", self._repair_message(query, pipeline, issues))
+            pipeline, remaining = self._apply_repair(pipeline, response)
+            if remaining is None:
+                break
+            issues = remaining
+            if not issues:
+                break
+        self._report_plan_issues(issues)
+        return pipeline
+
+    async def _arepair_pipeline(self, query, pipeline, issues):
+        for _ in range(self.plan_repair_attempts if issues else 0):
+            self.instrumentation.inc("autoclass_plan_repairs_total", {"kind": "llm"})
+            response = await self._acall_llm("repair_plan", self._repair_message(query, pipeline, issues))
+            pipeline, remaining = self._apply_repair(pipeline, response)
+            if remaining is None:
+                break
+            issues = remaining
+            if not issues:
+                break
+        self._report_plan_issues(issues)
+        return pipeline
+
+    def llm_determine_input_parameters(self, query, pipeline=None):
+        filled = self.session(query).determine_input_parameters(pipeline=pipeline or self.pipeline)
+        if filled:
+            self.pipeline = filled
+        return filled
+
+    async def allm_determine_input_parameters(self, query, pipeline=None):
+        """
+        Async counterpart of llm_determine_input_parameters using the LLM's ainvoke interface.
+        """
+        filled = await self.session(query).adetermine_input_parameters(pipeline=pipeline or self.pipeline)
+        if filled:
+            self.pipeline = filled
+        return filled
+
+    def _choose_class_method_message(self, query):
+        from langchain.schema import HumanMessage
+        from langchain_core.prompts import PromptTemplate
         prompt = PromptTemplate(
             input_variables=["classes","user_query"],
             template="""
@@ -233,35 +840,165 @@ class Agent:
                 - Do not return any explanation or extra text—**only the dictionary output**.
                 - You should not change the class name and use the exact class name as it is. 
                 """)
-        classes_desc = "\n".join(
-            [
-                f"Class: {cls.get('class_name', 'Unknown')} — Method: {met.get('method', 'Unnamed')} — Description: {met.get('method_description', '')}"
-                for cls in self.context.get("classes", [])
-                for met in cls.get("methods", [])
-            ]
+        dropped = []
+        classes_desc = self.prompt_catalog.render_selection(
+            self._catalog_keys(query), budget=self.prompt_token_budget, compact=self.compact_prompts, dropped=dropped
         )
+        self._report_dropped("choose_class_method", dropped)
         #print(classes_desc)
-        message = HumanMessage(
+        return HumanMessage(
                 content = prompt.format(classes = classes_desc, user_query = query)
             )
-        
-        resp = self.llm([message]).content.strip()
-        
+
+    def shortlist_methods(self, query, k=None, threshold=None):
+        """
+        Returns the "Class.method" keys the local index ranks highest for the query, best first,
+        or None when shortlisting is off or nothing matched (the whole catalog is used then).
+        """
+        k = k or self.shortlist_k
+        if not k:
+            return None
+        threshold = self.shortlist_threshold if threshold is None else threshold
+        hits = self.method_index.search(query, k=k, threshold=threshold)
+        return [key for key, _ in hits] or None
+
+    def _catalog_keys(self, query):
+        """
+        Methods for a catalog prompt, best first: the shortlist when one applies, otherwise, under a
+        token budget, the whole catalog ranked by the local index so the budget cuts the least
+        relevant methods rather than the last registered ones. None keeps registration order.
+        """
+        shortlist = self.shortlist_methods(query)
+        if shortlist or self.prompt_token_budget is None:
+            return shortlist
+        ranked = [key for key, _ in self.method_index.search(query, k=len(self.method_index))]
+        if not ranked:
+            return None
+        matched = set(ranked)
+        return ranked + [key for key in self.prompt_catalog.keys() if key not in matched]
+
+    def _report_dropped(self, call, dropped):
+        if dropped:
+            self.instrumentation.inc("autoclass_prompt_methods_dropped_total", {"call": call}, len(dropped))
+            self.logger.warning(
+                "%s prompt exceeds the token budget of %d; left out %d methods: %s",
+                call, self.prompt_token_budget, len(dropped), ", ".join(dropped)
+            )
+
+    def _parse_class_method_choice(self, resp, store=True):
+        started = time.perf_counter()
         try:
-            resp = ast.literal_eval(resp)
-            #print(resp)
-        except:
-            print("Error converting to dictionary. LLM dind't provide dictionary formatted output")
-        self.pipeline = self.get_method_context_subset(resp)
+            resp, repairs = self._plan_validator().validate_selection(extract_structure(resp))
+        except PlanParseError:
+            self.instrumentation.inc("autoclass_plan_parse_failures_total")
+            self.logger.warning("Error converting to dictionary. LLM didn't provide dictionary formatted output")
+            resp = {}
+        else:
+            if repairs:
+                self.instrumentation.inc("autoclass_plan_repairs_total", {"kind": "local"}, len(repairs))
+                self.logger.info("Repaired method selection locally: %s", "; ".join(repairs))
+        finally:
+            self.instrumentation.observe("autoclass_plan_parse_seconds", time.perf_counter() - started, {"kind": "selection"})
+        if store:
+            self.pipeline = self.get_method_context_subset(resp)
         return resp
+
+    def llm_choose_class_method(self, query):
+        session = self.session(query)
+        selection = session.choose_class_method()
+        self.pipeline = session.pruned
+        return selection
+
+    async def allm_choose_class_method(self, query):
+        """
+        Async counterpart of llm_choose_class_method using the LLM's ainvoke interface.
+        """
+        session = self.session(query)
+        selection = await session.achoose_class_method()
+        self.pipeline = session.pruned
+        return selection
     
+    def _plan_pipeline_message(self, query):
+        from langchain.schema import HumanMessage
+        from langchain_core.prompts import PromptTemplate
+        dropped = []
+        catalog = self.prompt_catalog.render_plan(
+            self._catalog_keys(query), budget=self.prompt_token_budget, compact=self.compact_prompts, dropped=dropped
+        )
+        self._report_dropped("plan_pipeline", dropped)
+        prompt = PromptTemplate(
+            input_variables=["catalog", "query"],
+            template="""
+                You are an AI assistant that plans which methods to run for a user query and fills in their inputs.
+
+                Available methods:
+                {catalog}
+
+                Query:
+                {query}
+
+                Instructions:
+
+                - Select only the methods needed to answer the query. Use the exact class and method names.
+                - For each selected method, fill every input from the values given in the query.
+                - If an input must come from another selected method's output, set it to "ClassName.methodName".
+                - Only use such references if they logically make sense — do NOT force linking all methods.
+                - To apply a method to every item of a list, give the whole list as the input and add "map": "param1" to that method; its output is then the list of results.
+                - If no methods match, return {{"classes": []}}.
+
+                Expected Output format:
+                {{
+                "classes": [
+                    {{
+                    "class_name": "SomeClass",
+                    "methods": [
+                        {{
+                        "method": "some_method",
+                        "inputs": {{
+                            "param1": "value1",
+                            "param2": "OtherClass.other_method"
+                        }},
+                        "output": "..."
+                        }}
+                    ]
+                    }}
+                ]
+                }}
+
+                Only output this JSON structure. Do not explain anything.
+                """
+        )
+        return HumanMessage(content=prompt.format(catalog=catalog, query=query))
+
+    def llm_plan_pipeline(self, query):
+        """
+        Single-round-trip planner: selects methods, fills their inputs and the "Class.method"
+        dependency references in one LLM call. Returns the same pipeline shape as
+        llm_determine_input_parameters, or {} if the response can't be used.
+        """
+        pipeline = self.session(query).plan_pipeline()
+        if pipeline:
+            self.pipeline = pipeline
+        return pipeline
+
+    async def allm_plan_pipeline(self, query):
+        """
+        Async counterpart of llm_plan_pipeline.
+        """
+        pipeline = await self.session(query).aplan_pipeline()
+        if pipeline:
+            self.pipeline = pipeline
+        return pipeline
+
     def get_method_context_subset(self, selected_dict=None):
         """
         Prunes self.context['classes'] based on selected class/methods dictionary.
         Returns a filtered structure with only relevant class/method pairs.
         """
         pruned_context = {"classes": []}
-        selected_dict = selected_dict or self.pipeline
+        selected_dict = self.pipeline if selected_dict is None else selected_dict
+        if not isinstance(selected_dict, dict):
+            selected_dict = {}
         for cls in self.context.get("classes", []):
             class_name = cls["class_name"]
             if class_name not in selected_dict:
@@ -271,9 +1008,10 @@ class Agent:
             selected_methods = []
             for method in cls["methods"]:
                 if method["method"] in selected_dict[class_name]:
-                    method.pop('method_description')
-                    method.pop('raw_doc')
-                    selected_methods.append(method)
+                    # Deep copy rather than pop: the catalog is shared by every session and never mutated
+                    selected_methods.append(copy.deepcopy({
+                        k: v for k, v in method.items() if k not in ("method_description", "raw_doc")
+                    }))
 
             if selected_methods:
                 pruned_context["classes"].append({
@@ -283,84 +1021,582 @@ class Agent:
                 })
         return pruned_context
     
-    def run_pipeline_with_dependencies(self, pipeline=None, max_passes=5):
+    def _flatten_pipeline(self, pipeline):
         """
-        Executes a structured pipeline that may include method dependencies.
-        Respects dependency ordering using "Class.method" notation in inputs.
+        Turns the nested {"classes": [{"class_name", "methods": [...]}]} pipeline into a flat list of steps.
         """
-        pipeline = pipeline or self.pipeline
-        results = {}
-        context = self.context
-        unresolved_methods = []
-        executed = set()
-
-        # Flatten all method steps
         steps = []
         for cls in pipeline.get("classes", []):
             class_name = cls["class_name"]
             instance = self.registered_class.get(class_name)
             if not instance:
-                print(f"❌ Class '{class_name}' is not registered.")
+                self.logger.error("Class '%s' is not registered.", class_name)
                 continue
             for method in cls["methods"]:
-                steps.append({
-                    "class": class_name,
-                    "instance": instance,
-                    "method_name": method["method"],
-                    "inputs": method["inputs"]
-                })
+                steps.append(self._make_step(class_name, instance, method))
+        return steps
 
-        # Resolve dependencies in multiple passes
-        for _ in range(max_passes):
-            progress = False
-            remaining = []
+    @staticmethod
+    def _make_step(class_name, instance, method):
+        step = {
+            "class": class_name,
+            "instance": instance,
+            "method_name": method["method"],
+            "inputs": method.get("inputs", {})
+        }
+        if mapped_params(method):
+            step["map"] = mapped_params(method)
+            step["chunk_size"] = method.get("chunk_size")
+        if method.get("timeout"):
+            step["timeout"] = method["timeout"]
+        return step
 
-            for step in steps:
-                key = f"{step['class']}.{step['method_name']}"
-                if key in executed:
-                    continue
+    def run_context(self):
+        """
+        Fresh scope for one run: its own results over the persisted result store and a read-only catalog.
+        """
+        return RunContext(self.context, self.result_store)
 
-                resolved_inputs = {}
-                inputs = step["inputs"]
-                can_execute = True
-
-                for param, val in inputs.items():
-                    if isinstance(val, (int, float, str)) and not isinstance(val, str) or "." not in str(val):
-                        resolved_inputs[param] = val
-                    elif isinstance(val, str) and val in results:
-                        resolved_inputs[param] = results[val]
-                    elif isinstance(val, str) and val in context:
-                        resolved_inputs[param] = context[val]
-                    else:
-                        can_execute = False
-                        break
-
-                if can_execute:
-                    try:
-                        method_fn = getattr(step["instance"], step["method_name"])
-                        print(f"🚀 Executing {key} with inputs: {resolved_inputs}")
-                        output = method_fn(**resolved_inputs)
-
-                        results[key] = output
-                        context[key] = output
-                        if isinstance(output, dict):
-                            context.update(output)
-
-                        executed.add(key)
-                        progress = True
-                    except Exception as e:
-                        print(f"❌ Error executing {key}: {e}")
-                else:
-                    remaining.append(step)
+    def build_dependency_graph(self, pipeline=None, context=None):
+        """
+        Builds the dependency DAG for a pipeline once, detecting cycles and missing "Class.method" references up front.
+        """
+        pipeline = pipeline or self.pipeline or {}
+        return DependencyGraph(
+            self._flatten_pipeline(pipeline),
+            context=context if context is not None else self.run_context(),
+            known_classes=self.registered_class.keys()
+        )
 
-            if not progress:
-                break
-            steps = remaining
+    def _start_run(self, pipeline, completed=None):
+        """
+        Returns (scope, graph, on_result) for a new run of pipeline. Outputs in completed are
+        placed in the scope as if their steps had just run.
+        """
+        scope = self.run_context()
+        on_result = functools.partial(self._store_result, scope)
+        for key, output in (completed or {}).items():
+            on_result(key, output)
+        graph = self.build_dependency_graph(pipeline, context=scope)
+        self._report_graph(graph)
+        return scope, graph, on_result
 
-        # Final report
+    def _report_graph(self, graph):
+        for key in graph.duplicates:
+            self.logger.warning("Duplicate step %s ignored.", key)
+        for cycle in graph.cycles:
+            self.logger.error("Dependency cycle: %s", " -> ".join(cycle + cycle[:1]))
+        for key, refs in graph.missing.items():
+            self.logger.error("%s references steps that are not in the pipeline: %s", key, ", ".join(refs))
+
+    def _report_unresolved(self, graph, results, outcomes=None):
+        remaining = [key for key in graph.nodes if key not in results]
         if remaining:
-            print("\n⚠️ Unresolved methods due to missing inputs or errors:")
-            for r in remaining:
-                print(f" - {r['class']}.{r['method_name']} (inputs: {r['inputs']})")
+            outcomes = outcomes or {}
+            self.logger.warning(
+                "Unresolved methods due to missing inputs or errors:\n%s",
+                "\n".join(
+                    f" - {key} ({self._describe_outcome(outcomes.get(key))}inputs: {Summary(graph.nodes[key]['inputs'])})"
+                    for key in remaining
+                )
+            )
+
+    @staticmethod
+    def _describe_outcome(event):
+        if event is None:
+            return ""
+        if event["status"] == "skipped":
+            return f"skipped, waiting on {event['cause']}; "
+        return f"{event['status']}; "
+
+    def _should_persist(self, key):
+        if self.persist is True:
+            return True
+        return bool(self.persist) and key in self.persist
+
+    def _store_result(self, scope, key, output):
+        scope[key] = output
+        if isinstance(output, dict):
+            scope.update(output)
+        if self._should_persist(key):
+            self.result_store.set(key, output)
+
+    def _report_error(self, key, error):
+        self.logger.error("Error executing %s: %s", key, error)
+
+    def _memo_lookup(self, key, resolved_inputs):
+        """
+        Returns (cache_key, hit, value) for pure methods; cache_key is None when memoization doesn't apply.
+        """
+        if key not in self.pure_methods or self.result_cache is None:
+            return None, False, None
+        cache_key = self.result_cache.make_key(key, resolved_inputs)
+        if cache_key is None:
+            return None, False, None
+        hit, value = self.result_cache.get(cache_key)
+        self.instrumentation.cache_lookup("result", hit)
+        return cache_key, hit, value
+
+    def _invoke_step(self, step, resolved_inputs):
+        key = f"{step['class']}.{step['method_name']}"
+        cache_key, hit, value = self._memo_lookup(key, resolved_inputs)
+        if hit:
+            self.logger.debug("Reusing memoized result for %s", key)
+            return value
+        started = self.instrumentation.step_started(key, resolved_inputs)
+        try:
+            output = self._call_step(key, step, resolved_inputs)
+        except Exception as e:
+            self.instrumentation.step_finished(key, started, error=e)
+            raise
+        # CPU time of the calling thread means nothing for steps run in a worker process
+        self.instrumentation.step_finished(key, started, cpu=self.execution_policies.get(key) != "process")
+        if cache_key is not None:
+            self.result_cache.set(cache_key, output, ttl=self.pure_methods[key].get("ttl"))
+        return output
+
+    def _spill_args(self):
+        if self.spill is None:
+            return None
+        return (self.spill.threshold, self.spill.path())
+
+    def _spilled(self, output):
+        if self.spill is None:
+            return output
+        return self.spill.spill(self.spill.adopt(output))
+
+    def _submit_process(self, step, resolved_inputs):
+        # Memory-mapped inputs cross the process boundary as file handles, not pickled copies
+        return self.process_runner.submit(
+            step["class"], step["method_name"], to_handles(resolved_inputs), spill=self._spill_args()
+        )
+
+    def _call_mapped(self, key, step, resolved_inputs):
+        """
+        Runs a "map" step: the method is applied to every item of the mapped inputs (zipped when
+        there are several) and the list of outputs is returned in item order. Items are split
+        into chunks run on threads, or on the process pool for "process" methods; a batch variant
+        is called once per chunk, and with a single chunk unless chunk_size is set.
+        """
+        mapped = step["map"]
+        batch_name = self.batch_methods.get(key)
+        count = item_count(resolved_inputs, mapped)
+        if self.execution_policies.get(key) == "process":
+            workers = self.process_runner.max_workers
+            resolved_inputs = to_handles(resolved_inputs)
+
+            def run(chunk):
+                return self.process_runner.submit_chunk(
+                    step["class"], step["method_name"], chunk, mapped, batch_name
+                ).result()
+        else:
+            workers = self.max_workers or min(32, (os.cpu_count() or 1) + 4)
+            instance = step["instance"]
+            batch = getattr(instance, batch_name) if batch_name else None
+            run = functools.partial(run_chunk, getattr(instance, step["method_name"]), batch, mapped=mapped)
+        chunk_size = step.get("chunk_size") or self.map_chunk_size
+        if batch_name and not chunk_size:
+            size = max(1, count)
+        else:
+            size = chunk_size_for(count, workers, chunk_size)
+        self.logger.debug("Mapping %s over %d items in chunks of %d", key, count, size)
+        return fan_out(run, split_chunks(resolved_inputs, mapped, size), workers)
+
+    def _call_step(self, key, step, resolved_inputs):
+        self.logger.debug("Executing %s with inputs: %s", key, Summary(resolved_inputs))
+        if step.get("map"):
+            return self._call_mapped(key, step, resolved_inputs)
+        if self.execution_policies.get(key) == "process":
+            return self._spilled(self._submit_process(step, resolved_inputs).result())
+        method_fn = getattr(step["instance"], step["method_name"])
+        output = method_fn(**resolved_inputs)
+        if inspect.isawaitable(output):
+            # async def methods still work from the synchronous executor
+            output = run_awaitable(output)
+        return self._spilled(output)
+
+    async def _ainvoke_step(self, step, resolved_inputs):
+        key = f"{step['class']}.{step['method_name']}"
+        cache_key, hit, value = self._memo_lookup(key, resolved_inputs)
+        if hit:
+            self.logger.debug("Reusing memoized result for %s", key)
+            return value
+        # Steps interleave on the event loop, so only wall time is recorded here
+        started = self.instrumentation.step_started(key, resolved_inputs)
+        try:
+            output = await self._acall_step(key, step, resolved_inputs)
+        except Exception as e:
+            self.instrumentation.step_finished(key, started, error=e, cpu=False)
+            raise
+        self.instrumentation.step_finished(key, started, cpu=False)
+        if cache_key is not None:
+            self.result_cache.set(cache_key, output, ttl=self.pure_methods[key].get("ttl"))
+        return output
 
-        return results   
\ No newline at end of file
+    async def _acall_step(self, key, step, resolved_inputs):
+        self.logger.debug("Executing %s with inputs: %s", key, Summary(resolved_inputs))
+        if step.get("map"):
+            loop = asyncio.get_running_loop()
+            call = functools.partial(contextvars.copy_context().run, self._call_mapped, key, step, resolved_inputs)
+            return await loop.run_in_executor(None, call)
+        if self.execution_policies.get(key) == "process":
+            return self._spilled(await asyncio.wrap_future(self._submit_process(step, resolved_inputs)))
+        method_fn = getattr(step["instance"], step["method_name"])
+        if inspect.iscoroutinefunction(method_fn):
+            return self._spilled(await method_fn(**resolved_inputs))
+        # Sync methods are offloaded so they don't block the event loop; the copied context
+        # lets them poll their step's current_cancel_token()
+        loop = asyncio.get_running_loop()
+        call = functools.partial(contextvars.copy_context().run, method_fn, **resolved_inputs)
+        output = await loop.run_in_executor(None, call)
+        if inspect.isawaitable(output):
+            output = await output
+        return self._spilled(output)
+
+    def compile_pipeline(self, pipeline=None, parameters=None):
+        """
+        Compiles a filled pipeline (e.g. get_current_pipeline()) into an immutable PreparedPipeline
+        with named parameter slots and a precomputed execution order.
+
+        parameters optionally names slots: {"x": "ArithmeticOperations.multiply.a"}; every other
+        literal input becomes a slot named "Class.method.param". Run it with
+        prepared.bind(agent).run(x=7) — no LLM call is made.
+        """
+        pipeline = pipeline or self.pipeline
+        scope = self.run_context()
+        return PreparedPipeline.compile(self.build_dependency_graph(pipeline, context=scope), scope, parameters)
+
+    def _journal_start(self, pipeline, run_id=None, query=None):
+        if self.journal is None:
+            return None
+        return self.journal.start_run(pipeline or self.pipeline or {}, query=query, run_id=run_id)
+
+    def _journaled(self, run_id, events):
+        for event in events:
+            if run_id is not None:
+                self.journal.record_step(run_id, event)
+            yield event
+
+    async def _ajournaled(self, run_id, events):
+        async for event in events:
+            if run_id is not None:
+                self.journal.record_step(run_id, event)
+            yield event
+
+    def _journal_finish(self, run_id, graph, results):
+        if run_id is not None:
+            self.journal.finish_run(run_id, "completed" if all(key in results for key in graph.nodes) else "failed")
+
+    def _scheduler(self, graph, max_workers=None, timeout=None):
+        return PipelineScheduler(
+            graph, max_workers=max_workers or self.max_workers, step_timeout=self.step_timeout,
+            timeout=timeout if timeout is not None else self.pipeline_timeout
+        )
+
+    def run_pipeline_with_dependencies(self, pipeline=None, max_passes=None, max_workers=None, run_id=None, query=None,
+                                       timeout=None, cancel=None):
+        """
+        Executes a structured pipeline that may include method dependencies.
+        Respects dependency ordering using "Class.method" notation in inputs.
+
+        The dependency graph is built once and every step whose inputs are ready is dispatched
+        concurrently on a thread pool of max_workers threads (max_workers=1 runs steps inline).
+        max_passes is accepted for backwards compatibility and no longer limits chain length.
+
+        With a journal, the run is recorded under run_id (a new id by default; see resume_run)
+        and query is stored alongside the plan.
+
+        timeout overrides pipeline_timeout for this run, and cancelling the CancelToken passed as
+        cancel stops it (see AutoClass.scheduler.CancelToken). A step that fails, times out or is
+        cancelled never blocks the run: its dependents are skipped immediately. Use
+        iter_pipeline_with_dependencies or a session for the per-step outcomes.
+        """
+        scope, graph, on_result = self._start_run(pipeline)
+        run_id = self._journal_start(pipeline, run_id, query)
+        return self._execute(scope, graph, on_result, max_workers, run_id, timeout=timeout, cancel=cancel)
+
+    def _execute(self, scope, graph, on_result, max_workers, run_id, completed=None, timeout=None, cancel=None):
+        scheduler = self._scheduler(graph, max_workers, timeout)
+        for _ in self._iter_execute(scheduler, scope, on_result, run_id, completed, cancel):
+            pass
+        return scheduler.results
+
+    def _iter_execute(self, scheduler, scope, on_result, run_id, completed=None, cancel=None):
+        events = scheduler.iter_run(
+            self._invoke_step, scope,
+            on_result=on_result, on_error=self._report_error, completed=completed, cancel=cancel
+        )
+        yield from self._journaled(run_id, events)
+
+        # Final report
+        self._report_unresolved(scheduler.graph, scheduler.results, scheduler.outcomes)
+        self._journal_finish(run_id, scheduler.graph, scheduler.results)
+
+    async def arun_pipeline_with_dependencies(self, pipeline=None, max_workers=None, run_id=None, query=None,
+                                              timeout=None, cancel=None):
+        """
+        Async counterpart of run_pipeline_with_dependencies.
+        Coroutine methods are awaited directly, sync methods run in the loop's default executor,
+        and independent steps are scheduled together with asyncio.gather. Timed-out and
+        cancelled coroutine steps are cancelled; sync steps are abandoned.
+        """
+        scope, graph, on_result = self._start_run(pipeline)
+        run_id = self._journal_start(pipeline, run_id, query)
+        return await self._aexecute(scope, graph, on_result, max_workers, run_id, timeout=timeout, cancel=cancel)
+
+    async def _aexecute(self, scope, graph, on_result, max_workers, run_id, completed=None, timeout=None, cancel=None):
+        scheduler = self._scheduler(graph, max_workers, timeout)
+        async for _ in self._aiter_execute(scheduler, scope, on_result, run_id, completed, cancel):
+            pass
+        return scheduler.results
+
+    async def _aiter_execute(self, scheduler, scope, on_result, run_id, completed=None, cancel=None):
+        events = scheduler.aiter_run(
+            self._ainvoke_step, scope,
+            on_result=on_result, on_error=self._report_error, completed=completed, cancel=cancel
+        )
+        async for event in self._ajournaled(run_id, events):
+            yield event
+
+        self._report_unresolved(scheduler.graph, scheduler.results, scheduler.outcomes)
+        self._journal_finish(run_id, scheduler.graph, scheduler.results)
+
+    def iter_pipeline_with_dependencies(self, pipeline=None, max_workers=None, run_id=None, query=None,
+                                        timeout=None, cancel=None, completed=None):
+        """
+        Streaming form of run_pipeline_with_dependencies: yields one event per step as soon as it
+        completes, so callers can render progressively:
+
+        {"type": "step", "key", "inputs", "status": "ok" | "error" | "timeout" | "cancelled" | "skipped",
+         "output", "error", "cause": what a skipped step was waiting on,
+         "started": epoch seconds, "duration": seconds}
+
+        Every step of the pipeline gets exactly one event, except those whose outputs are passed
+        in completed ({"Class.method": output}): they are reused, not run (see AgentSession.rerun).
+        """
+        scope, graph, on_result = self._start_run(pipeline, completed)
+        completed = {key: output for key, output in (completed or {}).items() if key in graph.nodes}
+        run_id = self._journal_start(pipeline, run_id, query)
+        scheduler = self._scheduler(graph, max_workers, timeout)
+        yield from self._iter_execute(scheduler, scope, on_result, run_id, completed, cancel)
+
+    async def aiter_pipeline_with_dependencies(self, pipeline=None, max_workers=None, run_id=None, query=None,
+                                               timeout=None, cancel=None, completed=None):
+        """
+        Async-iterator form of iter_pipeline_with_dependencies.
+        """
+        scope, graph, on_result = self._start_run(pipeline, completed)
+        completed = {key: output for key, output in (completed or {}).items() if key in graph.nodes}
+        run_id = self._journal_start(pipeline, run_id, query)
+        scheduler = self._scheduler(graph, max_workers, timeout)
+        async for event in self._aiter_execute(scheduler, scope, on_result, run_id, completed, cancel):
+            yield event
+
+
+    def _resume(self, run_id):
+        """
+        Returns (scope, graph, on_result, completed) for a journaled run. A journaled output is
+        reused only when its step's inputs, resolved against the reused outputs, hash the same as
+        when it ran; everything downstream of a step that changed is recomputed.
+        """
+        if self.journal is None:
+            raise ValueError("resume_run needs an Agent created with journal=...")
+        record = self.journal.run(run_id)
+        if record is None:
+            raise KeyError(f"Unknown run '{run_id}'")
+        scope, graph, on_result = self._start_run(record["plan"])
+        journaled = self.journal.completed(run_id)
+        completed = {}
+        for key in graph.order:
+            if key not in journaled or any(dep not in completed for dep in graph.dependencies[key]):
+                continue
+            inputs_hash, output = journaled[key]
+            resolved = resolve_inputs(graph.nodes[key]["inputs"], completed, scope)
+            if inputs_hash is None or stable_hash(resolved) != inputs_hash:
+                continue
+            completed[key] = output
+            on_result(key, output)
+        self.journal.start_run(record["plan"], run_id=run_id)
+        self.logger.info("Resuming run %s: %d of %d steps loaded from the journal", run_id, len(completed), len(graph.nodes))
+        return scope, graph, on_result, completed
+
+    def resume_run(self, run_id, max_workers=None):
+        """
+        Completes a journaled run (see Agent(journal=...)) with the plan it was started with: steps
+        that already succeeded are loaded from the journal, the rest are executed and journaled
+        under the same run_id. No LLM call is made. Returns the results of every step.
+        """
+        scope, graph, on_result, completed = self._resume(run_id)
+        return self._execute(scope, graph, on_result, max_workers, run_id, completed=completed)
+
+    async def aresume_run(self, run_id, max_workers=None):
+        scope, graph, on_result, completed = self._resume(run_id)
+        return await self._aexecute(scope, graph, on_result, max_workers, run_id, completed=completed)
+
+    def _check_entry(self, class_name, method):
+        """
+        Validates and locally repairs one streamed method entry (see PlanValidator). Returns
+        (class_name, entry, issues); entry is None when the method isn't in the catalog.
+        """
+        try:
+            pipeline, issues, _ = self._plan_validator().validate_pipeline(
+                {"classes": [{"class_name": class_name, "methods": [method]}]}
+            )
+        except PlanParseError:
+            return class_name, None, []
+        if not pipeline["classes"]:
+            return class_name, None, []
+        cls = pipeline["classes"][0]
+        return cls["class_name"], cls["methods"][0], issues
+
+    @staticmethod
+    def _same_step(step, other):
+        return {k: v for k, v in step.items() if k != "instance"} == {k: v for k, v in other.items() if k != "instance"}
+
+    def stream_pipeline(self, query, max_workers=None, timeout=None, cancel=None):
+        """
+        Plans a query with a streamed single-round-trip LLM call and executes it, overlapping the two.
+
+        Yields, in order of arrival:
+        - {"type": "token", "text"} for every chunk of the plan
+        - {"type": "plan_step", "key", "inputs"} when a method entry of the plan is complete
+        - {"type": "plan", "pipeline"} once the whole plan has been parsed
+        - step events (see iter_pipeline_with_dependencies) as steps finish
+
+        Steps whose inputs are all literals start as soon as their entry has streamed in; the rest
+        run once the full plan is known. If the streamed plan can't be parsed, the regular
+        plan() flow is used instead.
+
+        Early steps get the same step_timeout and CancelToken handling as the scheduler, and
+        timeout (pipeline_timeout by default) bounds the whole run from the first call. Cancelling
+        cancel while the plan streams stops it; no further steps are started.
+        """
+        parser = PlanStreamParser()
+        scope = self.run_context()
+        # key -> step started early, its future, and its event once finished
+        early, futures, finished = {}, {}, {}
+        pool = ThreadPoolExecutor(max_workers=max_workers or self.max_workers)
+        timeout = timeout if timeout is not None else self.pipeline_timeout
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        def remaining():
+            return None if deadline is None else max(0.0, deadline - time.monotonic())
+
+        def run_early(step):
+            # A one-step scheduler gives the early step the run's deadlines, cancellation and abandonment
+            scheduler = self._scheduler(DependencyGraph([step]), 1, remaining())
+            return list(scheduler.iter_run(self._invoke_step, scope, cancel=cancel))[-1]
+
+        def drain(block=False):
+            for key, future in list(futures.items()):
+                if not (block or future.done()):
+                    continue
+                del futures[key]
+                event = finished[key] = future.result()
+                if event["status"] not in ("ok", "skipped"):
+                    self._report_error(key, event["error"])
+                yield event
+
+        try:
+            message = self._plan_pipeline_message(query)
+            llm_started = self.instrumentation.llm_started("plan_pipeline_stream")
+            usage = (None, None)
+            try:
+                chunks = self.llm.stream([message])
+            except Exception as e:
+                self.instrumentation.llm_finished("plan_pipeline_stream", llm_started, error=e)
+                raise
+            for chunk in chunks:
+                if getattr(chunk, "usage_metadata", None):
+                    usage = usage_tokens(chunk)
+                text = chunk.content
+                if not text:
+                    continue
+                yield {"type": "token", "text": text}
+                for class_name, method in parser.feed(text):
+                    class_name, entry, issues = self._check_entry(class_name, method)
+                    if entry is None:
+                        yield {"type": "plan_step", "key": f"{class_name}.{method.get('method')}",
+                               "inputs": method.get("inputs", {})}
+                        continue
+                    key = f"{class_name}.{entry['method']}"
+                    inputs = entry["inputs"]
+                    yield {"type": "plan_step", "key": key, "inputs": inputs}
+                    # Entries the validator couldn't fix wait for the repaired full plan
+                    instance = self.registered_class.get(class_name)
+                    if issues or instance is None or key not in self.method_docs or key in early:
+                        continue
+                    if any(True for _ in iter_references(inputs)):
+                        continue
+                    step = early[key] = self._make_step(class_name, instance, entry)
+                    futures[key] = pool.submit(run_early, step)
+                yield from drain()
+                if cancel is not None and cancel.cancelled:
+                    break
+            if cancel is not None and cancel.cancelled:
+                self.instrumentation.llm_finished("plan_pipeline_stream", llm_started)
+                yield from drain(block=True)
+                return
+            prompt_tokens, completion_tokens = usage
+            self.instrumentation.llm_finished(
+                "plan_pipeline_stream", llm_started,
+                prompt_tokens if prompt_tokens is not None else count_tokens(message.content, self.prompt_catalog.model_name),
+                completion_tokens if completion_tokens is not None else count_tokens(parser.text, self.prompt_catalog.model_name)
+            )
+
+            pipeline, issues = self._check_pipeline(parser.text.strip())
+            if pipeline.get("classes"):
+                pipeline = self._repair_pipeline(query, pipeline, issues)
+            else:
+                self.logger.warning("Streamed plan unusable, falling back to plan()")
+                pipeline = self.plan(query)
+            yield {"type": "plan", "pipeline": pipeline}
+            yield from drain(block=True)
+        finally:
+            pool.shutdown(wait=True)
+
+        if not pipeline:
+            return
+        graph = self.build_dependency_graph(pipeline, context=scope)
+        self._report_graph(graph)
+        # An early outcome only stands if the final plan kept the same entry; the rest run again
+        reused = {
+            key: event for key, event in finished.items()
+            if key in graph.nodes and self._same_step(early[key], graph.nodes[key])
+        }
+        stale = [key for key in finished if key in graph.nodes and key not in reused]
+        if stale:
+            self.logger.info("Re-running early steps whose plan entry changed: %s", ", ".join(stale))
+        completed = {}
+        for key, event in reused.items():
+            if event["status"] == "ok":
+                completed[key] = event["output"]
+                self._store_result(scope, key, event["output"])
+        # Early steps that failed aren't retried; their dependents are skipped
+        skip = {key for key, event in reused.items() if event["status"] != "ok"}
+        scheduler = self._scheduler(graph, max_workers, remaining())
+        yield from scheduler.iter_run(
+            self._invoke_step, scope,
+            on_result=functools.partial(self._store_result, scope), on_error=self._report_error,
+            completed=completed, skip=skip, cancel=cancel
+        )
+        self._report_unresolved(graph, scheduler.results, scheduler.outcomes)
+
+    async def arun_pipeline(self, query, max_workers=None, use_cache=True, planner=None, run_id=None):
+        """
+        Plans and executes a query end to end without blocking the event loop:
+        aplan (plan cache, then allm_choose_class_method -> allm_determine_input_parameters)
+        -> arun_pipeline_with_dependencies.
+        """
+        session = self.session(query)
+        await session.aplan(use_cache=use_cache, planner=planner)
+        return await session.arun(max_workers=max_workers, run_id=run_id)
+
+    def shutdown(self, wait=True):
+        """
+        Stops the worker processes used by "process" execution policies and removes the
+        temporary spill directory.
+        """
+        self.process_runner.shutdown(wait=wait)
+        if self.spill is not None:
+            self.spill.cleanup()
@@ -0,0 +1,198 @@
+import argparse
+import importlib
+import json
+import sys
+
+from AutoClass.Agent import Agent
+from AutoClass.journal import RUN_STATUSES
+from AutoClass.plan_cache import PlanCache
+from AutoClass.results import summarize_results
+
+
+def load_instances(specs):
+    """
+    {alias: instance} for "module:Class" or "module:Class=alias" specs; classes are
+    instantiated without arguments.
+    """
+    instances = {}
+    for spec in specs or []:
+        target, _, alias = spec.partition("=")
+        module_name, _, class_name = target.partition(":")
+        if not module_name or not class_name:
+            raise ValueError(f"Expected module:Class[=alias], got '{spec}'")
+        cls = getattr(importlib.import_module(module_name), class_name)
+        instances[alias or class_name] = cls()
+    return instances
+
+
+def build_agent(args, instances=None):
+    """
+    Agent for the parsed arguments. With --catalog the snapshot is loaded instead of inspecting
+    the classes again; instances it doesn't describe are registered as usual.
+    """
+    instances = dict(instances or {}, **load_instances(args.register))
+    agent = Agent(
+        model_name=args.model,
+        max_workers=args.workers,
+        plan_cache=PlanCache(path=args.plan_cache) if args.plan_cache else None,
+        journal=args.journal,
+        step_timeout=args.step_timeout
+    )
+    if args.catalog:
+        agent.load_catalog(args.catalog, instances)
+    for alias, instance in instances.items():
+        if alias not in agent.registered_class or agent.registered_class[alias] is None:
+            agent.register_class(instance, alias=alias)
+    return agent
+
+
+def _print_json(value):
+    print(json.dumps(value, indent=4, default=str))
+
+
+def _load_plan(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _report(session):
+    """
+    Prints the results of a session's last run and returns the exit code: 1 if any step didn't succeed.
+    """
+    _print_json(summarize_results(session.results))
+    failed = {key: event for key, event in session.outcomes.items() if event["status"] != "ok"}
+    for key, event in failed.items():
+        reason = event["error"] if event["status"] != "skipped" else f"waiting on {event['cause']}"
+        print(f"{key}: {event['status']} ({reason})", file=sys.stderr)
+    if session.run_id:
+        print(f"run_id: {session.run_id}", file=sys.stderr)
+    return 1 if failed else 0
+
+
+def cmd_methods(agent, args):
+    for method in agent.list_methods():
+        params = ", ".join(f"{name}: {kind}" for name, kind in method["inputs"].items())
+        print(f"{method['class']}.{method['method']}({params})")
+        if method.get("method_description"):
+            print(f"    {method['method_description']}")
+    return 0
+
+
+def cmd_save_catalog(agent, args):
+    agent.save_catalog(args.path)
+    return 0
+
+
+def cmd_plan(agent, args):
+    session = agent.session(args.query or input("Query: "))
+    pipeline = session.plan(use_cache=not args.no_cache)
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(pipeline, f, indent=4)
+    else:
+        _print_json(pipeline)
+    return 0 if pipeline else 1
+
+
+def cmd_run(agent, args):
+    session = agent.session()
+    session.run(_load_plan(args.plan), run_id=args.run_id, timeout=args.timeout)
+    return _report(session)
+
+
+def cmd_query(agent, args):
+    session = agent.session(args.query or input("Query: "))
+    pipeline = session.plan(use_cache=not args.no_cache)
+    if args.show_plan:
+        _print_json(pipeline)
+    session.run(run_id=args.run_id, timeout=args.timeout)
+    return _report(session)
+
+
+def cmd_runs(agent, args):
+    if agent.journal is None:
+        raise SystemExit("runs needs --journal")
+    for run in agent.journal.runs(status=args.status, limit=args.limit):
+        print(f"{run['run_id']}  {run['status']:<9}  {run['query'] or ''}")
+    return 0
+
+
+def cmd_resume(agent, args):
+    if agent.journal is None:
+        raise SystemExit("resume needs --journal")
+    _print_json(summarize_results(agent.resume_run(args.run_id)))
+    return 0 if agent.journal.run(args.run_id)["status"] == "completed" else 1
+
+
+def parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m AutoClass.cli",
+        description="Plan and run pipelines over registered classes. Only planning a query that "
+                    "isn't in the plan cache calls the LLM; listing, running saved plans and "
+                    "resuming runs work offline."
+    )
+    parser.add_argument("--catalog", help="catalog snapshot written by save-catalog (Agent.save_catalog)")
+    parser.add_argument("--register", action="append", metavar="MODULE:CLASS[=ALIAS]",
+                        help="class to instantiate and register; repeatable")
+    parser.add_argument("--plan-cache", metavar="PATH", help="SQLite file that keeps plans across runs")
+    parser.add_argument("--journal", metavar="PATH", help="SQLite run journal, needed by runs and resume")
+    parser.add_argument("--model", default="gpt-4o-mini")
+    parser.add_argument("--workers", type=int, help="steps run concurrently")
+    parser.add_argument("--step-timeout", type=float, metavar="SECONDS")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("methods", help="list the registered methods").set_defaults(func=cmd_methods)
+
+    save = commands.add_parser("save-catalog", help="write a catalog snapshot of the registered classes")
+    save.add_argument("path")
+    save.set_defaults(func=cmd_save_catalog)
+
+    plan = commands.add_parser("plan", help="plan a query and print or save the pipeline")
+    plan.add_argument("query", nargs="?")
+    plan.add_argument("--save", metavar="PATH", help="write the plan to a JSON file for run")
+    plan.add_argument("--no-cache", action="store_true")
+    plan.set_defaults(func=cmd_plan)
+
+    run = commands.add_parser("run", help="execute a saved plan")
+    run.add_argument("plan", help="pipeline JSON, e.g. written by plan --save")
+    run.set_defaults(func=cmd_run)
+
+    query = commands.add_parser("query", help="plan a query and run it")
+    query.add_argument("query", nargs="?")
+    query.add_argument("--show-plan", action="store_true")
+    query.add_argument("--no-cache", action="store_true")
+    query.set_defaults(func=cmd_query)
+
+    for command in (run, query):
+        command.add_argument("--run-id")
+        command.add_argument("--timeout", type=float, metavar="SECONDS", help="deadline for the whole run")
+
+    runs = commands.add_parser("runs", help="list journaled runs")
+    runs.add_argument("--status", choices=RUN_STATUSES)
+    runs.add_argument("--limit", type=int, default=20)
+    runs.set_defaults(func=cmd_runs)
+
+    resume = commands.add_parser("resume", help="finish a failed or interrupted journaled run")
+    resume.add_argument("run_id")
+    resume.set_defaults(func=cmd_resume)
+    return parser
+
+
+def main(argv=None, instances=None):
+    """
+    Runs the command line and returns the exit code. instances ({alias: object}) are registered
+    in addition to the --register classes, so a script can expose its own classes:
+
+        if __name__ == "__main__":
+            sys.exit(main(instances={"ArithmeticOperations": ArithmeticOperations()}))
+    """
+    args = parser().parse_args(argv)
+    agent = build_agent(args, instances)
+    try:
+        return args.func(agent, args)
+    finally:
+        agent.shutdown()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+import threading
+import time
+from collections import ChainMap, OrderedDict
+from collections.abc import Mapping
+from types import MappingProxyType
+
+
+class ResultStore(Mapping):
+    """
+    Bounded store for step outputs that are kept across runs (see Agent(persist=...)).
+
+    - maxsize: number of entries kept; least recently used entries are evicted first
+    - ttl: seconds an entry stays visible (None keeps it until evicted)
+
+    It is a read-only Mapping for lookups, so it can sit in a RunContext chain; writes go
+    through set().
+    """
+
+    def __init__(self, maxsize=1024, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _expired(self, stored):
+        return self.ttl is not None and time.monotonic() - stored > self.ttl
+
+    def __getitem__(self, key):
+        with self._lock:
+            value, stored = self._entries[key]
+            if self._expired(stored):
+                del self._entries[key]
+                raise KeyError(key)
+            self._entries.move_to_end(key)
+            return value
+
+    def __contains__(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False
+            if self._expired(entry[1]):
+                del self._entries[key]
+                return False
+            return True
+
+    def __iter__(self):
+        self.prune()
+        with self._lock:
+            return iter(list(self._entries))
+
+    def __len__(self):
+        return len(self._entries)
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def prune(self):
+        """
+        Drops expired entries; lookups also skip them lazily.
+        """
+        if self.ttl is None:
+            return
+        with self._lock:
+            for key in [k for k, (_, stored) in self._entries.items() if self._expired(stored)]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class RunContext(ChainMap):
+    """
+    Context a single pipeline run resolves "Class.method" references against.
+
+    Lookups go through the run's own results first, then the persisted ResultStore, then a
+    read-only view of the agent's catalog. Writes only touch the run's own layer, which is
+    discarded with the RunContext, so nothing accumulates in the agent between runs.
+    """
+
+    def __init__(self, catalog, store=None):
+        layers = [{}]
+        if store is not None:
+            layers.append(store)
+        layers.append(MappingProxyType(catalog))
+        super().__init__(*layers)
+
+    @property
+    def local(self):
+        return self.maps[0]
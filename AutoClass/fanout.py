@@ -0,0 +1,116 @@
+import inspect
+import math
+from concurrent.futures import ThreadPoolExecutor
+
+from AutoClass.scheduler import run_awaitable
+
+BATCH_ATTRIBUTE = "__autoclass_batch_of__"
+
+
+def batch_of(method_name):
+    """
+    Marks a method as the batch-capable variant of method_name, used when a pipeline maps
+    method_name over a list:
+
+        def count_words(self, text): ...
+
+        @batch_of("count_words")
+        def count_words_many(self, text): ...   # text is a list, returns a list
+
+    The batch variant gets the same parameters with every mapped one replaced by a list of
+    items and must return one output per item, in order. The same can be declared with a
+    ":batch_of: count_words" line in the docstring.
+    """
+    def mark(f):
+        setattr(f, BATCH_ATTRIBUTE, method_name)
+        return f
+    return mark
+
+
+def mapped_params(entry):
+    """
+    Normalizes the "map" field of a pipeline method entry (or flattened step) to a tuple of
+    parameter names; () means the step is called once.
+    """
+    mapped = entry.get("map")
+    if not mapped:
+        return ()
+    if isinstance(mapped, str):
+        return (mapped,)
+    return tuple(mapped)
+
+
+def item_count(inputs, mapped):
+    """
+    Number of items a mapped step runs over. Every mapped input must be a list or tuple and
+    all of them must have the same length (they are zipped).
+    """
+    lengths = set()
+    for param in mapped:
+        if param not in inputs:
+            raise TypeError(f"Mapped input '{param}' is missing")
+        value = inputs[param]
+        if not isinstance(value, (list, tuple)):
+            raise TypeError(f"Mapped input '{param}' must be a list, got {type(value).__name__}")
+        lengths.add(len(value))
+    if len(lengths) > 1:
+        raise ValueError(f"Mapped inputs have different lengths: {sorted(lengths)}")
+    return lengths.pop() if lengths else 0
+
+
+def split_chunks(inputs, mapped, size):
+    """
+    Splits the mapped inputs into chunks of at most size items; unmapped inputs are shared.
+    Each chunk is an inputs dict whose mapped params hold a list slice.
+    """
+    count = item_count(inputs, mapped)
+    return [
+        {param: list(value[start:start + size]) if param in mapped else value for param, value in inputs.items()}
+        for start in range(0, count, size)
+    ]
+
+
+def run_chunk(method, batch, inputs, mapped):
+    """
+    Runs one chunk: a single call of the batch variant when there is one, otherwise one
+    call of method per item. Returns the list of outputs.
+    """
+    if batch is not None:
+        outputs = batch(**inputs)
+        if inspect.isawaitable(outputs):
+            outputs = run_awaitable(outputs)
+        outputs = list(outputs)
+        expected = item_count(inputs, mapped)
+        if len(outputs) != expected:
+            raise ValueError(f"Batch variant returned {len(outputs)} outputs for {expected} items")
+        return outputs
+    outputs = []
+    for values in zip(*(inputs[param] for param in mapped)):
+        output = method(**dict(inputs, **dict(zip(mapped, values))))
+        if inspect.isawaitable(output):
+            output = run_awaitable(output)
+        outputs.append(output)
+    return outputs
+
+
+def chunk_size_for(count, workers, chunk_size=None):
+    """
+    Explicit chunk_size, or enough chunks to give every worker about four, so uneven items
+    still balance without paying per-item dispatch.
+    """
+    if chunk_size:
+        return max(1, int(chunk_size))
+    return max(1, math.ceil(count / (max(1, workers) * 4)))
+
+
+def fan_out(run, chunks, max_workers):
+    """
+    Runs run(chunk) for every chunk on up to max_workers threads and concatenates the
+    outputs in item order.
+    """
+    if len(chunks) <= 1 or max_workers <= 1:
+        results = [run(chunk) for chunk in chunks]
+    else:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks))) as pool:
+            results = list(pool.map(run, chunks))
+    return [output for outputs in results for output in outputs]
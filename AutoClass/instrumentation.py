@@ -0,0 +1,170 @@
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+
+# Library logger. Hot-path messages (step execution, cache hits) are logged at DEBUG/INFO and
+# are therefore silent unless the application configures logging; warnings and errors still
+# reach stderr through logging's last-resort handler.
+logger = logging.getLogger("AutoClass")
+
+HOOK_EVENTS = ("step_start", "step_end", "llm_start", "llm_end")
+
+
+def _label_string(labels):
+    if not labels:
+        return ""
+    parts = []
+    for name, value in sorted(labels.items()):
+        value = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        parts.append(f'{name}="{value}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def usage_tokens(response):
+    """
+    (prompt_tokens, completion_tokens) reported by a LangChain message, or (None, None).
+    """
+    usage = getattr(response, "usage_metadata", None)
+    if usage:
+        return usage.get("input_tokens"), usage.get("output_tokens")
+    metadata = getattr(response, "response_metadata", None) or {}
+    usage = metadata.get("token_usage") or metadata.get("usage") or {}
+    return usage.get("prompt_tokens"), usage.get("completion_tokens")
+
+
+class Instrumentation:
+    """
+    Collects timings and counters for an Agent and dispatches them to callback hooks.
+
+    Hooks receive one dict per event:
+    - step_start: key, inputs
+    - step_end: key, status, wall_seconds, cpu_seconds, error
+    - llm_start: call, prompt_tokens
+    - llm_end: call, status, latency_seconds, prompt_tokens, completion_tokens, retries, error
+
+    Metrics are exported with to_prometheus() (text exposition format) or to_json().
+    """
+
+    def __init__(self):
+        self.hooks = defaultdict(list)
+        self._lock = threading.Lock()
+        self.counters = defaultdict(float)
+        self.summaries = {}
+
+    def add_hook(self, event, callback):
+        if event not in HOOK_EVENTS:
+            raise ValueError(f"Unknown instrumentation event '{event}', expected one of {HOOK_EVENTS}")
+        self.hooks[event].append(callback)
+        return callback
+
+    def remove_hook(self, event, callback):
+        if callback in self.hooks.get(event, []):
+            self.hooks[event].remove(callback)
+
+    def emit(self, event, **payload):
+        callbacks = self.hooks.get(event)
+        if not callbacks:
+            return
+        payload["event"] = event
+        for callback in list(callbacks):
+            try:
+                callback(payload)
+            except Exception:
+                logger.exception("Instrumentation hook for %s failed", event)
+
+    def inc(self, name, labels=None, amount=1):
+        with self._lock:
+            self.counters[(name, tuple(sorted((labels or {}).items())))] += amount
+
+    def observe(self, name, value, labels=None):
+        key = (name, tuple(sorted((labels or {}).items())))
+        with self._lock:
+            summary = self.summaries.get(key)
+            if summary is None:
+                self.summaries[key] = {"count": 1, "sum": value, "min": value, "max": value}
+            else:
+                summary["count"] += 1
+                summary["sum"] += value
+                summary["min"] = min(summary["min"], value)
+                summary["max"] = max(summary["max"], value)
+
+    # Recording helpers used by Agent
+
+    def step_started(self, key, inputs):
+        self.emit("step_start", key=key, inputs=inputs)
+        return time.perf_counter(), time.thread_time()
+
+    def step_finished(self, key, started, error=None, cpu=True):
+        wall = time.perf_counter() - started[0]
+        cpu_seconds = time.thread_time() - started[1] if cpu else None
+        status = "error" if error is not None else "ok"
+        self.observe("autoclass_step_wall_seconds", wall, {"step": key})
+        if cpu_seconds is not None:
+            self.observe("autoclass_step_cpu_seconds", cpu_seconds, {"step": key})
+        self.inc("autoclass_steps_total", {"step": key, "status": status})
+        self.emit("step_end", key=key, status=status, wall_seconds=wall, cpu_seconds=cpu_seconds, error=error)
+
+    def llm_started(self, call, prompt_tokens=None):
+        self.emit("llm_start", call=call, prompt_tokens=prompt_tokens)
+        return time.perf_counter()
+
+    def llm_finished(self, call, started, prompt_tokens=None, completion_tokens=None, retries=0, error=None):
+        latency = time.perf_counter() - started
+        status = "error" if error is not None else "ok"
+        self.observe("autoclass_llm_latency_seconds", latency, {"call": call})
+        self.inc("autoclass_llm_calls_total", {"call": call, "status": status})
+        if prompt_tokens:
+            self.inc("autoclass_llm_prompt_tokens_total", {"call": call}, prompt_tokens)
+        if completion_tokens:
+            self.inc("autoclass_llm_completion_tokens_total", {"call": call}, completion_tokens)
+        if retries:
+            self.inc("autoclass_llm_retries_total", {"call": call}, retries)
+        self.emit(
+            "llm_end", call=call, status=status, latency_seconds=latency, prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens, retries=retries, error=error
+        )
+
+    def cache_lookup(self, cache, hit):
+        self.inc("autoclass_cache_hits_total" if hit else "autoclass_cache_misses_total", {"cache": cache})
+
+    # Exporters
+
+    def snapshot(self):
+        with self._lock:
+            counters = [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(self.counters.items())
+            ]
+            summaries = [
+                {"name": name, "labels": dict(labels), **summary}
+                for (name, labels), summary in sorted(self.summaries.items())
+            ]
+        return {"counters": counters, "summaries": summaries}
+
+    def to_json(self, **kwargs):
+        return json.dumps(self.snapshot(), **kwargs)
+
+    def to_prometheus(self):
+        data = self.snapshot()
+        lines, typed = [], set()
+        for counter in data["counters"]:
+            if counter["name"] not in typed:
+                lines.append(f"# TYPE {counter['name']} counter")
+                typed.add(counter["name"])
+            lines.append(f"{counter['name']}{_label_string(counter['labels'])} {counter['value']}")
+        for summary in data["summaries"]:
+            name = summary["name"]
+            if name not in typed:
+                lines.append(f"# TYPE {name} summary")
+                typed.add(name)
+            labels = _label_string(summary["labels"])
+            lines.append(f"{name}_count{labels} {summary['count']}")
+            lines.append(f"{name}_sum{labels} {summary['sum']}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.summaries.clear()
@@ -0,0 +1,212 @@
+import hashlib
+import inspect
+import re
+import threading
+import typing
+import weakref
+
+from AutoClass.fanout import BATCH_ATTRIBUTE
+from AutoClass.memo import PURE_ATTRIBUTE
+
+DESCRIPTION_PREFIX = "- description:"
+PARAM_PATTERN = re.compile(r"- param (\w+): .*?:type:\s*(.*)")
+EXECUTION_PATTERN = re.compile(r":execution:\s*(\w+)")
+PURE_PATTERN = re.compile(r":pure:(?:\s*(true|yes|false|no)\b)?", re.IGNORECASE)
+BATCH_PATTERN = re.compile(r":batch_of:\s*(\w+)")
+
+_cache = weakref.WeakKeyDictionary()
+_cache_lock = threading.Lock()
+
+
+def parse_docstring(docstring):
+    """
+    Parses a structured docstring with:
+    - Description
+    - Parameters (with types)
+    - Return or rtype
+    - Optional execution policy tag (":execution: process")
+    - Optional ":pure:" tag marking the method safe to memoize (":pure: false" or ":pure: no"
+      mark it explicitly impure)
+
+    Returns:
+    {
+        description: str,
+        inputs: dict,
+        output: str,
+        execution: str (only when tagged),
+        pure: bool (only when tagged)
+    }
+    """
+
+    def strip_tag(line, tag):
+        return (line[:tag.start()].rstrip() + " " + line[tag.end():].lstrip()).strip()
+
+    parsed = {
+        "description": "",
+        "inputs": {},
+        "output": ""
+    }
+
+    for line in docstring.strip().splitlines():
+        line = line.strip()
+        tag = EXECUTION_PATTERN.search(line)
+        if tag:
+            parsed["execution"] = tag.group(1).lower()
+            line = strip_tag(line, tag)
+        tag = PURE_PATTERN.search(line)
+        if tag:
+            parsed["pure"] = (tag.group(1) or "true").lower() in ("true", "yes")
+            line = strip_tag(line, tag)
+        if line.lower().startswith(DESCRIPTION_PREFIX):
+            parsed["description"] = line.split(":", 1)[1].strip()
+
+        elif line.startswith("- param"):
+            match = PARAM_PATTERN.match(line)
+            if match:
+                param, param_type = match.groups()
+                parsed["inputs"][param] = param_type
+
+        elif line.startswith(":rtype:"):
+            parsed["output"] = line.split(":", 1)[1].strip()
+        elif line.startswith(":return:") and not parsed["output"]:
+            parsed["output"] = line.split(":", 1)[1].strip()
+
+    return parsed
+
+
+def _public_methods(cls):
+    """
+    Walks the MRO dictionaries directly (much cheaper than inspect.getmembers on an instance)
+    and returns {name: function} for the public methods an instance would expose as bound methods.
+    """
+    found = {}
+    for klass in reversed(cls.__mro__):
+        if klass is object:
+            continue
+        for name, attr in vars(klass).items():
+            if name.startswith("_"):
+                continue
+            if isinstance(attr, classmethod):
+                found[name] = attr.__func__
+            elif inspect.isfunction(attr):
+                found[name] = attr
+            else:
+                found.pop(name, None)
+    return dict(sorted(found.items()))
+
+
+def class_source_hash(cls, methods=None):
+    """
+    Hash of everything the parsed metadata depends on: method names, bytecode, constants,
+    signatures and docstrings. Redefining or monkeypatching a method changes it.
+    """
+    methods = methods if methods is not None else _public_methods(cls)
+    digest = hashlib.sha256((cls.__doc__ or "").encode())
+    for name, func in methods.items():
+        code = func.__code__
+        digest.update(name.encode())
+        digest.update(code.co_code)
+        digest.update(repr(code.co_consts).encode())
+        digest.update(repr(code.co_varnames[:code.co_argcount + code.co_kwonlyargcount]).encode())
+        digest.update(repr(getattr(func, "__annotations__", None)).encode())
+    return digest.hexdigest()
+
+
+def _type_name(annotation):
+    if annotation is inspect.Parameter.empty:
+        return ""
+    if isinstance(annotation, type):
+        return annotation.__name__
+    return str(annotation).replace("typing.", "")
+
+
+def _signature_inputs(func, doc_inputs):
+    """
+    Uses the function signature as the source of truth for parameter names, taking types from
+    annotations first and from the docstring otherwise. Falls back to the docstring when the
+    signature can't be read or accepts **kwargs.
+    """
+    try:
+        signature = inspect.signature(func)
+    except (TypeError, ValueError):
+        return dict(doc_inputs), ""
+    try:
+        hints = typing.get_type_hints(func)
+    except Exception:
+        hints = {}
+
+    inputs = {}
+    params = list(signature.parameters.values())[1:]  # drop self / cls
+    for param in params:
+        if param.kind is param.VAR_KEYWORD:
+            for name, doc_type in doc_inputs.items():
+                inputs.setdefault(name, doc_type)
+            continue
+        if param.kind is param.VAR_POSITIONAL:
+            continue
+        annotated = _type_name(hints.get(param.name, param.annotation))
+        inputs[param.name] = doc_inputs.get(param.name) or annotated or "Any"
+    return inputs, _type_name(hints.get("return", signature.return_annotation))
+
+
+def batch_variants(cls):
+    """
+    Returns {method_name: batch_method_name} for the methods marked with @batch_of or a
+    ":batch_of: method_name" docstring line.
+    """
+    variants = {}
+    for name, func in _public_methods(cls).items():
+        target = getattr(func, BATCH_ATTRIBUTE, None)
+        if target is None:
+            tag = BATCH_PATTERN.search(func.__doc__ or "")
+            target = tag.group(1) if tag else None
+        if target is not None and target != name:
+            variants[target] = name
+    return variants
+
+
+def extract_class_metadata(cls):
+    """
+    Returns (class_description, [method metadata]) for a class, memoized per class object
+    and invalidated when class_source_hash changes. Callers get fresh copies they may mutate.
+    """
+    methods = _public_methods(cls)
+    # Same function objects means same source; only hash bytecode when something was swapped
+    identity = tuple((name, id(func), id(func.__code__)) for name, func in methods.items())
+    with _cache_lock:
+        cached = _cache.get(cls)
+    if cached is not None and cached[0] == identity:
+        source_hash = cached[1]
+    else:
+        source_hash = class_source_hash(cls, methods)
+    if cached is None or cached[1] != source_hash:
+        parsed_methods = []
+        for name, func in methods.items():
+            doc = inspect.getdoc(func)
+            if not doc:
+                continue
+            parsed = parse_docstring(doc)
+            inputs, return_type = _signature_inputs(func, parsed["inputs"])
+            entry = {
+                "method": name,
+                "method_description": parsed["description"],
+                "inputs": inputs,
+                "output": parsed["output"] or return_type,
+                "raw_doc": doc
+            }
+            if "execution" in parsed:
+                entry["execution"] = parsed["execution"]
+            marker = getattr(func, PURE_ATTRIBUTE, None)
+            if marker is not None or parsed.get("pure"):
+                entry["pure"] = {"ttl": (marker or {}).get("ttl")}
+            parsed_methods.append(entry)
+        cached = (identity, source_hash, inspect.getdoc(cls) or "", parsed_methods)
+        with _cache_lock:
+            _cache[cls] = cached
+    elif cached[0] != identity:
+        cached = (identity,) + cached[1:]
+        with _cache_lock:
+            _cache[cls] = cached
+
+    _, _, class_doc, parsed_methods = cached
+    return class_doc, [dict(m, inputs=dict(m["inputs"])) for m in parsed_methods]
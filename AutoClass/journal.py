@@ -0,0 +1,165 @@
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import uuid
+
+from AutoClass.memo import stable_hash
+from AutoClass.results import ArrayHandle, to_handle
+
+RUN_STATUSES = ("running", "completed", "failed")
+
+
+class RunJournal:
+    """
+    Append-only SQLite journal of pipeline runs, used to resume a failed or interrupted run
+    without re-planning or recomputing the steps that already finished.
+
+    - runs: one row per run with its plan, query and status
+    - steps: one row per finished step attempt with the hash of its resolved inputs, its
+      status and its pickled output (or error); rows are only ever appended
+
+    Every step is committed as it finishes, so a crashed process loses at most the steps that
+    were in flight. Outputs that can't be pickled are journaled without a value and are
+    recomputed on resume. Memory-mapped arrays (spilled outputs included) are journaled as an
+    ArrayHandle to their file rather than a copy of the data, and are recomputed on resume once
+    the file is gone. path=":memory:" keeps the journal for the life of the process.
+    """
+
+    def __init__(self, path=":memory:"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS runs (
+                run_id TEXT PRIMARY KEY, query TEXT, plan TEXT NOT NULL, status TEXT NOT NULL,
+                created REAL NOT NULL, updated REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS steps (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, run_id TEXT NOT NULL, key TEXT NOT NULL,
+                inputs_hash TEXT, status TEXT NOT NULL, output BLOB, stored INTEGER NOT NULL,
+                error TEXT, started REAL, duration REAL
+            );
+            CREATE INDEX IF NOT EXISTS steps_run ON steps (run_id, key);
+            """
+        )
+        self._db.commit()
+
+    def start_run(self, plan, query=None, run_id=None):
+        """
+        Records a new run and returns its id. Starting an existing run_id again (a resume)
+        keeps its steps and marks it running.
+        """
+        run_id = run_id or uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO runs (run_id, query, plan, status, created, updated) VALUES (?, ?, ?, 'running', ?, ?) "
+                "ON CONFLICT(run_id) DO UPDATE SET status = 'running', updated = excluded.updated",
+                (run_id, query, json.dumps(plan, default=str), now, now)
+            )
+            self._db.commit()
+        return run_id
+
+    def record_step(self, run_id, event):
+        """
+        Appends a finished step event (see AutoClass.scheduler.step_event).
+        """
+        output, stored = None, 0
+        if event["status"] == "ok":
+            try:
+                output, stored = pickle.dumps(to_handle(event["output"]), protocol=pickle.HIGHEST_PROTOCOL), 1
+            except Exception:
+                pass
+        error = None if event["error"] is None else f"{type(event['error']).__name__}: {event['error']}"
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO steps (run_id, key, inputs_hash, status, output, stored, error, started, duration) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (run_id, event["key"], stable_hash(event["inputs"]), event["status"], output, stored, error,
+                 event["started"], event["duration"])
+            )
+            self._db.commit()
+
+    def finish_run(self, run_id, status):
+        if status not in RUN_STATUSES:
+            raise ValueError(f"Unknown run status '{status}', expected one of {RUN_STATUSES}")
+        with self._lock:
+            self._db.execute("UPDATE runs SET status = ?, updated = ? WHERE run_id = ?", (status, time.time(), run_id))
+            self._db.commit()
+
+    def run(self, run_id):
+        """
+        Returns {"run_id", "query", "plan", "status", "created", "updated"} or None.
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT run_id, query, plan, status, created, updated FROM runs WHERE run_id = ?", (run_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "run_id": row[0], "query": row[1], "plan": json.loads(row[2]),
+            "status": row[3], "created": row[4], "updated": row[5],
+        }
+
+    def runs(self, status=None, limit=100):
+        """
+        Most recent runs first, optionally only those with the given status.
+        """
+        query = "SELECT run_id, query, status, created, updated FROM runs"
+        args = ()
+        if status is not None:
+            query += " WHERE status = ?"
+            args = (status,)
+        with self._lock:
+            rows = self._db.execute(query + " ORDER BY updated DESC LIMIT ?", args + (limit,)).fetchall()
+        return [
+            {"run_id": r[0], "query": r[1], "status": r[2], "created": r[3], "updated": r[4]}
+            for r in rows
+        ]
+
+    def steps(self, run_id):
+        """
+        Every journaled attempt of a run, oldest first, without outputs.
+        """
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT key, inputs_hash, status, stored, error, started, duration FROM steps "
+                "WHERE run_id = ? ORDER BY id", (run_id,)
+            ).fetchall()
+        return [
+            {"key": r[0], "inputs_hash": r[1], "status": r[2], "stored": bool(r[3]),
+             "error": r[4], "started": r[5], "duration": r[6]}
+            for r in rows
+        ]
+
+    def completed(self, run_id):
+        """
+        {key: (inputs_hash, output)} for the latest successful, stored attempt of each step;
+        journaled ArrayHandles are mapped again.
+        """
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT key, inputs_hash, output FROM steps WHERE run_id = ? AND status = 'ok' AND stored = 1 "
+                "ORDER BY id", (run_id,)
+            ).fetchall()
+        completed = {}
+        for key, inputs_hash, output in rows:
+            try:
+                output = pickle.loads(output)
+                if isinstance(output, ArrayHandle):
+                    if not os.path.exists(output.path):
+                        raise FileNotFoundError(output.path)
+                    output = output.open()
+                completed[key] = (inputs_hash, output)
+            except Exception:
+                completed.pop(key, None)
+        return completed
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,107 @@
+import asyncio
+import threading
+import time
+
+from AutoClass.prompt_catalog import count_tokens
+
+_shared_clients = {}
+_shared_lock = threading.Lock()
+
+
+def shared_llm(model_name="gpt-4o-mini", temperature=0.7):
+    """
+    Process-wide ChatOpenAI client per (model_name, temperature).
+
+    Agents built with the same settings reuse one client and therefore one pooled HTTP
+    connection, so new agents and sessions don't pay for another TLS handshake.
+    """
+    key = (model_name, temperature)
+    with _shared_lock:
+        client = _shared_clients.get(key)
+        if client is None:
+            from langchain_community.chat_models import ChatOpenAI
+            client = _shared_clients[key] = ChatOpenAI(model_name=model_name, temperature=temperature)
+        return client
+
+
+class ScriptedMessage:
+    """
+    Minimal stand-in for a LangChain AIMessage / AIMessageChunk: content plus usage_metadata.
+    """
+
+    def __init__(self, content, usage_metadata=None):
+        self.content = content
+        self.usage_metadata = usage_metadata
+        self.response_metadata = {}
+
+    def __repr__(self):
+        return f"ScriptedMessage({self.content!r})"
+
+
+class ScriptedLLM:
+    """
+    Deterministic, offline LLM backend for tests and benchmarks: Agent(llm=ScriptedLLM(...)).
+
+    Implements the parts of the LangChain chat model interface the Agent uses (invoke, ainvoke,
+    batch, abatch, stream). Each call answers with the next entry of responses; once those run
+    out, responder(prompt_text) is called, and without a responder the answer is "{}".
+
+    - latency: seconds slept per call, to simulate network round trips
+    - chunk_size: characters per chunk yielded by stream()
+    - calls: prompts received so far, in order
+    """
+
+    def __init__(self, responses=None, responder=None, latency=0.0, chunk_size=16, model_name="gpt-4o-mini"):
+        self.responses = list(responses or [])
+        self.responder = responder
+        self.latency = latency
+        self.chunk_size = chunk_size
+        self.model_name = model_name
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def _answer(self, messages):
+        prompt = "\n".join(getattr(m, "content", str(m)) for m in messages)
+        with self._lock:
+            self.calls.append(prompt)
+            text = self.responses.pop(0) if self.responses else None
+        if text is None:
+            text = self.responder(prompt) if self.responder else "{}"
+        usage = {
+            "input_tokens": count_tokens(prompt, self.model_name),
+            "output_tokens": count_tokens(text, self.model_name),
+        }
+        usage["total_tokens"] = usage["input_tokens"] + usage["output_tokens"]
+        return ScriptedMessage(text, usage)
+
+    def invoke(self, messages, config=None, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        return self._answer(messages)
+
+    __call__ = invoke
+
+    async def ainvoke(self, messages, config=None, **kwargs):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._answer(messages)
+
+    def batch(self, inputs, config=None, return_exceptions=False, **kwargs):
+        # Calls in a batch overlap, so the simulated latency is paid once
+        if self.latency:
+            time.sleep(self.latency)
+        return [self._answer(messages) for messages in inputs]
+
+    async def abatch(self, inputs, config=None, return_exceptions=False, **kwargs):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return [self._answer(messages) for messages in inputs]
+
+    def stream(self, messages, config=None, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        message = self._answer(messages)
+        text, size = message.content, max(1, self.chunk_size)
+        for start in range(0, len(text), size):
+            yield ScriptedMessage(text[start:start + size])
+        yield ScriptedMessage("", message.usage_metadata)
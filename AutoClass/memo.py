@@ -0,0 +1,166 @@
+import copy
+import hashlib
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+PURE_ATTRIBUTE = "__autoclass_pure__"
+
+
+def pure(func=None, ttl=None):
+    """
+    Marks a method as deterministic so its results can be memoized by the Agent.
+
+        @pure
+        def count_words(self, text): ...
+
+        @pure(ttl=60)
+        def fetch_rate(self, currency): ...
+
+    The same can be declared with a ":pure:" line in the docstring.
+    """
+    def mark(f):
+        setattr(f, PURE_ATTRIBUTE, {"ttl": ttl})
+        return f
+    return mark(func) if func is not None else mark
+
+
+class _Unhashable(Exception):
+    pass
+
+
+def _feed(digest, value):
+    if value is None or isinstance(value, (bool, int, float, complex, str, bytes)):
+        digest.update(type(value).__name__.encode())
+        digest.update(repr(value).encode())
+    elif isinstance(value, (list, tuple)):
+        digest.update(f"{type(value).__name__}[{len(value)}".encode())
+        for item in value:
+            _feed(digest, item)
+    elif isinstance(value, dict):
+        digest.update(f"dict[{len(value)}".encode())
+        for key in sorted(value, key=repr):
+            _feed(digest, key)
+            _feed(digest, value[key])
+    elif isinstance(value, (set, frozenset)):
+        digest.update(f"set[{len(value)}".encode())
+        for item in sorted(value, key=repr):
+            _feed(digest, item)
+    elif hasattr(value, "tobytes") and hasattr(value, "dtype"):
+        # NumPy arrays: hash the raw buffer instead of a truncated repr
+        digest.update(f"ndarray{getattr(value, 'shape', '')}{value.dtype}".encode())
+        flags = getattr(value, "flags", None)
+        if flags is not None and flags.c_contiguous and not value.dtype.hasobject:
+            # Contiguous (and memory-mapped) arrays are hashed in place, without a tobytes() copy
+            digest.update(memoryview(value).cast("B"))
+        else:
+            digest.update(value.tobytes())
+    else:
+        try:
+            digest.update(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        except Exception as e:
+            raise _Unhashable(e)
+
+
+def stable_hash(value):
+    """
+    Deterministic hash of a (nested) input value, or None when it can't be hashed reliably.
+    """
+    digest = hashlib.sha256()
+    try:
+        _feed(digest, value)
+    except _Unhashable:
+        return None
+    return digest.hexdigest()
+
+
+def _immutable(value):
+    if value is None or isinstance(value, (bool, int, float, complex, str, bytes, frozenset, range)):
+        return True
+    if isinstance(value, tuple):
+        return all(_immutable(item) for item in value)
+    # Read-only NumPy arrays, e.g. spilled memmaps, can't be changed in place
+    flags = getattr(value, "flags", None)
+    return hasattr(value, "dtype") and flags is not None and not flags.writeable
+
+
+def _detached(value):
+    """
+    value itself when it can't be mutated, otherwise a deep copy.
+    """
+    return value if _immutable(value) else copy.deepcopy(value)
+
+
+class ResultCache:
+    """
+    Memoized results of pure methods keyed on ("Class.method", hash of resolved inputs).
+
+    Mutable outputs (lists, dicts, writable arrays, ...) are copied when stored and on every
+    hit, so a step that changes its input can't change what later runs get from the cache.
+
+    - maxsize: number of entries kept; least recently used entries are evicted first
+    - ttl: default seconds an entry stays valid (None keeps it until evicted)
+    """
+
+    def __init__(self, maxsize=1024, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(method_key, inputs):
+        digest = stable_hash(inputs)
+        return None if digest is None else (method_key, digest)
+
+    def get(self, key):
+        """
+        Returns (True, value) on a hit and (False, None) on a miss.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] is not None and time.monotonic() > entry[1]:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            value = entry[0]
+        return True, _detached(value)
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        expires = time.monotonic() + ttl if ttl is not None else None
+        try:
+            value = _detached(value)
+        except Exception:
+            # Outputs that can't be copied aren't memoized
+            return
+        with self._lock:
+            self._entries[key] = (value, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+        }
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,120 @@
+import copy
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def normalize_query(query):
+    """
+    Strips surrounding whitespace only. Case and inner spacing can be arguments
+    ("count words in 'Hello  World'"), and a cache hit must never change the literals a plan runs with.
+    """
+    return (query or "").strip()
+
+
+def catalog_fingerprint(classes):
+    """
+    Hashes the parts of the registered catalog that a plan depends on: class names, method
+    names, their inputs and outputs. Re-registering a class with different methods changes it.
+    """
+    shape = [
+        [
+            cls.get("class_name"),
+            sorted(
+                [m.get("method"), m.get("inputs", {}), m.get("output", "")]
+                for m in cls.get("methods", [])
+            ),
+        ]
+        for cls in classes
+    ]
+    return hashlib.sha256(json.dumps(shape, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class PlanCache:
+    """
+    LRU + TTL cache of filled pipelines keyed on (normalized query, catalog fingerprint).
+
+    - maxsize: number of plans kept in memory
+    - ttl: seconds a plan stays valid (None keeps plans until evicted)
+    - path: optional SQLite file so plans survive restarts
+    """
+
+    def __init__(self, maxsize=256, ttl=3600, path=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS plans (key TEXT PRIMARY KEY, plan TEXT NOT NULL, created REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    @staticmethod
+    def make_key(query, fingerprint):
+        raw = f"{fingerprint}\n{normalize_query(query)}"
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def _expired(self, created):
+        return self.ttl is not None and time.time() - created > self.ttl
+
+    def get(self, key):
+        """
+        Returns a copy of the cached plan, or None on a miss or an expired entry.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None and self._db is not None:
+                row = self._db.execute("SELECT plan, created FROM plans WHERE key = ?", (key,)).fetchone()
+                if row:
+                    entry = (json.loads(row[0]), row[1])
+                    self._remember(key, entry)
+            if entry is None or self._expired(entry[1]):
+                if entry is not None:
+                    self._forget(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return copy.deepcopy(entry[0])
+
+    def set(self, key, plan):
+        entry = (copy.deepcopy(plan), time.time())
+        with self._lock:
+            self._remember(key, entry)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO plans (key, plan, created) VALUES (?, ?, ?)",
+                    (key, json.dumps(plan, default=str), entry[1])
+                )
+                self._db.commit()
+
+    def _remember(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def _forget(self, key):
+        self._entries.pop(key, None)
+        if self._db is not None:
+            self._db.execute("DELETE FROM plans WHERE key = ?", (key,))
+            self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM plans")
+                self._db.commit()
+
+    def __len__(self):
+        return len(self._entries)
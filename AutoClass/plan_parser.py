@@ -0,0 +1,313 @@
+import ast
+import inspect
+import json
+import re
+
+try:
+    import orjson
+except ImportError:  # the standard json module is used instead
+    orjson = None
+
+from AutoClass.scheduler import REFERENCE_PATTERN
+
+FENCE_PATTERN = re.compile(r"```[A-Za-z0-9_-]*\s*\n?(.*?)```", re.DOTALL)
+TRAILING_COMMA = re.compile(r",(\s*[}\]])")
+PY_LITERALS = re.compile(r"\b(True|False|None)\b")
+JSON_LITERALS = re.compile(r"\b(true|false|null)\b")
+TYPE_WORDS = re.compile(r"[A-Za-z_]+")
+
+_PY_TO_JSON = {"True": "true", "False": "false", "None": "null"}
+_JSON_TO_PY = {"true": "True", "false": "False", "null": "None"}
+_TYPES = {
+    "int": int, "integer": int, "float": float, "number": (int, float), "str": str, "string": str,
+    "bool": bool, "boolean": bool, "list": (list, tuple), "tuple": (list, tuple), "dict": dict,
+}
+
+
+class PlanParseError(ValueError):
+    pass
+
+
+def _loads(text):
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
+
+def _outer_span(text, opener, closer):
+    start, end = text.find(opener), text.rfind(closer)
+    return text[start:end + 1] if start != -1 and end > start else None
+
+
+def extract_structure(text):
+    """
+    Parses the dict/list an LLM answered with. Tries, in order: strict JSON (orjson), the
+    outermost {...}/[...] after stripping markdown fences and surrounding prose, a Python
+    literal (single quotes, True/None), and both again with trailing commas removed and
+    JSON/Python constants swapped. Raises PlanParseError when nothing works.
+    """
+    text = (text or "").strip()
+    try:
+        return _loads(text)
+    except ValueError:
+        pass
+
+    fenced = FENCE_PATTERN.search(text)
+    if fenced:
+        text = fenced.group(1).strip()
+    candidates = [c for c in (_outer_span(text, "{", "}"), _outer_span(text, "[", "]"), text) if c]
+    for candidate in dict.fromkeys(candidates):
+        cleaned = TRAILING_COMMA.sub(r"\1", candidate)
+        for attempt in (
+            lambda: _loads(cleaned),
+            lambda: ast.literal_eval(cleaned),
+            lambda: _loads(PY_LITERALS.sub(lambda m: _PY_TO_JSON[m.group(1)], cleaned)),
+            lambda: ast.literal_eval(JSON_LITERALS.sub(lambda m: _JSON_TO_PY[m.group(1)], cleaned)),
+        ):
+            try:
+                return attempt()
+            except (ValueError, SyntaxError, TypeError, MemoryError, RecursionError):
+                continue
+    raise PlanParseError(f"Could not parse LLM response: {text[:200]!r}")
+
+
+def _declared_types(declared):
+    types = []
+    for word in TYPE_WORDS.findall((declared or "").lower()):
+        if word in _TYPES:
+            types.append(_TYPES[word])
+    return tuple(types)
+
+
+def _matches(value, types):
+    for expected in types:
+        options = expected if isinstance(expected, tuple) else (expected,)
+        for option in options:
+            if option is bool and isinstance(value, bool):
+                return True
+            if option is not bool and isinstance(value, option) and not isinstance(value, bool):
+                return True
+            if option is float and isinstance(value, int) and not isinstance(value, bool):
+                return True
+    return False
+
+
+def _coerce(value, types):
+    """
+    Returns (True, converted) when value can be converted to one of types without guessing.
+    """
+    flat = [t for expected in types for t in (expected if isinstance(expected, tuple) else (expected,))]
+    if isinstance(value, str):
+        text = value.strip()
+        if bool in flat and text.lower() in ("true", "false"):
+            return True, text.lower() == "true"
+        if int in flat and re.fullmatch(r"[-+]?\d+", text):
+            return True, int(text)
+        if float in flat:
+            try:
+                return True, float(text)
+            except ValueError:
+                pass
+        if (list in flat or dict in flat) and text[:1] in "[{":
+            try:
+                parsed = extract_structure(text)
+            except PlanParseError:
+                return False, value
+            if _matches(parsed, types):
+                return True, parsed
+    elif isinstance(value, (int, float)) and not isinstance(value, bool) and str in flat:
+        return True, str(value)
+    return False, value
+
+
+class PlanValidator:
+    """
+    Checks parsed LLM output against the registered catalog and repairs it locally.
+
+    Repairs: wrong-case class/method names, unknown inputs (dropped), values that convert
+    cleanly to the declared type ("12" -> 12), "Class.method" entries in a selection, "map"
+    fields naming inputs the method doesn't have.
+    Anything it can't fix is reported as an issue: {"key", "param", "problem"}.
+    """
+
+    def __init__(self, method_docs, instances=None):
+        self.method_docs = method_docs
+        self.instances = instances or {}
+        self.classes = {}
+        for key in method_docs:
+            class_name, _, method_name = key.partition(".")
+            self.classes.setdefault(class_name, {})[method_name] = key
+        self._class_names = {name.lower(): name for name in self.classes}
+
+    def _class(self, name):
+        if not isinstance(name, str):
+            return None
+        return name if name in self.classes else self._class_names.get(name.lower())
+
+    def _method(self, class_name, name):
+        methods = self.classes.get(class_name, {})
+        if not isinstance(name, str):
+            return None
+        if name in methods:
+            return name
+        lowered = {m.lower(): m for m in methods}
+        return lowered.get(name.lower())
+
+    def _required(self, class_name, method_name):
+        instance = self.instances.get(class_name)
+        if instance is None:
+            return ()
+        try:
+            signature = inspect.signature(getattr(instance, method_name))
+        except (AttributeError, TypeError, ValueError):
+            return ()
+        return tuple(
+            name for name, param in signature.parameters.items()
+            if param.default is param.empty and param.kind in (param.POSITIONAL_OR_KEYWORD, param.KEYWORD_ONLY)
+        )
+
+    def validate_selection(self, selection):
+        """
+        Returns ({class_name: [method, ...]}, repairs) for a choose-class-method answer.
+        """
+        repairs, fixed = [], {}
+        if not isinstance(selection, dict):
+            raise PlanParseError("Selection is not a dictionary")
+        for class_name, methods in selection.items():
+            if isinstance(methods, str):
+                methods = [methods]
+            if not isinstance(methods, (list, tuple)):
+                repairs.append(f"ignored malformed entry for {class_name}")
+                continue
+            for method in methods:
+                owner, name = class_name, method
+                if isinstance(method, str) and REFERENCE_PATTERN.match(method):
+                    owner, _, name = method.partition(".")
+                cls = self._class(owner)
+                met = self._method(cls, name) if cls else None
+                if met is None:
+                    repairs.append(f"dropped unknown method {owner}.{name}")
+                    continue
+                if (cls, met) != (owner, name):
+                    repairs.append(f"{owner}.{name} -> {cls}.{met}")
+                if met not in fixed.setdefault(cls, []):
+                    fixed[cls].append(met)
+        return fixed, repairs
+
+    def validate_pipeline(self, pipeline):
+        """
+        Returns (pipeline, issues, repairs) for a filled pipeline. The returned pipeline is a
+        repaired copy; entries with issues are kept so they can be re-asked or reported.
+        """
+        if isinstance(pipeline, list):
+            pipeline = {"classes": pipeline}
+        if not isinstance(pipeline, dict) or not isinstance(pipeline.get("classes"), list):
+            raise PlanParseError("Pipeline has no 'classes' list")
+        issues, repairs, classes = [], [], []
+        for cls in pipeline["classes"]:
+            if not isinstance(cls, dict) or not isinstance(cls.get("methods"), list):
+                repairs.append("dropped malformed class entry")
+                continue
+            class_name = self._class(cls.get("class_name"))
+            if class_name is None:
+                repairs.append(f"dropped unknown class {cls.get('class_name')}")
+                continue
+            methods = []
+            for method in cls["methods"]:
+                if not isinstance(method, dict):
+                    repairs.append(f"dropped malformed method entry in {class_name}")
+                    continue
+                name = self._method(class_name, method.get("method"))
+                if name is None:
+                    repairs.append(f"dropped unknown method {class_name}.{method.get('method')}")
+                    continue
+                entry = dict(method, method=name)
+                entry["inputs"] = self._validate_inputs(class_name, name, method.get("inputs"), issues, repairs)
+                if "map" in entry:
+                    self._validate_map(f"{class_name}.{name}", entry, issues, repairs)
+                methods.append(entry)
+            if methods:
+                classes.append(dict(cls, class_name=class_name, methods=methods))
+        return dict(pipeline, classes=classes), issues, repairs
+
+    def _validate_map(self, key, entry, issues, repairs):
+        mapped = entry.pop("map")
+        if not mapped:
+            return
+        if isinstance(mapped, str):
+            mapped = [mapped]
+        if not isinstance(mapped, (list, tuple)):
+            repairs.append(f"dropped malformed map of {key}")
+            return
+        kept = []
+        for param in mapped:
+            if param not in entry["inputs"]:
+                repairs.append(f"dropped unknown mapped input {key}.{param}")
+                continue
+            value = entry["inputs"][param]
+            if not isinstance(value, (list, tuple)) and not (isinstance(value, str) and REFERENCE_PATTERN.match(value)):
+                issues.append({"key": key, "param": param, "problem": "mapped input must be a list"})
+            kept.append(param)
+        if kept:
+            entry["map"] = kept[0] if len(kept) == 1 else kept
+
+    def _validate_inputs(self, class_name, method_name, inputs, issues, repairs):
+        key = f"{class_name}.{method_name}"
+        declared = self.method_docs[key].get("inputs", {})
+        if not isinstance(inputs, dict):
+            issues.append({"key": key, "param": None, "problem": "inputs is not an object"})
+            return {}
+        fixed = {}
+        for param, value in inputs.items():
+            if declared and param not in declared:
+                repairs.append(f"dropped unknown input {key}.{param}")
+                continue
+            types = _declared_types(declared.get(param))
+            if (
+                not types
+                or (isinstance(value, str) and REFERENCE_PATTERN.match(value))
+                or _matches(value, types)
+                or not isinstance(value, (str, int, float, bool))
+            ):
+                fixed[param] = value
+                continue
+            converted, value = _coerce(value, types)
+            if converted:
+                repairs.append(f"converted {key}.{param} to {declared[param]}")
+            else:
+                issues.append({
+                    "key": key, "param": param,
+                    "problem": f"expected {declared[param]}, got {type(value).__name__} {value!r}"
+                })
+            fixed[param] = value
+        for param in self._required(class_name, method_name):
+            if param not in fixed:
+                issues.append({"key": key, "param": param, "problem": "missing required input"})
+        return fixed
+
+
+def merge_repaired(pipeline, entries):
+    """
+    Replaces the inputs of the methods in pipeline with those of the corrected entries
+    ([{"class_name", "method", "inputs"}] or a {"classes": [...]} pipeline).
+    """
+    if isinstance(entries, dict) and "classes" in entries:
+        entries = [
+            dict(method, class_name=cls.get("class_name"))
+            for cls in entries["classes"] if isinstance(cls, dict)
+            for method in cls.get("methods", []) if isinstance(method, dict)
+        ]
+    if isinstance(entries, dict):
+        entries = [entries]
+    corrected = {
+        (e.get("class_name"), e.get("method")): e.get("inputs")
+        for e in entries if isinstance(e, dict) and isinstance(e.get("inputs"), dict)
+    }
+    merged = []
+    for cls in pipeline.get("classes", []):
+        methods = []
+        for method in cls["methods"]:
+            inputs = corrected.get((cls["class_name"], method["method"]))
+            methods.append(dict(method, inputs=inputs) if inputs is not None else method)
+        merged.append(dict(cls, methods=methods))
+    return dict(pipeline, classes=merged)
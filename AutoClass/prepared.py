@@ -0,0 +1,218 @@
+import copy
+import functools
+import inspect
+import json
+from types import MappingProxyType
+
+from AutoClass.scheduler import REFERENCE_PATTERN, iter_references, resolve_value, run_awaitable
+
+PREPARED_PIPELINE_VERSION = 1
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def _thaw(value):
+    if isinstance(value, MappingProxyType):
+        return {k: _thaw(v) for k, v in value.items()}
+    if isinstance(value, tuple):
+        return [_thaw(v) for v in value]
+    return value
+
+
+def _run_in_process(runner, class_name, method_name, **inputs):
+    return runner.submit(class_name, method_name, inputs).result()
+
+
+def _run_mapped(agent, key, step, **inputs):
+    return agent._call_mapped(key, step, inputs)
+
+
+def _memoized(cache, key, ttl, handle, **inputs):
+    cache_key = cache.make_key(key, inputs)
+    if cache_key is not None:
+        hit, value = cache.get(cache_key)
+        if hit:
+            return value
+    output = handle(**inputs)
+    if inspect.isawaitable(output):
+        output = run_awaitable(output)
+    if cache_key is not None:
+        cache.set(cache_key, output, ttl=ttl)
+    return output
+
+
+class PreparedPipeline:
+    """
+    Immutable, serializable form of a filled pipeline that runs without any LLM call.
+
+    Every step input is compiled to one of:
+    - ("ref", "Class.method"): output of an earlier step
+    - ("context", name): value looked up in the agent's context at run time
+    - ("nested", value): container holding references, resolved at run time
+    - ("param", slot): literal value exposed as a named parameter slot
+
+    Slots default to the value the planner filled in and are named "Class.method.param" unless
+    a {slot_name: "Class.method.param"} mapping is given at compile time.
+    """
+
+    __slots__ = ("steps", "order", "parameters")
+
+    def __init__(self, steps, order, parameters):
+        object.__setattr__(self, "steps", _freeze(steps))
+        object.__setattr__(self, "order", tuple(order))
+        object.__setattr__(self, "parameters", _freeze(parameters))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("PreparedPipeline is immutable")
+
+    @classmethod
+    def compile(cls, graph, context=None, parameters=None):
+        """
+        Builds a PreparedPipeline from a DependencyGraph (see Agent.build_dependency_graph).
+        """
+        if graph.cycles or graph.missing:
+            problems = [" -> ".join(c) for c in graph.cycles] + list(graph.missing)
+            raise ValueError(f"Pipeline can't be compiled: {', '.join(problems)}")
+        context = context or {}
+        names = {path: name for name, path in (parameters or {}).items()}
+
+        steps, slots = {}, {}
+        for key in graph.order:
+            step = graph.nodes[key]
+            compiled = {}
+            for param, value in step["inputs"].items():
+                path = f"{key}.{param}"
+                if isinstance(value, str) and value in graph.nodes:
+                    compiled[param] = ("ref", value)
+                elif isinstance(value, str) and REFERENCE_PATTERN.match(value) and value in context:
+                    compiled[param] = ("context", value)
+                elif not isinstance(value, str) and any(True for _ in iter_references(value)):
+                    compiled[param] = ("nested", value)
+                else:
+                    slot = names.get(path, path)
+                    slots[slot] = {"step": key, "param": param, "default": copy.deepcopy(value)}
+                    compiled[param] = ("param", slot)
+            steps[key] = {"class": step["class"], "method": step["method_name"], "inputs": compiled}
+            if step.get("map"):
+                steps[key]["map"] = list(step["map"])
+                steps[key]["chunk_size"] = step.get("chunk_size")
+
+        unknown = set(names) - set(f"{s['step']}.{s['param']}" for s in slots.values())
+        if unknown:
+            raise ValueError(f"Unknown parameter paths: {', '.join(sorted(unknown))}")
+        return cls(steps, graph.order, slots)
+
+    def to_dict(self):
+        return {
+            "version": PREPARED_PIPELINE_VERSION,
+            "order": list(self.order),
+            "steps": {
+                key: {
+                    "class": step["class"],
+                    "method": step["method"],
+                    "inputs": {param: [kind, _thaw(value)] for param, (kind, value) in step["inputs"].items()},
+                    **({"map": list(step["map"]), "chunk_size": step["chunk_size"]} if "map" in step else {})
+                }
+                for key, step in self.steps.items()
+            },
+            "parameters": _thaw(self.parameters),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        if data.get("version") != PREPARED_PIPELINE_VERSION:
+            raise ValueError(f"Unsupported prepared pipeline version: {data.get('version')}")
+        steps = {
+            key: {
+                "class": step["class"],
+                "method": step["method"],
+                "inputs": {param: (kind, value) for param, (kind, value) in step["inputs"].items()},
+                **({"map": step["map"], "chunk_size": step.get("chunk_size")} if step.get("map") else {})
+            }
+            for key, step in data["steps"].items()
+        }
+        return cls(steps, data["order"], data["parameters"])
+
+    def to_json(self):
+        return json.dumps(self.to_dict())
+
+    @classmethod
+    def from_json(cls, text):
+        return cls.from_dict(json.loads(text))
+
+    def defaults(self):
+        return {slot: _thaw(spec["default"]) for slot, spec in self.parameters.items()}
+
+    def bind(self, agent):
+        """
+        Resolves every method handle once against the agent's registered instances.
+        """
+        return BoundPipeline(self, agent)
+
+
+class BoundPipeline:
+    """
+    A PreparedPipeline with method handles resolved; run() executes the steps in the
+    precomputed order with new parameter bindings.
+    """
+
+    def __init__(self, prepared, agent):
+        self.prepared = prepared
+        # Live view of the agent's persisted results and catalog; run() never writes to it
+        self.context = agent.run_context()
+        self.handles = []
+        for key in prepared.order:
+            step = prepared.steps[key]
+            instance = agent.registered_class.get(step["class"])
+            if instance is None:
+                raise ValueError(f"Class '{step['class']}' is not registered.")
+            if "map" in step:
+                mapped = {
+                    "class": step["class"], "instance": instance, "method_name": step["method"],
+                    "map": tuple(step["map"]), "chunk_size": step["chunk_size"],
+                }
+                handle = functools.partial(_run_mapped, agent, key, mapped)
+            elif agent.execution_policies.get(key) == "process":
+                handle = functools.partial(_run_in_process, agent.process_runner, step["class"], step["method"])
+            else:
+                handle = getattr(instance, step["method"])
+            if key in agent.pure_methods and agent.result_cache is not None:
+                handle = functools.partial(_memoized, agent.result_cache, key, agent.pure_methods[key].get("ttl"), handle)
+            self.handles.append((key, handle, tuple(step["inputs"].items())))
+        self._defaults = prepared.defaults()
+
+    def run(self, bindings=None, **kwargs):
+        """
+        Executes the pipeline. Parameter values come from bindings/kwargs, falling back to the
+        compiled defaults. Returns {"Class.method": output}.
+        """
+        values = dict(self._defaults)
+        for source in (bindings or {}, kwargs):
+            for slot, value in source.items():
+                if slot not in values:
+                    raise KeyError(f"Unknown parameter slot '{slot}'")
+                values[slot] = value
+
+        results, context = {}, self.context
+        for key, handle, inputs in self.handles:
+            resolved = {}
+            for param, (kind, value) in inputs:
+                if kind == "param":
+                    resolved[param] = values[value]
+                elif kind == "ref":
+                    resolved[param] = results[value]
+                elif kind == "context":
+                    resolved[param] = context[value]
+                else:
+                    resolved[param] = resolve_value(_thaw(value), results, context)
+            output = handle(**resolved)
+            if inspect.isawaitable(output):
+                output = run_awaitable(output)
+            results[key] = output
+        return results
@@ -0,0 +1,90 @@
+import os
+import threading
+
+from AutoClass.fanout import run_chunk
+from AutoClass.results import SpillStore, from_handles
+
+EXECUTION_POLICIES = ("thread", "process")
+
+# Instances living inside a worker process, keyed by registered class name.
+_worker_instances = {}
+
+
+def _init_worker(instances):
+    _worker_instances.clear()
+    _worker_instances.update(instances)
+
+
+def _call_in_worker(class_name, method_name, inputs, spill=None):
+    output = getattr(_worker_instances[class_name], method_name)(**from_handles(inputs))
+    if spill is not None:
+        # Large arrays go back as a file handle instead of being pickled through the result pipe
+        output = SpillStore(*spill).spill_to_handle(output)
+    return output
+
+
+def _map_in_worker(class_name, method_name, batch_name, inputs, mapped):
+    instance = _worker_instances[class_name]
+    batch = getattr(instance, batch_name) if batch_name else None
+    return run_chunk(getattr(instance, method_name), batch, from_handles(inputs), mapped)
+
+
+class ProcessStepRunner:
+    """
+    Runs registered methods in a process pool so CPU-bound steps scale past the GIL.
+
+    Instances are pickled once per worker through the pool initializer, so each call only
+    ships the class name, method name and resolved inputs. Workers hold a snapshot of the
+    instance taken when the pool started: attribute changes made inside a method do not
+    flow back to the registered instance.
+    """
+
+    def __init__(self, max_workers=None, mp_context=None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.mp_context = mp_context
+        self.instances = {}
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def add_instance(self, class_name, instance):
+        with self._lock:
+            self.instances[class_name] = instance
+            # Existing workers have the old registry; the next submit starts a fresh pool
+            self._shutdown_pool(wait=False)
+
+    def _shutdown_pool(self, wait=True):
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait)
+            self._pool = None
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                # multiprocessing is imported with the first process step, not with the agent
+                from concurrent.futures import ProcessPoolExecutor
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=self.mp_context,
+                    initializer=_init_worker,
+                    initargs=(dict(self.instances),)
+                )
+            return self._pool
+
+    def submit(self, class_name, method_name, inputs, spill=None):
+        """
+        Returns a concurrent.futures.Future for the method call. ArrayHandles in inputs are
+        mapped in the worker; spill=(threshold, directory) makes the worker return large arrays
+        as ArrayHandles (see AutoClass.results).
+        """
+        return self._get_pool().submit(_call_in_worker, class_name, method_name, inputs, spill)
+
+    def submit_chunk(self, class_name, method_name, inputs, mapped, batch_name=None):
+        """
+        Returns a Future for one chunk of a mapped step (see AutoClass.fanout.run_chunk):
+        the list of outputs for the items in the mapped inputs.
+        """
+        return self._get_pool().submit(_map_in_worker, class_name, method_name, batch_name, inputs, mapped)
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            self._shutdown_pool(wait=wait)
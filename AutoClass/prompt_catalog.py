@@ -0,0 +1,227 @@
+import threading
+from collections import OrderedDict
+
+_encodings = {}
+_encodings_lock = threading.Lock()
+
+
+def _encoding(model_name):
+    with _encodings_lock:
+        if model_name not in _encodings:
+            encoding = None
+            # Imported on first count rather than with the module; without tiktoken, token counts
+            # fall back to a ~4 characters/token estimate
+            try:
+                import tiktoken
+            except ImportError:
+                tiktoken = None
+            if tiktoken is not None:
+                try:
+                    encoding = tiktoken.encoding_for_model(model_name)
+                except Exception:
+                    try:
+                        encoding = tiktoken.get_encoding("o200k_base")
+                    except Exception:
+                        encoding = None
+            _encodings[model_name] = encoding
+        return _encodings[model_name]
+
+
+def count_tokens(text, model_name="gpt-4o-mini"):
+    encoding = _encoding(model_name)
+    if encoding is None:
+        return max(1, len(text) // 4) if text else 0
+    return len(encoding.encode(text))
+
+
+def _format_inputs(inputs):
+    return ', '.join([f"{k} ({v})" for k, v in inputs.items()])
+
+
+def _output_type(output):
+    # "return: Sum of a and b :rtype: int or float" -> "int or float" for the compact encoding
+    output = output or "N/A"
+    return output.rsplit(":rtype:", 1)[1].strip() if ":rtype:" in output else output
+
+
+def _render_select(class_name, method):
+    return f"Class: {class_name} — Method: {method['method']} — Description: {method.get('method_description', '')}"
+
+
+def _render_inputs(class_name, method):
+    return f"""Class: {class_name}
+        Method: {method['method']}
+        Inputs: {_format_inputs(method.get('inputs', {}))}
+        Output: {method.get('output', 'N/A')}"""
+
+
+def _render_plan(class_name, method):
+    return f"""Class: {class_name}
+        Method: {method['method']}
+        Description: {method.get('method_description', '')}
+        Inputs: {_format_inputs(method.get('inputs', {}))}
+        Output: {method.get('output', 'N/A')}"""
+
+
+class PromptCatalog:
+    """
+    Pre-rendered prompt fragments for every registered method, kept up to date by register_class.
+
+    Each method stores the exact text used by llm_choose_class_method ("select"),
+    llm_determine_input_parameters ("inputs") and llm_plan_pipeline ("plan"), so prompts are
+    assembled by joining strings instead of re-walking the catalog. Token counts are measured with
+    tiktoken on first use and cached per fragment.
+
+    compact=True groups methods by class and by identical signature, e.g. the four (a, b) methods
+    of ArithmeticOperations share one "Inputs/Output" line. A token budget keeps methods in the
+    order of keys (best ranked first) until it is spent; pass a list as dropped to learn which
+    methods were left out.
+    """
+
+    def __init__(self, model_name="gpt-4o-mini"):
+        self.model_name = model_name
+        self.classes = OrderedDict()
+        self._tokens = {}
+        self._lock = threading.Lock()
+
+    def add_class(self, class_meta):
+        class_name = class_meta["class_name"]
+        methods = OrderedDict()
+        for method in class_meta["methods"]:
+            methods[method["method"]] = {
+                "description": method.get("method_description", ""),
+                "signature": (_format_inputs(method.get("inputs", {})), _output_type(method.get("output"))),
+                "select": _render_select(class_name, method),
+                "inputs": _render_inputs(class_name, method),
+                "plan": _render_plan(class_name, method),
+            }
+        with self._lock:
+            self.classes.pop(class_name, None)
+            self.classes[class_name] = methods
+
+    def keys(self):
+        with self._lock:
+            return [f"{c}.{m}" for c, methods in self.classes.items() for m in methods]
+
+    def get(self, key):
+        class_name, _, method_name = key.partition(".")
+        return self.classes.get(class_name, {}).get(method_name)
+
+    def token_count(self, text):
+        tokens = self._tokens.get(text)
+        if tokens is None:
+            tokens = count_tokens(text, self.model_name)
+            if len(self._tokens) > 100000:
+                self._tokens.clear()
+            self._tokens[text] = tokens
+        return tokens
+
+    def _ordered(self, keys):
+        if keys is None:
+            keys = self.keys()
+        entries = ((key, self.get(key)) for key in keys)
+        return [(key, fragment) for key, fragment in entries if fragment is not None]
+
+    def _within_budget(self, pieces, budget, dropped=None):
+        """
+        pieces: list of (key, group, header, text). Keeps pieces in order until the budget is
+        spent and returns them as (group, header, text); a group's header counts once, the first
+        time one of its pieces is kept. Keys of the pieces left out are appended to dropped.
+        """
+        if budget is None:
+            return [piece[1:] for piece in pieces]
+        kept, used, seen = [], 0, set()
+        for key, group, header, text in pieces:
+            cost = self.token_count(text) + 1
+            if header and group not in seen:
+                cost += self.token_count(header) + 1
+            if used + cost > budget:
+                if dropped is not None:
+                    dropped.append(key)
+                continue
+            used += cost
+            seen.add(group)
+            kept.append((group, header, text))
+        return kept
+
+    def _join_compact(self, kept):
+        # Re-group by class (and signature) preserving first-seen order
+        groups = OrderedDict()
+        for group, header, text in kept:
+            groups.setdefault((group, header), []).append(text)
+        lines = []
+        for (_, header), texts in groups.items():
+            if header:
+                lines.append(header)
+            lines.extend(texts)
+        return "\n".join(lines)
+
+    def render_selection(self, keys=None, budget=None, compact=False, dropped=None):
+        """
+        Catalog text for llm_choose_class_method. keys restricts and orders the methods.
+        """
+        entries = self._ordered(keys)
+        if not compact:
+            pieces = [(key, None, None, fragment["select"]) for key, fragment in entries]
+            return "\n".join(text for _, _, text in self._within_budget(pieces, budget, dropped))
+        pieces = []
+        for key, fragment in entries:
+            class_name, _, method_name = key.partition(".")
+            pieces.append((key, class_name, f"Class: {class_name}", f"  - {method_name}: {fragment['description']}"))
+        return self._join_compact(self._within_budget(pieces, budget, dropped))
+
+    def render_plan(self, keys=None, budget=None, compact=False, dropped=None):
+        """
+        Catalog text for llm_plan_pipeline (descriptions plus signatures).
+        """
+        entries = self._ordered(keys)
+        if not compact:
+            pieces = [(key, None, None, fragment["plan"]) for key, fragment in entries]
+            return "\n".join(text for _, _, text in self._within_budget(pieces, budget, dropped))
+        return self._render_compact_signatures(entries, budget, with_description=True, dropped=dropped)
+
+    def render_inputs(self, pipeline, budget=None, compact=False, dropped=None):
+        """
+        Method context for llm_determine_input_parameters, built from the pruned pipeline.
+        Methods that aren't in the catalog are rendered on the fly.
+        """
+        entries = []
+        for cls in pipeline.get("classes", []):
+            for met in cls.get("methods", []):
+                key = f"{cls['class_name']}.{met['method']}"
+                fragment = self.get(key)
+                if fragment is None:
+                    fragment = {
+                        "description": "",
+                        "signature": (_format_inputs(met.get("inputs", {})), _output_type(met.get("output"))),
+                        "inputs": _render_inputs(cls["class_name"], met),
+                    }
+                entries.append((key, fragment))
+        if not compact:
+            pieces = [(key, None, None, fragment["inputs"]) for key, fragment in entries]
+            return "\n".join(text for _, _, text in self._within_budget(pieces, budget, dropped))
+        return self._render_compact_signatures(entries, budget, with_description=False, dropped=dropped)
+
+    def _render_compact_signatures(self, entries, budget, with_description, dropped=None):
+        pieces = []
+        for key, fragment in entries:
+            class_name, _, method_name = key.partition(".")
+            inputs, output = fragment["signature"]
+            header = f"Class: {class_name}\n  Inputs: {inputs} | Output: {output}"
+            line = f"    - {method_name}"
+            if with_description and fragment["description"]:
+                line += f": {fragment['description']}"
+            pieces.append((key, (class_name, inputs, output), header, line))
+        kept = self._within_budget(pieces, budget, dropped)
+
+        # Class -> signature -> method lines, each header written once
+        classes = OrderedDict()
+        for (class_name, inputs, output), _, line in kept:
+            classes.setdefault(class_name, OrderedDict()).setdefault((inputs, output), []).append(line)
+        lines = []
+        for class_name, signatures in classes.items():
+            lines.append(f"Class: {class_name}")
+            for (inputs, output), method_lines in signatures.items():
+                lines.append(f"  Inputs: {inputs} | Output: {output}")
+                lines.extend(method_lines)
+        return "\n".join(lines)
@@ -0,0 +1,242 @@
+import os
+import reprlib
+import shutil
+import sys
+import tempfile
+import threading
+import weakref
+
+
+def _numpy():
+    """
+    The numpy module if something already imported it, else None. An array can't exist before
+    NumPy is imported, so type checks never need to import it (spilling needs NumPy; summaries
+    fall back to duck typing).
+    """
+    return sys.modules.get("numpy")
+
+SUMMARY_LIMIT = 200
+
+_repr = reprlib.Repr()
+_repr.maxstring = 80
+_repr.maxother = 80
+_repr.maxlist = _repr.maxtuple = _repr.maxset = _repr.maxdict = 6
+_repr.maxlevel = 3
+
+
+def _format_bytes(size):
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def summarize(value, limit=SUMMARY_LIMIT):
+    """
+    Short, size-aware description of a value for logs and UIs. Arrays and data frames are
+    described by shape, dtype and size instead of being repr'ed; everything else is repr'ed
+    with bounded depth/length and cut at limit characters.
+    """
+    if hasattr(value, "dtype") and hasattr(value, "shape") and hasattr(value, "nbytes"):
+        np = _numpy()
+        kind = "memmap" if np is not None and isinstance(value, np.memmap) else type(value).__name__
+        return f"{kind}(shape={tuple(value.shape)}, dtype={value.dtype}, {_format_bytes(value.nbytes)})"
+    if hasattr(value, "shape") and hasattr(value, "columns") and hasattr(value, "memory_usage"):
+        try:
+            size = _format_bytes(int(value.memory_usage(deep=False).sum()))
+        except Exception:
+            size = "unknown size"
+        return f"{type(value).__name__}(shape={tuple(value.shape)}, columns={len(value.columns)}, {size})"
+    if isinstance(value, ArrayHandle):
+        return repr(value)
+    text = _repr.repr(value)
+    if isinstance(value, (str, bytes)):
+        truncated = len(value) > _repr.maxstring
+    else:
+        truncated = isinstance(value, (list, tuple, dict, set)) and len(value) > _repr.maxlist
+    if truncated:
+        text = f"{text} <{type(value).__name__} of length {len(value)}>"
+    return text if len(text) <= limit else text[:limit - 3] + "..."
+
+
+class Summary:
+    """
+    Defers summarize() until the value is actually formatted, e.g. by a logger whose
+    level lets the message through.
+    """
+
+    __slots__ = ("value", "limit")
+
+    def __init__(self, value, limit=SUMMARY_LIMIT):
+        self.value = value
+        self.limit = limit
+
+    def __str__(self):
+        if isinstance(self.value, dict):
+            return "{" + ", ".join(f"{k}: {summarize(v, self.limit)}" for k, v in self.value.items()) + "}"
+        return summarize(self.value, self.limit)
+
+    __repr__ = __str__
+
+
+def summarize_results(results, limit=SUMMARY_LIMIT):
+    """
+    {key: output} -> JSON-friendly dict that keeps small scalars and summarizes everything else.
+    """
+    summary = {}
+    for key, value in results.items():
+        if value is None or isinstance(value, (bool, int, float)):
+            summary[key] = value
+        elif isinstance(value, str) and len(value) <= limit:
+            summary[key] = value
+        else:
+            summary[key] = summarize(value, limit)
+    return summary
+
+
+class ArrayHandle:
+    """
+    Picklable reference to an array stored in a file: only the path, dtype, shape and offset
+    cross process boundaries, and open() maps the file instead of copying the data.
+    """
+
+    __slots__ = ("path", "dtype", "shape", "offset", "order")
+
+    def __init__(self, path, dtype, shape, offset=0, order="C"):
+        self.path = path
+        self.dtype = str(dtype)
+        self.shape = tuple(shape)
+        self.offset = offset
+        self.order = order
+
+    @classmethod
+    def from_memmap(cls, array):
+        order = "F" if array.flags.f_contiguous and not array.flags.c_contiguous else "C"
+        return cls(array.filename, array.dtype, array.shape, array.offset, order)
+
+    def open(self):
+        import numpy as np
+        return np.memmap(self.path, dtype=self.dtype, mode="r", shape=self.shape, offset=self.offset, order=self.order)
+
+    def __getstate__(self):
+        return (self.path, self.dtype, self.shape, self.offset, self.order)
+
+    def __setstate__(self, state):
+        self.path, self.dtype, self.shape, self.offset, self.order = state
+
+    def __repr__(self):
+        return f"ArrayHandle({os.path.basename(self.path)}, shape={self.shape}, dtype={self.dtype})"
+
+
+def _is_file_backed(value):
+    np = _numpy()
+    return (
+        np is not None and isinstance(value, np.memmap) and getattr(value, "filename", None)
+        and (value.flags.c_contiguous or value.flags.f_contiguous)
+    )
+
+
+def to_handles(inputs):
+    """
+    Replaces file-backed arrays in a {param: value} dict with ArrayHandles before the inputs
+    are pickled for a worker process.
+    """
+    if _numpy() is None:
+        return inputs
+    return {k: to_handle(v) for k, v in inputs.items()}
+
+
+def to_handle(value):
+    """
+    An ArrayHandle for a file-backed array (e.g. a spilled output), otherwise value itself.
+    """
+    return ArrayHandle.from_memmap(value) if _is_file_backed(value) else value
+
+
+def from_handle(value):
+    return value.open() if isinstance(value, ArrayHandle) else value
+
+
+def from_handles(inputs):
+    return {k: from_handle(v) for k, v in inputs.items()}
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class SpillStore:
+    """
+    Moves large NumPy outputs out of process memory into memory-mapped .npy files.
+
+    spill() returns a read-only np.memmap for arrays of at least threshold bytes (other values
+    are returned unchanged); dependents receive the mapping by reference and worker processes
+    receive an ArrayHandle to the same file. A file is deleted once its mapping is garbage
+    collected, and cleanup() removes the spill directory.
+    """
+
+    def __init__(self, threshold, directory=None):
+        self.threshold = threshold
+        self.directory = directory
+        self._owned = None
+        self._lock = threading.Lock()
+
+    def path(self):
+        if self.directory is not None:
+            os.makedirs(self.directory, exist_ok=True)
+            return self.directory
+        with self._lock:
+            if self._owned is None:
+                self._owned = tempfile.mkdtemp(prefix="autoclass-spill-")
+            return self._owned
+
+    def should_spill(self, value):
+        np = _numpy()
+        return (
+            np is not None and self.threshold is not None and isinstance(value, np.ndarray)
+            and not isinstance(value, np.memmap) and not value.dtype.hasobject
+            and value.nbytes >= self.threshold
+        )
+
+    def spill(self, value):
+        if not self.should_spill(value):
+            return value
+        np = _numpy()
+        fd, path = tempfile.mkstemp(suffix=".npy", dir=self.path())
+        os.close(fd)
+        np.save(path, value)
+        mapped = np.load(path, mmap_mode="r")
+        weakref.finalize(mapped, _remove, path)
+        return mapped
+
+    def spill_to_handle(self, value):
+        """
+        Worker-side variant: spills and returns an ArrayHandle so the parent maps the file
+        instead of unpickling a copy of the array.
+        """
+        if not self.should_spill(value):
+            return value
+        np = _numpy()
+        fd, path = tempfile.mkstemp(suffix=".npy", dir=self.path())
+        os.close(fd)
+        np.save(path, value)
+        return ArrayHandle.from_memmap(np.load(path, mmap_mode="r"))
+
+    def adopt(self, value):
+        """
+        Parent-side counterpart of spill_to_handle: maps the file and deletes it with the mapping.
+        """
+        if not isinstance(value, ArrayHandle):
+            return value
+        mapped = value.open()
+        weakref.finalize(mapped, _remove, value.path)
+        return mapped
+
+    def cleanup(self):
+        with self._lock:
+            if self._owned is not None:
+                shutil.rmtree(self._owned, ignore_errors=True)
+                self._owned = None
@@ -0,0 +1,116 @@
+import functools
+import math
+import re
+import threading
+from collections import defaultdict
+
+STOP_WORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in", "is", "it", "of",
+    "on", "or", "the", "this", "that", "to", "with", "method", "methods", "class", "input",
+    "inputs", "given", "returns", "return", "please", "perform", "necessary", "operations",
+}
+
+
+CAMEL_CASE = re.compile(r"([a-z])([A-Z])")
+WORD = re.compile(r"[a-z0-9]+")
+
+
+@functools.lru_cache(maxsize=8192)
+def _tokens(text):
+    text = CAMEL_CASE.sub(r"\1 \2", text)
+    return tuple(t for t in WORD.findall(text.lower().replace("_", " ")) if t not in STOP_WORDS)
+
+
+def tokenize(text):
+    """
+    Lower-cases, splits snake_case/camelCase identifiers and drops stop words.
+    """
+    return list(_tokens(text or ""))
+
+
+class MethodIndex:
+    """
+    Incremental BM25 index over registered method metadata.
+
+    Documents are added and removed one method at a time, so registering a class only touches
+    that class's entries. search() returns the top-k "Class.method" keys for a query together
+    with a score relative to the best match (1.0 = best). Updates and searches are serialized
+    by a lock, so the index can be shared by threads planning concurrently.
+    """
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.docs = {}
+        self.doc_terms = {}
+        self.postings = defaultdict(dict)
+        self.total_length = 0
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.docs)
+
+    def add(self, key, *texts):
+        """
+        Indexes key under the concatenation of texts. Texts are tokenized separately so the
+        tokens of repeated pieces (e.g. the same method registered under many aliases) are reused.
+        """
+        counts = {}
+        for text in texts:
+            for term in _tokens(text or ""):
+                counts[term] = counts.get(term, 0) + 1
+        length = sum(counts.values())
+        with self._lock:
+            if key in self.docs:
+                self.remove(key)
+            self.docs[key] = length
+            self.doc_terms[key] = list(counts)
+            self.total_length += length
+            for term, freq in counts.items():
+                self.postings[term][key] = freq
+
+    def remove(self, key):
+        with self._lock:
+            length = self.docs.pop(key, None)
+            if length is None:
+                return
+            self.total_length -= length
+            for term in self.doc_terms.pop(key):
+                del self.postings[term][key]
+                if not self.postings[term]:
+                    del self.postings[term]
+
+    def remove_prefix(self, prefix):
+        """
+        Removes every key starting with prefix, e.g. "Class." for all methods of a class.
+        """
+        with self._lock:
+            for key in [k for k in self.docs if k.startswith(prefix)]:
+                self.remove(key)
+
+    def search(self, query, k=10, threshold=0.0):
+        """
+        Returns [(key, relative_score)] for at most k methods whose score is at least
+        threshold * best score. An empty list means nothing in the query matched the index.
+        """
+        terms = set(tokenize(query))
+        scores = defaultdict(float)
+        with self._lock:
+            if not self.docs:
+                return []
+            n = len(self.docs)
+            avg_length = self.total_length / n or 1
+            for term in terms:
+                docs = self.postings.get(term)
+                if not docs:
+                    continue
+                idf = math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+                for key, freq in docs.items():
+                    norm = self.k1 * (1 - self.b + self.b * self.docs[key] / avg_length)
+                    scores[key] += idf * freq * (self.k1 + 1) / (freq + norm)
+
+        if not scores:
+            return []
+        best = max(scores.values())
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return [(key, score / best) for key, score in ranked[:k] if score / best >= threshold]
@@ -0,0 +1,644 @@
+import re
+import os
+import time
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+REFERENCE_PATTERN = re.compile(r"^[A-Za-z_]\w*\.[A-Za-z_]\w*$")
+
+
+def step_key(step):
+    return f"{step['class']}.{step['method_name']}"
+
+
+def iter_references(value):
+    """
+    Yields every "Class.method" shaped string found in an input value.
+    Lists, tuples and dict values are searched as well so nested references are honoured.
+    """
+    if isinstance(value, str):
+        if REFERENCE_PATTERN.match(value):
+            yield value
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            yield from iter_references(item)
+    elif isinstance(value, dict):
+        for item in value.values():
+            yield from iter_references(item)
+
+
+class DependencyGraph:
+    """
+    DAG built once from a flattened list of pipeline steps.
+
+    - nodes: "Class.method" -> step
+    - dependencies: key -> set of keys the step waits on
+    - dependents: key -> set of keys waiting on the step
+    - missing: key -> list of references that neither a step nor the context can satisfy
+    - cycles: list of key lists that form a dependency cycle
+    """
+
+    def __init__(self, steps, context=None, known_classes=None):
+        context = context if context is not None else {}
+        known_classes = set(known_classes or [])
+        self.nodes = {}
+        self.duplicates = []
+        for step in steps:
+            key = step_key(step)
+            if key in self.nodes:
+                self.duplicates.append(key)
+                continue
+            self.nodes[key] = step
+
+        self.dependencies = {key: set() for key in self.nodes}
+        self.dependents = {key: set() for key in self.nodes}
+        self.missing = {}
+
+        for key, step in self.nodes.items():
+            for ref in self._references(step["inputs"]):
+                if ref in self.nodes:
+                    if ref == key:
+                        self.missing.setdefault(key, []).append(ref)
+                        continue
+                    self.dependencies[key].add(ref)
+                    self.dependents[ref].add(key)
+                elif ref in context:
+                    continue
+                elif ref.split(".", 1)[0] in known_classes:
+                    # Looks like a call into a registered class that the plan never schedules
+                    self.missing.setdefault(key, []).append(ref)
+
+        self.order, self.cycles = self._toposort()
+
+    @staticmethod
+    def _references(inputs):
+        for value in inputs.values():
+            yield from iter_references(value)
+
+    def _toposort(self):
+        indegree = {key: len(deps) for key, deps in self.dependencies.items()}
+        ready = [key for key in self.nodes if indegree[key] == 0]
+        order = []
+        while ready:
+            key = ready.pop(0)
+            order.append(key)
+            for child in self.dependents[key]:
+                indegree[child] -= 1
+                if indegree[child] == 0:
+                    ready.append(child)
+
+        cyclic = [key for key in self.nodes if indegree[key] > 0]
+        cycles = self._find_cycles(set(cyclic)) if cyclic else []
+        return order, cycles
+
+    def _find_cycles(self, candidates):
+        # Report one representative cycle per strongly connected group
+        cycles = []
+        seen = set()
+        for start in candidates:
+            if start in seen:
+                continue
+            path, index = [], {}
+            node = start
+            while node not in index:
+                index[node] = len(path)
+                path.append(node)
+                nxt = [d for d in self.dependencies[node] if d in candidates]
+                if not nxt:
+                    break
+                node = sorted(nxt)[0]
+            else:
+                cycle = path[index[node]:]
+                if not seen.intersection(cycle):
+                    cycles.append(cycle)
+            seen.update(path)
+        return cycles
+
+    def blocked(self):
+        """
+        Returns every key that can never run: steps in a cycle, steps with missing
+        references, and all of their transitive dependents.
+        """
+        roots = set(self.missing)
+        for cycle in self.cycles:
+            roots.update(cycle)
+        roots.update(key for key in self.nodes if key not in self.order)
+        return self.descendants(roots) | roots
+
+    def descendants(self, keys):
+        found = set()
+        stack = list(keys)
+        while stack:
+            for child in self.dependents[stack.pop()]:
+                if child not in found:
+                    found.add(child)
+                    stack.append(child)
+        return found
+
+
+def resolve_value(value, results, context):
+    if isinstance(value, str):
+        if value in results:
+            return results[value]
+        if REFERENCE_PATTERN.match(value) and value in context:
+            return context[value]
+        return value
+    if isinstance(value, list):
+        return [resolve_value(v, results, context) for v in value]
+    if isinstance(value, tuple):
+        return tuple(resolve_value(v, results, context) for v in value)
+    if isinstance(value, dict):
+        return {k: resolve_value(v, results, context) for k, v in value.items()}
+    return value
+
+
+def resolve_inputs(inputs, results, context):
+    return {param: resolve_value(val, results, context) for param, val in inputs.items()}
+
+
+STEP_STATUSES = ("ok", "error", "timeout", "cancelled", "skipped")
+
+# Interval at which a run waiting on slow steps checks its CancelToken
+CANCEL_POLL_SECONDS = 0.05
+
+
+class StepTimeout(TimeoutError):
+    pass
+
+
+class StepCancelled(Exception):
+    """
+    Raised by a step that noticed its CancelToken was cancelled (see CancelToken.raise_if_cancelled).
+    """
+
+
+class CancelToken:
+    """
+    Cooperative cancellation flag for a run or a single step.
+
+    Pass one to a run (Agent.run_pipeline_with_dependencies(cancel=token)) and call cancel()
+    from any thread to stop it: steps that haven't started are skipped and in-flight steps are
+    reported as cancelled. Python can't interrupt a running thread, so long-running methods
+    should poll current_cancel_token() and return early; coroutine methods are cancelled
+    outright. A step's token is also cancelled when the step times out.
+    """
+
+    __slots__ = ("parent", "reason", "_cancelled")
+
+    def __init__(self, parent=None):
+        # One per step, so this stays a plain flag rather than a threading.Event
+        self.parent = parent
+        self.reason = None
+        self._cancelled = False
+
+    def cancel(self, reason="cancelled"):
+        if not self._cancelled:
+            self.reason = reason
+            self._cancelled = True
+
+    @property
+    def cancelled(self):
+        return self._cancelled or (self.parent is not None and self.parent.cancelled)
+
+    def raise_if_cancelled(self):
+        if self.cancelled:
+            raise StepCancelled(self.reason or (self.parent.reason if self.parent is not None else None))
+
+
+_current_token = contextvars.ContextVar("autoclass_cancel_token", default=None)
+
+
+def current_cancel_token():
+    """
+    The CancelToken of the step running in the current thread or task; a fresh, never
+    cancelled token outside of a run.
+    """
+    return _current_token.get() or CancelToken()
+
+
+async def _await(awaitable):
+    return await awaitable
+
+
+def run_awaitable(awaitable):
+    """
+    Waits for an awaitable returned by a synchronous method call. When an event loop is already
+    running in this thread (a sync run started from a notebook or an async handler), asyncio.run
+    can't be used there, so the awaitable runs on its own loop in a worker thread.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(_await(awaitable))
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        return pool.submit(contextvars.copy_context().run, asyncio.run, _await(awaitable)).result()
+
+
+def _status(error):
+    if error is None:
+        return "ok"
+    if isinstance(error, StepTimeout):
+        return "timeout"
+    if isinstance(error, StepCancelled):
+        return "cancelled"
+    return "error"
+
+
+def _timed_call(invoke, key, step, resolved, token=None):
+    """
+    Runs one step and returns its event: key, resolved inputs, status, output or error, timing.
+    """
+    reset = _current_token.set(token)
+    started = time.time()
+    begin = time.perf_counter()
+    try:
+        output = invoke(step, resolved)
+    except Exception as e:
+        return step_event(key, resolved, started, time.perf_counter() - begin, error=e)
+    finally:
+        _current_token.reset(reset)
+    return step_event(key, resolved, started, time.perf_counter() - begin, output=output)
+
+
+async def _atimed_call(ainvoke, key, step, resolved, token=None, timeout=None):
+    reset = _current_token.set(token)
+    started = time.time()
+    begin = time.perf_counter()
+    # The task copies the context, so the step sees its own token
+    task = asyncio.ensure_future(ainvoke(step, resolved))
+    _current_token.reset(reset)
+    try:
+        done, _ = await asyncio.wait({task}, timeout=timeout)
+    except asyncio.CancelledError:
+        task.cancel()
+        raise
+    if not done:
+        task.cancel()
+        if token is not None:
+            token.cancel("timeout")
+        error = StepTimeout(f"{key} did not finish within {timeout}s")
+        return step_event(key, resolved, started, time.perf_counter() - begin, error=error)
+    try:
+        output = task.result()
+    except Exception as e:
+        return step_event(key, resolved, started, time.perf_counter() - begin, error=e)
+    return step_event(key, resolved, started, time.perf_counter() - begin, output=output)
+
+
+def step_event(key, inputs, started, duration, output=None, error=None, status=None, cause=None):
+    """
+    Structured outcome of one step. status is one of STEP_STATUSES; cause names what a
+    skipped step was waiting on (the failed step, "blocked", "timeout" or "cancelled").
+    """
+    return {
+        "type": "step",
+        "key": key,
+        "inputs": inputs,
+        "status": status or _status(error),
+        "output": output,
+        "error": error,
+        "cause": cause,
+        "started": started,
+        "duration": duration,
+    }
+
+
+def skipped_event(key, inputs, cause):
+    return step_event(key, inputs, time.time(), 0.0, status="skipped", cause=cause)
+
+
+class PipelineScheduler:
+    """
+    Runs a DependencyGraph, dispatching every step whose dependencies are satisfied
+    onto a thread pool so independent steps overlap.
+
+    iter_run/aiter_run yield one event per step as soon as it finishes; run/arun consume
+    them and return the collected results. Outputs of steps that already ran elsewhere can be
+    passed as completed so they are reused instead of executed; keys in skip are treated as
+    failed elsewhere: they are never run and their dependents are skipped.
+
+    Every step gets an outcome in outcomes (see step_event): when a step fails, times out or
+    is cancelled, all of its transitive dependents are reported as skipped right away.
+
+    - step_timeout: seconds a step may run (a step's own "timeout" entry wins)
+    - timeout: seconds the whole run may take; steps still running are then abandoned and
+      the rest skipped
+    """
+
+    def __init__(self, graph, max_workers=None, step_timeout=None, timeout=None):
+        self.graph = graph
+        self.max_workers = max_workers or min(32, (os.cpu_count() or 1) + 4)
+        self.step_timeout = step_timeout
+        self.timeout = timeout
+        self.results = {}
+        self.failed = {}
+        self.outcomes = {}
+
+    def _prepare(self, completed, skip=None):
+        graph = self.graph
+        blocked = graph.blocked()
+        self.results = dict(completed or {})
+        self.failed = {}
+        self.outcomes = {}
+        runnable = [
+            key for key in graph.order
+            if key not in blocked and key not in self.results and key not in (skip or ())
+        ]
+        waiting = {
+            key: len([d for d in graph.dependencies[key] if d not in self.results])
+            for key in runnable
+        }
+        events = [
+            self._record(skipped_event(key, graph.nodes[key]["inputs"], "blocked"))
+            for key in graph.nodes if key in blocked and key not in self.results
+        ]
+        for key in skip or ():
+            events.extend(self._skip_dependents(key, waiting))
+        return runnable, waiting, events
+
+    def _record(self, event):
+        self.outcomes[event["key"]] = event
+        return event
+
+    def _step_timeout(self, step):
+        return step.get("timeout") or self.step_timeout
+
+    def _skip_dependents(self, key, waiting):
+        """
+        Removes every transitive dependent of key from waiting and returns their skipped events.
+        """
+        events = []
+        for child in sorted(self.graph.descendants([key])):
+            if child in waiting and child not in self.outcomes:
+                del waiting[child]
+                events.append(self._record(skipped_event(child, self.graph.nodes[child]["inputs"], key)))
+        return events
+
+    def _finish(self, event, waiting, on_result, on_error):
+        """
+        Records a step event and returns (keys it unlocked, skipped events of its dependents).
+        """
+        key = event["key"]
+        self._record(event)
+        waiting.pop(key, None)
+        if event["status"] != "ok":
+            self.failed[key] = event["error"]
+            if on_error:
+                on_error(key, event["error"])
+            return [], self._skip_dependents(key, waiting)
+        self.results[key] = event["output"]
+        if on_result:
+            on_result(key, event["output"])
+        unlocked = []
+        for child in self.graph.dependents[key]:
+            if child in waiting:
+                waiting[child] -= 1
+                if waiting[child] == 0:
+                    unlocked.append(child)
+        return unlocked, []
+
+    def _skip_remaining(self, waiting, cause):
+        events = []
+        for key in list(waiting):
+            if key not in self.outcomes:
+                events.append(self._record(skipped_event(key, self.graph.nodes[key]["inputs"], cause)))
+        waiting.clear()
+        return events
+
+    def run(self, invoke, context, on_result=None, on_error=None, completed=None, skip=None, cancel=None):
+        """
+        invoke(step, resolved_inputs) is called for each step and must return its output.
+        Returns (results, failed) where failed maps key -> exception.
+        """
+        for _ in self.iter_run(invoke, context, on_result, on_error, completed, skip, cancel):
+            pass
+        return self.results, self.failed
+
+    def iter_run(self, invoke, context, on_result=None, on_error=None, completed=None, skip=None, cancel=None):
+        """
+        Generator form of run: yields a step event (see step_event) as each step completes.
+        """
+        graph = self.graph
+        runnable, waiting, skipped = self._prepare(completed, skip)
+        yield from skipped
+        results = self.results
+        # Only a token from the caller can be cancelled while steps run, so only then is it polled
+        poll = cancel is not None
+        cancel = cancel or CancelToken()
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        ready = [key for key in runnable if waiting.get(key) == 0]
+        timed = deadline is not None or any(self._step_timeout(graph.nodes[key]) for key in runnable)
+
+        if self.max_workers == 1 and not timed and not poll:
+            # Inline: nothing can be abandoned or cancelled mid-step
+            while ready and not cancel.cancelled:
+                key = ready.pop(0)
+                step = graph.nodes[key]
+                token = CancelToken(cancel)
+                event = _timed_call(invoke, key, step, resolve_inputs(step["inputs"], results, context), token)
+                unlocked, skipped = self._finish(event, waiting, on_result, on_error)
+                ready.extend(unlocked)
+                yield event
+                yield from skipped
+            yield from self._skip_remaining(waiting, cancel.reason or "cancelled")
+            return
+
+        pending = {}
+        abandoned = False
+        pool = ThreadPoolExecutor(max_workers=self.max_workers)
+        try:
+            while ready or pending:
+                # Only as many steps as there are free workers are submitted, so a step starts
+                # (and its deadline runs) right away instead of waiting in the pool's queue.
+                # Nothing new starts once the run is cancelled; the stop check below skips it
+                while ready and len(pending) < self.max_workers and not cancel.cancelled:
+                    key = ready.pop(0)
+                    step = graph.nodes[key]
+                    resolved = resolve_inputs(step["inputs"], results, context)
+                    token = CancelToken(cancel)
+                    limit = self._step_timeout(step)
+                    step_deadline = None if limit is None else time.monotonic() + limit
+                    future = pool.submit(_timed_call, invoke, key, step, resolved, token)
+                    pending[future] = (key, resolved, token, time.time(), step_deadline)
+
+                deadlines = [d for d in [deadline] + [p[4] for p in pending.values()] if d is not None]
+                timeout = max(0.0, min(deadlines) - time.monotonic()) if deadlines else None
+                if poll:
+                    timeout = CANCEL_POLL_SECONDS if timeout is None else min(timeout, CANCEL_POLL_SECONDS)
+                done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    pending.pop(future)
+                    event = future.result()
+                    unlocked, skipped = self._finish(event, waiting, on_result, on_error)
+                    ready.extend(unlocked)
+                    yield event
+                    yield from skipped
+
+                now = time.monotonic()
+                expired = [f for f, p in pending.items() if p[4] is not None and now >= p[4]]
+                stop = None
+                if cancel.cancelled:
+                    stop = cancel.reason or "cancelled"
+                elif deadline is not None and now >= deadline:
+                    stop = "timeout"
+                if stop is not None:
+                    expired = list(pending)
+                for future in expired:
+                    key, resolved, token, started, _ = pending.pop(future)
+                    # The thread can't be stopped; its token is cancelled and its result ignored
+                    token.cancel(stop or "timeout")
+                    if stop == "timeout" or stop is None:
+                        error = StepTimeout(f"{key} did not finish within the time limit")
+                    else:
+                        error = StepCancelled(stop)
+                    event = step_event(key, resolved, started, time.time() - started, error=error)
+                    unlocked, skipped = self._finish(event, waiting, on_result, on_error)
+                    yield event
+                    yield from skipped
+                if expired:
+                    # Abandoned threads keep their workers busy; later steps get a fresh pool
+                    abandoned = True
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    pool = ThreadPoolExecutor(max_workers=self.max_workers)
+                if stop is not None:
+                    yield from self._skip_remaining(waiting, stop)
+                    return
+        finally:
+            # A consumer that stops early shouldn't wait for queued steps
+            pool.shutdown(wait=not abandoned, cancel_futures=True)
+
+    async def arun(self, ainvoke, context, on_result=None, on_error=None, completed=None, skip=None, cancel=None):
+        """
+        Async counterpart of run. ainvoke(step, resolved_inputs) is awaited for each step;
+        every step waits only on its own dependencies and all steps are scheduled with
+        asyncio.gather, with at most max_workers steps in flight.
+        Returns (results, failed) where failed maps key -> exception.
+        """
+        async for _ in self.aiter_run(ainvoke, context, on_result, on_error, completed, skip, cancel):
+            pass
+        return self.results, self.failed
+
+    async def aiter_run(self, ainvoke, context, on_result=None, on_error=None, completed=None, skip=None, cancel=None):
+        """
+        Async-iterator form of arun: yields a step event as each step completes. Step timeouts
+        and cancellation cancel coroutine steps; sync steps running in an executor are abandoned.
+        """
+        graph = self.graph
+        runnable, waiting, skipped = self._prepare(completed, skip)
+        for event in skipped:
+            yield event
+        results = self.results
+        if not runnable:
+            return
+
+        loop = asyncio.get_running_loop()
+        # Each step resolves its future with None on success or with the cause its dependents report
+        outcome = {key: loop.create_future() for key in runnable}
+        for key in skip or ():
+            future = outcome.setdefault(key, loop.create_future())
+            if not future.done():
+                future.set_result(key)
+        slots = asyncio.Semaphore(self.max_workers)
+        events = asyncio.Queue()
+        running = {}
+
+        async def run_step(key):
+            deps = [outcome[d] for d in graph.dependencies[key] if d in outcome]
+            for finished in asyncio.as_completed(deps):
+                cause = await finished
+                if cause is not None:
+                    if key not in self.outcomes:
+                        waiting.pop(key, None)
+                        await events.put(self._record(skipped_event(key, graph.nodes[key]["inputs"], cause)))
+                    outcome[key].set_result(cause)
+                    return
+            step = graph.nodes[key]
+            resolved = resolve_inputs(step["inputs"], results, context)
+            async with slots:
+                if cancel is not None and cancel.cancelled:
+                    # Nothing new starts once the run is cancelled
+                    cause = cancel.reason or "cancelled"
+                    waiting.pop(key, None)
+                    await events.put(self._record(skipped_event(key, step["inputs"], cause)))
+                    outcome[key].set_result(cause)
+                    return
+                token = CancelToken(cancel)
+                running[key] = (resolved, token, time.time())
+                try:
+                    event = await _atimed_call(ainvoke, key, step, resolved, token, self._step_timeout(step))
+                finally:
+                    running.pop(key, None)
+            self._record(event)
+            waiting.pop(key, None)
+            if event["status"] == "ok":
+                self.results[key] = event["output"]
+                if on_result:
+                    on_result(key, event["output"])
+                outcome[key].set_result(None)
+            else:
+                self.failed[key] = event["error"]
+                if on_error:
+                    on_error(key, event["error"])
+                outcome[key].set_result(key)
+            events.put_nowait(event)
+            if event["status"] != "ok":
+                # Like iter_run, dependents are reported right behind the failure; their own
+                # tasks then only resolve their futures
+                for skipped_dependent in self._skip_dependents(key, waiting):
+                    events.put_nowait(skipped_dependent)
+
+        async def run_all():
+            try:
+                await asyncio.gather(*(run_step(key) for key in runnable))
+            finally:
+                await events.put(None)
+
+        deadline = None if self.timeout is None else loop.time() + self.timeout
+        runner = asyncio.ensure_future(run_all())
+        stop = None
+        try:
+            while True:
+                timeout = None if deadline is None else max(0.0, deadline - loop.time())
+                if cancel is not None:
+                    timeout = CANCEL_POLL_SECONDS if timeout is None else min(timeout, CANCEL_POLL_SECONDS)
+                try:
+                    event = await asyncio.wait_for(events.get(), timeout)
+                except asyncio.TimeoutError:
+                    if cancel is not None and cancel.cancelled:
+                        stop = cancel.reason or "cancelled"
+                    elif deadline is not None and loop.time() >= deadline:
+                        stop = "timeout"
+                    if stop is None:
+                        continue
+                    break
+                if event is None:
+                    break
+                yield event
+            if stop is None:
+                await runner
+                return
+            in_flight = dict(running)
+            runner.cancel()
+            await asyncio.gather(runner, return_exceptions=True)
+            while not events.empty():
+                event = events.get_nowait()
+                if event is not None:
+                    yield event
+            for key, (resolved, token, started) in in_flight.items():
+                if key in self.outcomes:
+                    continue
+                token.cancel(stop)
+                error = StepTimeout(f"{key} did not finish within the run time limit") if stop == "timeout" else StepCancelled(stop)
+                event = self._record(step_event(key, resolved, started, time.time() - started, error=error))
+                self.failed[key] = error
+                if on_error:
+                    on_error(key, error)
+                yield event
+                for skipped_dependent in self._skip_dependents(key, waiting):
+                    yield skipped_dependent
+            for event in self._skip_remaining(waiting, stop):
+                yield event
+        finally:
+            if not runner.done():
+                runner.cancel()
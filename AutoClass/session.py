@@ -0,0 +1,271 @@
+import copy
+import uuid
+
+from AutoClass.memo import stable_hash
+
+
+class AgentSession:
+    """
+    Per-query state for an Agent that is shared between threads or async tasks.
+
+    The Agent holds only the registered catalog, caches and clients; everything that belongs
+    to one query (the method selection, the pruned and filled pipelines, the results) lives
+    here, so concurrent sessions on one warm agent never see each other's state.
+
+        session = agent.session("Multiply 12 by 3 and add 4")
+        session.plan()
+        results = session.run()
+    """
+
+    def __init__(self, agent, query=None):
+        self.agent = agent
+        self.query = query
+        self.selection = None
+        self.pruned = None
+        self.pipeline = None
+        self.results = {}
+        # Step events of the last run keyed by "Class.method": status, output or error, cause, timing
+        self.outcomes = {}
+        # Hash of every method entry of the last executed pipeline, used by rerun to find what changed
+        self.fingerprints = {}
+        self.executed = None
+        self.from_cache = False
+        # Journal id of the last run when the agent has a journal (see Agent.resume_run)
+        self.run_id = None
+
+    def _query(self, query):
+        if query is not None:
+            self.query = query
+        if self.query is None:
+            raise ValueError("AgentSession has no query")
+        return self.query
+
+    def _pruned(self, pipeline):
+        pipeline = pipeline or self.pruned
+        if pipeline is None:
+            raise ValueError("Call choose_class_method before determine_input_parameters or pass a pipeline")
+        return pipeline
+
+    def _select(self, response):
+        agent = self.agent
+        self.selection = agent._parse_class_method_choice(response, store=False)
+        self.pruned = agent.get_method_context_subset(self.selection if isinstance(self.selection, dict) else {})
+        return self.selection
+
+    # Planning steps
+
+    def choose_class_method(self, query=None):
+        message = self.agent._choose_class_method_message(self._query(query))
+        return self._select(self.agent._call_llm("choose_class_method", message))
+
+    async def achoose_class_method(self, query=None):
+        message = self.agent._choose_class_method_message(self._query(query))
+        return self._select(await self.agent._acall_llm("choose_class_method", message))
+
+    def _checked(self, response, single=False):
+        """
+        Validated pipeline plus the issues that still need the LLM (see Agent._check_pipeline).
+        """
+        agent = self.agent
+        pipeline, issues = agent._check_pipeline(response)
+        if single and not pipeline.get("classes"):
+            agent.logger.warning("Single-shot plan unusable, falling back to two-step planning")
+            return {}, []
+        return pipeline, issues
+
+    def determine_input_parameters(self, query=None, pipeline=None):
+        message = self.agent._input_parameters_message(self._query(query), self._pruned(pipeline))
+        pipeline, issues = self._checked(self.agent._call_llm("determine_input_parameters", message))
+        self.pipeline = self.agent._repair_pipeline(self.query, pipeline, issues)
+        return self.pipeline
+
+    async def adetermine_input_parameters(self, query=None, pipeline=None):
+        message = self.agent._input_parameters_message(self._query(query), self._pruned(pipeline))
+        pipeline, issues = self._checked(await self.agent._acall_llm("determine_input_parameters", message))
+        self.pipeline = await self.agent._arepair_pipeline(self.query, pipeline, issues)
+        return self.pipeline
+
+    def plan_pipeline(self, query=None):
+        message = self.agent._plan_pipeline_message(self._query(query))
+        pipeline, issues = self._checked(self.agent._call_llm("plan_pipeline", message), single=True)
+        self.pipeline = self.agent._repair_pipeline(self.query, pipeline, issues)
+        return self.pipeline
+
+    async def aplan_pipeline(self, query=None):
+        message = self.agent._plan_pipeline_message(self._query(query))
+        pipeline, issues = self._checked(await self.agent._acall_llm("plan_pipeline", message), single=True)
+        self.pipeline = await self.agent._arepair_pipeline(self.query, pipeline, issues)
+        return self.pipeline
+
+    def _cached(self, use_cache):
+        agent = self.agent
+        key = agent._plan_cache_key(self.query, use_cache)
+        if key:
+            cached = agent.plan_cache.get(key)
+            agent.instrumentation.cache_lookup("plan", cached is not None)
+            if cached is not None:
+                agent.logger.debug("Plan cache hit for %r", self.query)
+                self.pipeline, self.from_cache = cached, True
+        return key
+
+    def _store(self, key):
+        if key and self.pipeline:
+            self.agent.plan_cache.set(key, self.pipeline)
+        return self.pipeline
+
+    def plan(self, query=None, use_cache=True, planner=None):
+        """
+        Returns the filled pipeline for the query (see Agent.plan) and keeps it on the session.
+        """
+        self._query(query)
+        key = self._cached(use_cache)
+        if self.from_cache:
+            return self.pipeline
+        self.pipeline = {}
+        if (planner or self.agent.planner) == "single":
+            self.plan_pipeline()
+        if not self.pipeline:
+            self.choose_class_method()
+            self.determine_input_parameters()
+        return self._store(key)
+
+    async def aplan(self, query=None, use_cache=True, planner=None):
+        self._query(query)
+        key = self._cached(use_cache)
+        if self.from_cache:
+            return self.pipeline
+        self.pipeline = {}
+        if (planner or self.agent.planner) == "single":
+            await self.aplan_pipeline()
+        if not self.pipeline:
+            await self.achoose_class_method()
+            await self.adetermine_input_parameters()
+        return self._store(key)
+
+    # Execution
+
+    def _run_id(self, run_id):
+        self.run_id = run_id or (uuid.uuid4().hex if self.agent.journal is not None else None)
+        return self.run_id
+
+    def _collect(self, event):
+        self.outcomes[event["key"]] = event
+        if event["status"] == "ok":
+            self.results[event["key"]] = event["output"]
+
+    @staticmethod
+    def _fingerprints(pipeline):
+        return {
+            f"{cls['class_name']}.{method['method']}": stable_hash({k: v for k, v in method.items() if k != "output"})
+            for cls in pipeline.get("classes", []) for method in cls.get("methods", [])
+        }
+
+    def run(self, pipeline=None, max_workers=None, run_id=None, timeout=None, cancel=None):
+        for _ in self.iter_run(pipeline, max_workers, run_id, timeout, cancel):
+            pass
+        return self.results
+
+    async def arun(self, pipeline=None, max_workers=None, run_id=None, timeout=None, cancel=None):
+        async for _ in self.aiter_run(pipeline, max_workers, run_id, timeout, cancel):
+            pass
+        return self.results
+
+    def _begin(self, pipeline, completed=None):
+        self.executed = pipeline
+        self.fingerprints = self._fingerprints(pipeline) if pipeline else {}
+        self.results = dict(completed or {})
+        self.outcomes = {key: event for key, event in self.outcomes.items() if key in self.results}
+
+    def iter_run(self, pipeline=None, max_workers=None, run_id=None, timeout=None, cancel=None, completed=None):
+        """
+        Yields step events (see Agent.iter_pipeline_with_dependencies), collecting the outputs in
+        results and every step's event, including failed and skipped ones, in outcomes.
+        """
+        pipeline = pipeline or self.pipeline
+        self._begin(pipeline, completed)
+        if not pipeline:
+            return
+        events = self.agent.iter_pipeline_with_dependencies(
+            pipeline, max_workers=max_workers, run_id=self._run_id(run_id), query=self.query,
+            timeout=timeout, cancel=cancel, completed=completed
+        )
+        for event in events:
+            self._collect(event)
+            yield event
+
+    async def aiter_run(self, pipeline=None, max_workers=None, run_id=None, timeout=None, cancel=None, completed=None):
+        pipeline = pipeline or self.pipeline
+        self._begin(pipeline, completed)
+        if not pipeline:
+            return
+        events = self.agent.aiter_pipeline_with_dependencies(
+            pipeline, max_workers=max_workers, run_id=self._run_id(run_id), query=self.query,
+            timeout=timeout, cancel=cancel, completed=completed
+        )
+        async for event in events:
+            self._collect(event)
+            yield event
+
+    # Incremental re-execution
+
+    def edit(self, edits):
+        """
+        Returns a copy of the last executed pipeline with step inputs replaced:
+        {"Class.method": {"param": value}}.
+        """
+        pipeline = copy.deepcopy(self.executed or self.pipeline or {})
+        remaining = {key: dict(inputs) for key, inputs in edits.items()}
+        for cls in pipeline.get("classes", []):
+            for method in cls.get("methods", []):
+                changes = remaining.pop(f"{cls['class_name']}.{method['method']}", None)
+                if changes:
+                    method["inputs"] = {**method.get("inputs", {}), **changes}
+        if remaining:
+            raise KeyError(f"Steps not in the pipeline: {', '.join(sorted(remaining))}")
+        return pipeline
+
+    def dirty(self, pipeline):
+        """
+        Keys of the steps of pipeline that must run again after the last run: steps whose entry
+        changed (or is new), steps that didn't succeed, and everything downstream of them.
+        Only changes to the plan are detected, not to persisted results it references.
+        """
+        fingerprints = self._fingerprints(pipeline)
+        changed = {
+            key for key, fingerprint in fingerprints.items()
+            if fingerprint is None or self.fingerprints.get(key) != fingerprint or key not in self.results
+        }
+        graph = self.agent.build_dependency_graph(pipeline, context=self.agent.run_context())
+        return changed | graph.descendants(changed & set(graph.nodes))
+
+    def _rerun_plan(self, edits, pipeline):
+        if self.executed is None:
+            raise ValueError("Call run before rerun")
+        if pipeline is None:
+            pipeline = self.edit(edits or {}) if edits else copy.deepcopy(self.executed)
+        dirty = self.dirty(pipeline)
+        completed = {key: output for key, output in self.results.items() if key not in dirty}
+        self.agent.logger.info("Re-running %d steps, reusing %d", len(dirty), len(completed))
+        self.pipeline = pipeline
+        return pipeline, completed
+
+    def iter_rerun(self, edits=None, pipeline=None, max_workers=None, run_id=None, timeout=None, cancel=None):
+        """
+        Re-executes only what an edit affects: edits ({"Class.method": {"param": value}}) are
+        applied to the last executed pipeline, or a whole edited pipeline is given. Steps whose
+        entries and upstream steps are unchanged keep their previous output; the edited steps
+        and their dependents run again. Yields the events of the steps that ran.
+        """
+        pipeline, completed = self._rerun_plan(edits, pipeline)
+        yield from self.iter_run(pipeline, max_workers, run_id, timeout, cancel, completed=completed)
+
+    def rerun(self, edits=None, pipeline=None, max_workers=None, run_id=None, timeout=None, cancel=None):
+        for _ in self.iter_rerun(edits, pipeline, max_workers, run_id, timeout, cancel):
+            pass
+        return self.results
+
+    async def arerun(self, edits=None, pipeline=None, max_workers=None, run_id=None, timeout=None, cancel=None):
+        pipeline, completed = self._rerun_plan(edits, pipeline)
+        async for _ in self.aiter_run(pipeline, max_workers, run_id, timeout, cancel, completed=completed):
+            pass
+        return self.results
@@ -0,0 +1,76 @@
+import ast
+import json
+import re
+
+CLASS_NAME_PATTERN = re.compile(r"""["']class_name["']\s*:\s*["'](\w+)["']""")
+
+
+def _literal(text):
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+    try:
+        return ast.literal_eval(text)
+    except (ValueError, SyntaxError):
+        return None
+
+
+class PlanStreamParser:
+    """
+    Picks complete method entries out of a pipeline that is still being streamed by the LLM.
+
+    feed() takes the next chunk of text and returns the (class_name, method) pairs whose
+    {"method": ..., "inputs": {...}} object closed in that chunk, so their execution can start
+    before the rest of the plan has arrived.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self._seen = set()
+        self._scanned = 0
+        self._stack = []
+        self._in_string = None
+        self._escaped = False
+
+    def feed(self, chunk):
+        self.text += chunk
+        found = []
+        text = self.text
+        for index in range(self._scanned, len(text)):
+            char = text[index]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == self._in_string:
+                    self._in_string = None
+                continue
+            if char in "\"'":
+                self._in_string = char
+            elif char == "{":
+                self._stack.append(index)
+            elif char == "}" and self._stack:
+                start = self._stack.pop()
+                entry = self._method_at(start, index)
+                if entry:
+                    found.append(entry)
+        self._scanned = len(text)
+        return found
+
+    def _method_at(self, start, end):
+        snippet = self.text[start:end + 1]
+        if "method" not in snippet or "inputs" not in snippet:
+            return None
+        value = _literal(snippet)
+        if not isinstance(value, dict) or "method" not in value or not isinstance(value.get("inputs"), dict):
+            return None
+        classes = CLASS_NAME_PATTERN.findall(self.text, 0, start)
+        if not classes:
+            return None
+        key = f"{classes[-1]}.{value['method']}"
+        if key in self._seen:
+            return None
+        self._seen.add(key)
+        return classes[-1], value
@@ -1,12 +1,279 @@
+import time
+
 from streamlit_flow import streamlit_flow
 from streamlit_flow.elements import StreamlitFlowEdge, StreamlitFlowNode
+from streamlit_flow.state import StreamlitFlowState
 import streamlit as st
-from streamlit_option_menu import option_menu
+
+from AutoClass.memo import stable_hash
+from AutoClass.results import summarize
+from AutoClass.scheduler import DependencyGraph
+
+STATUS_ICONS = {
+    "pending": "⏳",
+    "ok": "✅",
+    "error": "❌",
+    "timeout": "⏱️",
+    "cancelled": "🛑",
+    "skipped": "⏭️",
+}
+
+STATUS_COLORS = {
+    "pending": "#9e9e9e",
+    "ok": "#2e7d32",
+    "error": "#c62828",
+    "timeout": "#ef6c00",
+    "cancelled": "#6a1b9a",
+    "skipped": "#bdbdbd",
+}
+
+# Longer values are summarized so a node stays one card wide
+NODE_TEXT_LIMIT = 60
+# Above this many nodes the graph gets a minimap to navigate by
+MINIMAP_NODES = 40
+
 
 def clear_session_state():
     st.session_state.clear()
 
 
-class AgentUI: 
-    def __init__(self):
-        pass
+def pipeline_steps(pipeline):
+    """
+    Flat {"class", "method_name", "inputs"} steps of a pipeline, enough to build its
+    DependencyGraph without an Agent or registered instances.
+    """
+    return [
+        {"class": cls["class_name"], "method_name": method["method"], "inputs": method.get("inputs", {})}
+        for cls in pipeline.get("classes", []) for method in cls.get("methods", [])
+    ]
+
+
+def layered_layout(graph):
+    """
+    Deterministic {key: (layer, row)} for a DependencyGraph.
+
+    A step's layer is the length of the longest dependency chain leading to it, so every edge
+    points right. Within a layer steps are ordered by the mean row of their dependencies (ties
+    in plan order), which keeps most edges short and uncrossed. Steps in a cycle share one
+    extra layer at the end. Runs in O(V + E log V), so hundreds of steps lay out instantly.
+    """
+    layers = {}
+    for key in graph.order:
+        layers[key] = 1 + max((layers[dep] for dep in graph.dependencies[key]), default=-1)
+    extra = max(layers.values(), default=-1) + 1
+    rank = {}
+    by_layer = {}
+    for index, key in enumerate(graph.nodes):
+        rank[key] = index
+        by_layer.setdefault(layers.setdefault(key, extra), []).append(key)
+
+    rows = {}
+    for layer in sorted(by_layer):
+        def weight(key):
+            parents = [rows[dep] for dep in graph.dependencies[key] if dep in rows]
+            return (sum(parents) / len(parents) if parents else 0, rank[key])
+        for row, key in enumerate(sorted(by_layer[layer], key=weight)):
+            rows[key] = row
+    return {key: (layers[key], rows[key]) for key in graph.nodes}
+
+
+class AgentUI:
+    """
+    Streamlit rendering of a pipeline as a flow graph that stays cheap to redraw.
+
+    - set_pipeline() lays the dependency DAG out in layers (see layered_layout); edges come
+      from the graph, so only inputs that name another step of the plan are drawn
+    - update()/follow() change the status of just the steps that finished
+    - render() draws the graph, rebuilding the flow state only when something changed, so
+      reruns that touch nothing else keep the user's pan, zoom and dragged nodes
+
+    Keep one instance per graph across Streamlit reruns with AgentUI.get(key).
+
+        ui = AgentUI.get("flow")
+        ui.set_pipeline(session.pipeline)
+        ui.follow(session.iter_run())
+        ui.render()
+    """
+
+    def __init__(self, key="flow", x_spacing=300, y_spacing=140):
+        self.key = key
+        self.x_spacing = x_spacing
+        self.y_spacing = y_spacing
+        self.graph = None
+        self.positions = {}
+        self.edges = []
+        self.status = {}
+        self.events = {}
+        self._structure = None
+        self._entries = {}
+        self._nodes = {}
+        self._state = None
+
+    @classmethod
+    def get(cls, key="flow", **kwargs):
+        """
+        The AgentUI kept in st.session_state for key, created on first use.
+        """
+        name = f"{key}_agent_ui"
+        if name not in st.session_state:
+            st.session_state[name] = cls(key, **kwargs)
+        return st.session_state[name]
+
+    # Graph and layout
+
+    def set_pipeline(self, pipeline):
+        """
+        Shows pipeline. The layout is recomputed only when the steps or their dependencies
+        changed; steps whose entry changed are reset to pending, all others keep their status.
+        Returns True when the layout was rebuilt.
+        """
+        graph = DependencyGraph(pipeline_steps(pipeline or {}))
+        entries = {
+            f"{cls['class_name']}.{method['method']}": stable_hash(method)
+            for cls in (pipeline or {}).get("classes", []) for method in cls.get("methods", [])
+        }
+        structure = [(key, sorted(graph.dependencies[key])) for key in graph.nodes]
+        if structure == self._structure:
+            changed = [key for key, entry in entries.items() if entry is None or self._entries.get(key) != entry]
+            self.graph, self._entries = graph, entries
+            self.reset(changed)
+            return False
+
+        self.graph, self._entries, self._structure = graph, entries, structure
+        self.positions = self._positions(layered_layout(graph))
+        self.edges = [
+            StreamlitFlowEdge(id=f"{dep}->{key}", source=dep, target=key)
+            for key in graph.nodes for dep in sorted(graph.dependencies[key])
+        ]
+        self.status = {key: "pending" for key in graph.nodes}
+        self.events = {}
+        self._nodes = {key: self._node(key) for key in graph.nodes}
+        self._state = None
+        return True
+
+    def _positions(self, layout):
+        sizes = {}
+        for layer, _ in layout.values():
+            sizes[layer] = sizes.get(layer, 0) + 1
+        # Center every layer vertically so wide and narrow layers line up
+        return {
+            key: (layer * self.x_spacing, (row - (sizes[layer] - 1) / 2) * self.y_spacing)
+            for key, (layer, row) in layout.items()
+        }
+
+    def _node(self, key):
+        graph = self.graph
+        if not graph.dependencies[key]:
+            node_type = "input" if graph.dependents[key] else "default"
+        else:
+            node_type = "output" if not graph.dependents[key] else "default"
+        return StreamlitFlowNode(
+            id=key,
+            pos=self.positions[key],
+            data={"content": self._content(key)},
+            node_type=node_type,
+            source_position="right",
+            target_position="left",
+            style={"border": f"2px solid {STATUS_COLORS[self.status[key]]}"}
+        )
+
+    def _content(self, key):
+        step = self.graph.nodes[key]
+        lines = [f"**{step['method_name']}** ({step['class']})"]
+        lines.extend(f"{param}: {summarize(value, NODE_TEXT_LIMIT)}" for param, value in step["inputs"].items())
+        status = self.status[key]
+        event = self.events.get(key)
+        if status == "ok":
+            detail = summarize(event["output"], NODE_TEXT_LIMIT)
+        elif status == "skipped":
+            detail = f"skipped, waiting on {event['cause']}"
+        elif status == "pending":
+            detail = "Not executed"
+        else:
+            error = str(event["error"])
+            detail = f"{status}: {error if len(error) <= NODE_TEXT_LIMIT else error[:NODE_TEXT_LIMIT - 3] + '...'}"
+        return "\n".join(lines) + f"\n\n{STATUS_ICONS[status]} {detail}"
+
+    # Status
+
+    def reset(self, keys):
+        """
+        Marks keys as not executed, e.g. the dirty steps before a rerun (see AgentSession.dirty).
+        """
+        for key in keys:
+            if key in self._nodes:
+                self.status[key] = "pending"
+                self.events.pop(key, None)
+                self._nodes[key] = self._node(key)
+                self._state = None
+
+    def update(self, event):
+        """
+        Applies one step event; only that step's node is rebuilt.
+        """
+        key = event["key"]
+        if key not in self._nodes or self.events.get(key) is event:
+            return
+        self.status[key] = event["status"]
+        self.events[key] = event
+        self._nodes[key] = self._node(key)
+        self._state = None
+
+    def apply(self, outcomes):
+        """
+        Applies {key: event}, e.g. AgentSession.outcomes; events already shown are skipped.
+        """
+        for event in outcomes.values():
+            self.update(event)
+
+    def counts(self):
+        counts = {}
+        for status in self.status.values():
+            counts[status] = counts.get(status, 0) + 1
+        return counts
+
+    def follow(self, events, interval=0.25, recent=10):
+        """
+        Consumes step events as the run produces them, updating node statuses and showing a
+        progress bar with the most recent steps. Redraws happen at most every interval
+        seconds, so pipelines with hundreds of steps don't spend their time re-rendering.
+        """
+        bar = st.progress(0.0)
+        log = st.empty()
+        finished = []
+        drawn = 0.0
+
+        def draw():
+            total = len(self.status) or 1
+            done = total - self.counts().get("pending", 0)
+            bar.progress(min(done / total, 1.0), text=f"{done}/{total} steps finished")
+            log.markdown("\n\n".join(finished[-recent:]))
+
+        for event in events:
+            self.update(event)
+            key = event["key"]
+            if event["status"] == "ok":
+                finished.append(f"{STATUS_ICONS['ok']} {key} ({event['duration'] * 1000:.1f} ms): {summarize(event['output'])}")
+            elif event["status"] == "skipped":
+                finished.append(f"{STATUS_ICONS['skipped']} {key}: skipped, waiting on {event['cause']}")
+            else:
+                finished.append(f"{STATUS_ICONS.get(event['status'], '❌')} {key} ({event['status']}): {event['error']}")
+            if time.monotonic() - drawn >= interval:
+                draw()
+                drawn = time.monotonic()
+        draw()
+
+    # Rendering
+
+    def render(self, height=600, **kwargs):
+        """
+        Draws the graph and returns the flow state reported back by the component.
+        """
+        if self.graph is None:
+            return None
+        if self._state is None:
+            self._state = StreamlitFlowState(nodes=list(self._nodes.values()), edges=self.edges)
+        kwargs.setdefault("fit_view", True)
+        kwargs.setdefault("show_minimap", len(self._nodes) > MINIMAP_NODES)
+        self._state = streamlit_flow(self.key, self._state, height=height, **kwargs)
+        return self._state
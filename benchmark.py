@@ -0,0 +1,310 @@
+"""
+Offline benchmark suite for AutoClass.
+
+Runs against ScriptedLLM (AutoClass/llm.py), so no API key or network is needed, and writes
+machine-readable results that can be compared across versions:
+
+    python benchmark.py --output results.json
+    python benchmark.py --sizes 10 100 --steps 50 --baseline results.json
+
+Measured:
+- register_class time for synthetic registries (cold and with memoized introspection)
+- prompt build time and prompt token size for the selection and single-shot planning prompts
+- plan parsing time
+- run_pipeline_with_dependencies throughput for wide, deep and diamond-shaped DAGs
+- "map" step throughput over a list input, per item and through a batch variant
+- plan + execute end to end through the scripted LLM
+"""
+import argparse
+import json
+import operator
+import platform
+import subprocess
+import sys
+import time
+
+from AutoClass.Agent import Agent
+from AutoClass.fanout import batch_of
+from AutoClass.llm import ScriptedLLM
+
+BENCHMARK_FORMAT_VERSION = 1
+METHODS_PER_CLASS = 10
+
+ARITHMETIC = [
+    ("add", operator.add, "Adds two numbers together"),
+    ("subtract", operator.sub, "Subtracts the second number from the first"),
+    ("multiply", operator.mul, "Multiplies two numbers"),
+    ("maximum", max, "Returns the larger of two numbers"),
+]
+STRINGS = [
+    ("upper", str.upper, "Converts the input string to uppercase"),
+    ("lower", str.lower, "Converts the input string to lowercase"),
+    ("reverse", lambda text: text[::-1], "Reverses the characters in the input string"),
+]
+
+
+def _arithmetic_method(name, fn, description):
+    def method(self, a, b):
+        return fn(a, b)
+    method.__name__ = name
+    method.__doc__ = f"""
+        - Description: {description}.
+        - List of parameters:
+            - param a: First number :type: int or float
+            - param b: Second number :type: int or float
+        :return: Result of the operation :rtype: int or float
+        """
+    return method
+
+
+def _string_method(name, fn, description):
+    def method(self, text):
+        return fn(text)
+    method.__name__ = name
+    method.__doc__ = f"""
+        - Description: {description}.
+        - List of parameters:
+            - param text: Input string :type: str
+        :return: Transformed string :rtype: str
+        """
+    return method
+
+
+def make_class(index, methods, arithmetic_only=False):
+    """
+    Builds a synthetic class in the style of ArithmeticOperations/StringUtils with the given
+    number of documented methods.
+    """
+    attrs = {"__doc__": f"Synthetic operations group {index} used for benchmarking."}
+    for i in range(methods):
+        if arithmetic_only or i % 2 == 0:
+            name, fn, description = ARITHMETIC[i % len(ARITHMETIC)]
+            attrs[f"{name}_{i}"] = _arithmetic_method(f"{name}_{i}", fn, f"{description} (variant {i})")
+        else:
+            name, fn, description = STRINGS[i % len(STRINGS)]
+            attrs[f"{name}_{i}"] = _string_method(f"{name}_{i}", fn, f"{description} (variant {i})")
+    return type(f"Operations{index}", (), attrs)
+
+
+def make_registry(total_methods):
+    classes = []
+    for index in range(max(1, -(-total_methods // METHODS_PER_CLASS))):
+        count = min(METHODS_PER_CLASS, total_methods - index * METHODS_PER_CLASS)
+        classes.append(make_class(index, max(1, count)))
+    return classes
+
+
+def make_dag(class_name, shape, steps):
+    """
+    Pipeline over the arithmetic methods of class_name ("add_{i}" style keys, see make_class):
+    - wide: independent steps
+    - deep: a single chain
+    - diamond: stacked diamonds, every layer of two depends on both steps of the previous one
+    """
+    methods = []
+    for i in range(steps):
+        name = f"{ARITHMETIC[i % len(ARITHMETIC)][0]}_{i}"
+        if shape == "wide" or i == 0:
+            inputs = {"a": i, "b": 1}
+        elif shape == "deep":
+            inputs = {"a": f"{class_name}.{methods[i - 1]['method']}", "b": 1}
+        elif i < 2:
+            inputs = {"a": f"{class_name}.{methods[0]['method']}", "b": 1}
+        else:
+            layer_start = i - i % 2 - 2
+            inputs = {
+                "a": f"{class_name}.{methods[layer_start]['method']}",
+                "b": f"{class_name}.{methods[layer_start + 1]['method']}",
+            }
+        methods.append({"method": name, "inputs": inputs, "output": "int or float"})
+    return {"classes": [{"class_name": class_name, "methods": methods}]}
+
+
+def measure(fn, repeat):
+    """
+    Best-of-repeat wall time in seconds, plus the last return value.
+    """
+    best, value = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        value = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, value
+
+
+class BenchmarkSuite:
+    def __init__(self, sizes, steps, repeat, max_workers):
+        self.sizes = sizes
+        self.steps = steps
+        self.repeat = repeat
+        self.max_workers = max_workers
+        self.results = []
+
+    def record(self, name, value, unit, **params):
+        self.results.append({"name": name, "params": params, "value": value, "unit": unit})
+        label = ", ".join(f"{k}={v}" for k, v in params.items())
+        print(f"{name:<28} {label:<40} {value:>14.6g} {unit}", file=sys.stderr)
+
+    def bench_registry(self, size):
+        # Cold: fresh classes, so introspection runs; warm: the same classes on a new Agent
+        classes = make_registry(size)
+        instances = [cls() for cls in classes]
+
+        def register():
+            agent = Agent(llm=ScriptedLLM())
+            for instance in instances:
+                agent.register_class(instance)
+            return agent
+
+        start = time.perf_counter()
+        agent = register()
+        self.record("register_cold", time.perf_counter() - start, "s", methods=size)
+        seconds, agent = measure(register, self.repeat)
+        self.record("register_warm", seconds, "s", methods=size)
+
+        query = "multiply 12 by 3, add 4 and convert the result to uppercase"
+        for compact in (False, True):
+            agent.compact_prompts = compact
+            for prompt, build in (
+                ("select", agent._choose_class_method_message),
+                ("plan", agent._plan_pipeline_message),
+            ):
+                seconds, message = measure(lambda: build(query), self.repeat)
+                self.record("prompt_build", seconds, "s", methods=size, prompt=prompt, compact=compact)
+                tokens = agent.prompt_catalog.token_count(message.content)
+                self.record("prompt_tokens", tokens, "tokens", methods=size, prompt=prompt, compact=compact)
+
+    def bench_parsing(self, steps):
+        cls = make_class(0, steps, arithmetic_only=True)
+        agent = Agent(llm=ScriptedLLM())
+        agent.register_class(cls())
+        text = json.dumps(make_dag(cls.__name__, "diamond", steps))
+        seconds, _ = measure(lambda: agent._check_pipeline(text), self.repeat)
+        self.record("plan_parse", seconds, "s", steps=steps)
+
+    def bench_execution(self, steps):
+        cls = make_class(0, steps, arithmetic_only=True)
+        for shape in ("wide", "deep", "diamond"):
+            pipeline = make_dag(cls.__name__, shape, steps)
+            for workers in sorted({1, self.max_workers}):
+                agent = Agent(llm=ScriptedLLM(), max_workers=workers)
+                agent.register_class(cls())
+                seconds, results = measure(lambda: agent.run_pipeline_with_dependencies(pipeline), self.repeat)
+                if len(results) != steps:
+                    raise RuntimeError(f"{shape} pipeline resolved {len(results)} of {steps} steps")
+                self.record("execute_throughput", steps / seconds, "steps/s", steps=steps, shape=shape, max_workers=workers)
+
+    def bench_fan_out(self, steps):
+        # One mapped step over steps * 100 items; lower_1 is a string method (see make_class)
+        cls = make_class(0, 2)
+        batched = type(cls.__name__, (cls,), {"lower_1_batch": batch_of("lower_1")(
+            lambda self, text: [t.lower() for t in text]
+        )})
+        items = [f"Review Number {i}" for i in range(steps * 100)]
+        pipeline = {"classes": [{"class_name": cls.__name__, "methods": [
+            {"method": "lower_1", "inputs": {"text": items}, "map": "text"}
+        ]}]}
+        for variant, target in (("per_item", cls), ("batch", batched)):
+            agent = Agent(llm=ScriptedLLM(), max_workers=self.max_workers)
+            agent.register_class(target())
+            seconds, results = measure(lambda: agent.run_pipeline_with_dependencies(pipeline), self.repeat)
+            if len(results.get(f"{cls.__name__}.lower_1", ())) != len(items):
+                raise RuntimeError(f"map step returned the wrong number of outputs ({variant})")
+            self.record("map_throughput", len(items) / seconds, "items/s", items=len(items), variant=variant)
+
+    def bench_end_to_end(self, steps):
+        cls = make_class(0, steps, arithmetic_only=True)
+        plan = json.dumps(make_dag(cls.__name__, "deep", steps))
+        agent = Agent(llm=ScriptedLLM(responder=lambda prompt: plan), planner="single", max_workers=self.max_workers)
+        agent.register_class(cls())
+        seconds, results = measure(lambda: agent.run_pipeline("run the chain", use_cache=False), self.repeat)
+        if len(results) != steps:
+            raise RuntimeError(f"end to end run resolved {len(results)} of {steps} steps")
+        self.record("plan_and_execute", seconds, "s", steps=steps)
+
+    def run(self):
+        for size in self.sizes:
+            self.bench_registry(size)
+        for steps in self.steps:
+            self.bench_parsing(steps)
+            self.bench_execution(steps)
+            self.bench_fan_out(steps)
+            self.bench_end_to_end(steps)
+        return self.results
+
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def compare(results, baseline, threshold):
+    """
+    Returns the results that got worse than the baseline by more than threshold (a fraction).
+    Throughputs regress when they drop, everything else when it grows.
+    """
+    previous = {(r["name"], json.dumps(r["params"], sort_keys=True)): r["value"] for r in baseline["results"]}
+    regressions = []
+    for result in results:
+        old = previous.get((result["name"], json.dumps(result["params"], sort_keys=True)))
+        if not old:
+            continue
+        change = (result["value"] - old) / old
+        if result["unit"].endswith("/s"):
+            change = -change
+        if change > threshold:
+            regressions.append({**result, "baseline": old, "change": change})
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline AutoClass benchmarks")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 10000],
+                        help="registry sizes in methods")
+    parser.add_argument("--steps", type=int, nargs="+", default=[10, 100, 1000],
+                        help="pipeline sizes in steps")
+    parser.add_argument("--repeat", type=int, default=3, help="repetitions per measurement (best is kept)")
+    parser.add_argument("--max-workers", type=int, default=8, help="thread pool size for parallel execution")
+    parser.add_argument("--output", help="write results to this JSON file instead of stdout")
+    parser.add_argument("--baseline", help="earlier results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown before flagging a regression")
+    args = parser.parse_args(argv)
+
+    suite = BenchmarkSuite(args.sizes, args.steps, args.repeat, args.max_workers)
+    report = {
+        "version": BENCHMARK_FORMAT_VERSION,
+        "meta": {
+            "revision": _git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.time(),
+            "repeat": args.repeat,
+        },
+        "results": suite.run(),
+    }
+
+    status = 0
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(report["results"], json.load(f), args.threshold)
+        report["regressions"] = regressions
+        for r in regressions:
+            print(f"Regression: {r['name']} {r['params']} {r['baseline']:.6g} -> {r['value']:.6g} {r['unit']}", file=sys.stderr)
+        status = 1 if regressions else 0
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
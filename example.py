@@ -1,5 +1,6 @@
-from AutoClass.Agent import Agent
-import json
+import sys
+
+from AutoClass.cli import main
 
 class StringUtils:
     """
@@ -110,18 +111,5 @@ class ArithmeticOperations:
     
 
 if __name__ == "__main__":
-    query = input("Query: ")
-    ex = ArithmeticOperations()
-    st = StringUtils()
-    ag = Agent()
-    ag.register_class(ex, alias="ArithmeticOperations")
-    ag.register_class(st, alias='StringUtils')
-    methods = ag.list_methods()
-    classes = ag.list_classes()
-    ag.llm_choose_class_method(query=query)
-    ag.llm_determine_input_parameters(query = query)
-    print(json.dumps(ag.get_current_pipeline(), indent = 4))
-    pipeline = ag.get_current_pipeline()
-    results = ag.run_pipeline_with_dependencies(pipeline=pipeline)
-    print(results)
-
+    # python example.py query "Multiply 12 by 3 and add 4", or plan --save plan.json and then run plan.json
+    sys.exit(main(instances={"ArithmeticOperations": ArithmeticOperations(), "StringUtils": StringUtils()}))
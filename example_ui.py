@@ -1,14 +1,10 @@
 from AutoClass.Agent import Agent
+from AutoClass.results import summarize_results
+from AutoClass.scheduler import REFERENCE_PATTERN
+from AutoClass.ui import AgentUI
 import json
 import streamlit as st
-import json
-from AutoClass.Agent import Agent
 # from example import ArithmeticOperations, StringUtils  # Your example classes
-from streamlit_flow import streamlit_flow
-from streamlit_flow.elements import StreamlitFlowNode, StreamlitFlowEdge
-from streamlit_flow.state import StreamlitFlowState
-from uuid import uuid4
-import random
 
 class StringUtils:
     """
@@ -117,50 +113,21 @@ class ArithmeticOperations:
             raise ValueError("Cannot divide by zero")
         return a / b
     
-def generate_flow_nodes_and_edges(pipeline, results):
-    nodes = []
-    edges = []
-    used_positions = set()
-
-    for i, cls in enumerate(pipeline.get("classes", [])):
-        class_name = cls["class_name"]
-        for j, method in enumerate(cls["methods"]):
-            node_id = f"{class_name}.{method['method']}"
-            label = f"{method['method']}\n({class_name})"
-            inputs = method.get("inputs", {})
-            content = "\n".join([f"{k}: {v}" for k, v in inputs.items()])
-            result = results.get(node_id, "⏳ Not executed")
-
-            # Assign random but spread out positions
-            while True:
-                pos = (i * 250 + random.randint(0, 50), j * 150 + random.randint(0, 50))
-                if pos not in used_positions:
-                    used_positions.add(pos)
-                    break
-
-            node = StreamlitFlowNode(
-                id=node_id,
-                pos=pos,
-                data={"content": f"{content}\n\nResult: {result}"},
-                node_type="default",
-                source_position="right",
-                target_position="left"
-            )
-            nodes.append(node)
-
-            for val in inputs.values():
-                if isinstance(val, str) and "." in val:
-                    edge = StreamlitFlowEdge(
-                        id=str(uuid4()),
-                        source=val,
-                        target=node_id
-                    )
-                    edges.append(edge)
-
-    return nodes, edges
-
 # ---------------- Streamlit App Setup ---------------- #
 
+def build_agent():
+    ag = Agent()
+    ag.register_class(ArithmeticOperations(), alias="ArithmeticOperations")
+    ag.register_class(StringUtils(), alias="StringUtils")
+    return ag
+
+
+@st.cache_resource
+def get_agent():
+    # One warm agent per server process; each query gets its own AgentSession
+    return build_agent()
+
+
 st.set_page_config(page_title="🧠 MCP Pipeline UI", layout="wide")
 st.sidebar.title("MCP Agent 🔧")
 
@@ -173,8 +140,6 @@ show_json = st.sidebar.checkbox("📄 Show raw pipeline JSON")
 if "pipeline" not in st.session_state:
     st.session_state.pipeline = None
     st.session_state.results = None
-    st.session_state.flow_nodes = []
-    st.session_state.flow_edges = []
 
 if "should_run_query" not in st.session_state:
     st.session_state.should_run_query = False
@@ -188,39 +153,73 @@ if run_btn and query:
 
 # ---------------- Main Pipeline Logic ---------------- #
 
-if st.session_state.get("should_run_query", False):
-    ag = Agent()
-    ag.register_class(ArithmeticOperations(), alias="ArithmeticOperations")
-    ag.register_class(StringUtils(), alias="StringUtils")
+def store_run(session):
+    st.session_state.session = session
+    st.session_state.pipeline = session.pipeline
+    st.session_state.results = session.results
 
-    ag.llm_choose_class_method(query=st.session_state.query_text)
-    ag.llm_determine_input_parameters(query=st.session_state.query_text)
 
-    pipeline = ag.get_current_pipeline()
-    results = ag.run_pipeline_with_dependencies()
+def parse_input(text):
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
 
-    nodes, edges = generate_flow_nodes_and_edges(pipeline, results)
 
-    st.session_state.pipeline = pipeline
-    st.session_state.results = results
-    st.session_state.flow_nodes = nodes
-    st.session_state.flow_edges = edges
+if st.session_state.get("should_run_query", False):
+    session = get_agent().session(st.session_state.query_text)
+    # Uses the plan cache and the agent's planner before asking the LLM
+    session.plan()
+    # Nodes change status as their steps finish; the layout is computed once per plan
+    ui = AgentUI.get("flow")
+    ui.set_pipeline(session.pipeline)
+    ui.follow(session.iter_run())
+    store_run(session)
 
     st.session_state.should_run_query = False
     st.rerun()
 
+if st.session_state.get("edits"):
+    # What-if edits re-run only the edited steps and their dependents; no LLM call is made
+    session = st.session_state.session
+    pipeline = session.edit(st.session_state.edits)
+    ui = AgentUI.get("flow")
+    ui.set_pipeline(pipeline)
+    ui.reset(session.dirty(pipeline))
+    ui.follow(session.iter_rerun(pipeline=pipeline))
+    store_run(session)
+
+    st.session_state.edits = None
+    st.rerun()
+
 # ---------------- Display UI ---------------- #
 
 if st.session_state.pipeline:
     st.header("📊 MCP Pipeline Flow")
-    state = StreamlitFlowState(
-        nodes=st.session_state.flow_nodes,
-        edges=st.session_state.flow_edges
-    )
-    streamlit_flow("flow", state)
+    AgentUI.get("flow").render()
+
+    with st.expander("✏️ Edit step inputs"):
+        with st.form("edit_inputs"):
+            edits = {}
+            for cls in st.session_state.pipeline.get("classes", []):
+                for method in cls["methods"]:
+                    key = f"{cls['class_name']}.{method['method']}"
+                    for param, value in method.get("inputs", {}).items():
+                        # References to other steps aren't editable literals
+                        if isinstance(value, str) and REFERENCE_PATTERN.match(value) \
+                                and value.split(".", 1)[0] in get_agent().registered_class:
+                            continue
+                        shown = json.dumps(value)
+                        text = st.text_input(f"{key}.{param}", shown)
+                        if text != shown:
+                            edits.setdefault(key, {})[param] = parse_input(text)
+            if st.form_submit_button("🔁 Re-run changed steps") and edits:
+                st.session_state.edits = edits
+                st.rerun()
 
     st.subheader("✅ Execution Results")
-    st.json(st.session_state.results)
+    # Large outputs are shown as size-aware summaries instead of being serialized in full
+    st.json(summarize_results(st.session_state.results))
 
     if show_json:
         st.subheader("🧾 Raw Pipeline JSON")
@@ -0,0 +1,132 @@
+import asyncio
+import contextvars
+import functools
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from AutoClass.Agent import Agent
+from AutoClass.llm import ScriptedLLM
+from AutoClass.scheduler import current_cancel_token
+
+
+class Calculator:
+    """
+    Small arithmetic class used by the tests; counts how often each method ran.
+    """
+
+    def __init__(self):
+        self.calls = {}
+        self.fail = set()
+
+    def _track(self, name):
+        self.calls[name] = self.calls.get(name, 0) + 1
+        if name in self.fail:
+            raise ValueError(f"{name} failed")
+
+    def add(self, a, b):
+        '''
+        - Description: Adds two numbers.
+        - List of parameters:
+            - param a: First number :type: int or float
+            - param b: Second number :type: int or float
+        :return: Sum of a and b :rtype: int or float
+        '''
+        self._track("add")
+        return a + b
+
+    def multiply(self, a, b):
+        '''
+        - Description: Multiplies two numbers.
+        - List of parameters:
+            - param a: First number :type: int or float
+            - param b: Second number :type: int or float
+        :return: Product of a and b :rtype: int or float
+        '''
+        self._track("multiply")
+        return a * b
+
+    def negate(self, a):
+        '''
+        - Description: Negates a number.
+        - List of parameters:
+            - param a: Number :type: int or float
+        :return: -a :rtype: int or float
+        '''
+        self._track("negate")
+        return -a
+
+
+def pipeline(*methods):
+    """
+    {"classes": [...]} pipeline for Calculator from (method, inputs) pairs.
+    """
+    return {"classes": [{"class_name": "Calculator", "methods": [
+        {"method": method, "inputs": inputs} for method, inputs in methods
+    ]}]}
+
+
+def step(key, **inputs):
+    class_name, _, method_name = key.partition(".")
+    return {"class": class_name, "method_name": method_name, "inputs": inputs}
+
+
+def run(scheduler, invoke, mode, cancel=None):
+    """
+    Runs scheduler in mode ("sync" or "async") and returns its events in the order they were yielded.
+    """
+    if mode == "sync":
+        return list(scheduler.iter_run(invoke, {}, cancel=cancel))
+
+    async def ainvoke(step, inputs):
+        # Like Agent, hand the step's context (and so its CancelToken) to the executor thread
+        call = functools.partial(contextvars.copy_context().run, invoke, step, inputs)
+        return await asyncio.get_running_loop().run_in_executor(None, call)
+
+    async def collect():
+        return [event async for event in scheduler.aiter_run(ainvoke, {}, cancel=cancel)]
+    return asyncio.run(collect())
+
+
+def statuses(events):
+    return {event["key"]: event["status"] for event in events}
+
+
+def arithmetic(step, inputs):
+    if step["method_name"] == "fail":
+        raise ValueError("boom")
+    return sum(value for value in inputs.values())
+
+
+def sleeper(seconds):
+    """
+    invoke that sleeps in every step named "slow", returning early once its token is cancelled.
+    """
+    def invoke(step, inputs):
+        if step["method_name"] == "slow":
+            token = current_cancel_token()
+            end = time.monotonic() + seconds
+            while time.monotonic() < end and not token.cancelled:
+                time.sleep(0.01)
+        return 1
+    return invoke
+
+
+MODES = ["sync", "async"]
+
+
+@pytest.fixture
+def calculator():
+    return Calculator()
+
+
+@pytest.fixture
+def agent(calculator):
+    agent = Agent(llm=ScriptedLLM(), max_workers=4)
+    agent.register_class(calculator)
+    yield agent
+    agent.shutdown()
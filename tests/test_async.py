@@ -0,0 +1,56 @@
+import asyncio
+
+import pytest
+
+
+class Slow:
+    async def double(self, a):
+        '''
+        - Description: Doubles a number after a short wait.
+        - List of parameters:
+            - param a: Number :type: int
+        :return: 2 * a :rtype: int
+        '''
+        await asyncio.sleep(0.01)
+        return 2 * a
+
+
+PLAN = {"classes": [
+    {"class_name": "Calculator", "methods": [{"method": "add", "inputs": {"a": 1, "b": 2}}]},
+    {"class_name": "Slow", "methods": [{"method": "double", "inputs": {"a": "Calculator.add"}}]},
+]}
+
+
+@pytest.fixture
+def slow_agent(agent):
+    agent.register_class(Slow())
+    return agent
+
+
+def test_async_runner(slow_agent):
+    results = asyncio.run(slow_agent.arun_pipeline_with_dependencies(PLAN))
+    assert results == {"Calculator.add": 3, "Slow.double": 6}
+
+
+def test_sync_runner_awaits_async_methods(slow_agent):
+    assert slow_agent.run_pipeline_with_dependencies(PLAN) == {"Calculator.add": 3, "Slow.double": 6}
+
+
+def test_sync_runner_inside_running_loop(slow_agent):
+    async def handler():
+        # e.g. a notebook cell or an async web handler calling the synchronous API
+        return slow_agent.run_pipeline_with_dependencies(PLAN, max_workers=1)
+
+    assert asyncio.run(handler()) == {"Calculator.add": 3, "Slow.double": 6}
+
+
+def test_prepared_and_map_inside_running_loop(slow_agent):
+    prepared = slow_agent.compile_pipeline(PLAN).bind(slow_agent)
+    mapped = {"classes": [{"class_name": "Slow", "methods": [
+        {"method": "double", "inputs": {"a": [1, 2, 3]}, "map": ["a"]},
+    ]}]}
+
+    async def handler():
+        return prepared.run(), slow_agent.run_pipeline_with_dependencies(mapped, max_workers=1)
+
+    assert asyncio.run(handler()) == ({"Calculator.add": 3, "Slow.double": 6}, {"Slow.double": [2, 4, 6]})
@@ -0,0 +1,74 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from AutoClass.cli import load_instances, main
+
+from conftest import Calculator, pipeline
+
+PLAN = pipeline(("add", {"a": 2, "b": 3}), ("multiply", {"a": "Calculator.add", "b": 4}))
+
+
+@pytest.fixture
+def plan_file(tmp_path):
+    path = tmp_path / "plan.json"
+    path.write_text(json.dumps(PLAN))
+    return str(path)
+
+
+def test_load_instances():
+    instances = load_instances(["conftest:Calculator", "conftest:Calculator=Calc"])
+    assert set(instances) == {"Calculator", "Calc"} and isinstance(instances["Calc"], Calculator)
+    with pytest.raises(ValueError, match="module:Class"):
+        load_instances(["Calculator"])
+
+
+def test_methods_and_catalog(tmp_path, capsys):
+    catalog = str(tmp_path / "catalog.json")
+    assert main(["--register", "conftest:Calculator", "save-catalog", catalog]) == 0
+    assert main(["--catalog", catalog, "methods"]) == 0
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[:2] == ["Calculator.add(a: int or float, b: int or float)", "    Adds two numbers."]
+
+
+def test_run_saved_plan(tmp_path, plan_file, capsys):
+    catalog = str(tmp_path / "catalog.json")
+    main(["--register", "conftest:Calculator", "save-catalog", catalog])
+    assert main(["--catalog", catalog, "--register", "conftest:Calculator", "run", plan_file]) == 0
+    assert json.loads(capsys.readouterr().out) == {"Calculator.add": 5, "Calculator.multiply": 20}
+
+
+def test_failed_run_and_resume(tmp_path, plan_file, capsys):
+    journal = str(tmp_path / "runs.db")
+    failing = Calculator()
+    failing.fail.add("multiply")
+    assert main(["--journal", journal, "run", plan_file, "--run-id", "r1"], instances={"Calculator": failing}) == 1
+    err = capsys.readouterr().err
+    assert "Calculator.multiply: error (multiply failed)" in err and "run_id: r1" in err
+
+    assert main(["--journal", journal, "runs", "--status", "failed"], instances={"Calculator": Calculator()}) == 0
+    assert capsys.readouterr().out.startswith("r1  failed")
+    calculator = Calculator()
+    assert main(["--journal", journal, "resume", "r1"], instances={"Calculator": calculator}) == 0
+    assert calculator.calls == {"multiply": 1}
+    with pytest.raises(SystemExit, match="needs --journal"):
+        main(["resume", "r1"], instances={"Calculator": calculator})
+
+
+def test_offline_commands_skip_heavy_imports(tmp_path, plan_file):
+    catalog = str(tmp_path / "catalog.json")
+    main(["--register", "conftest:Calculator", "save-catalog", catalog])
+    tests = os.path.dirname(os.path.abspath(__file__))
+    script = (
+        "import sys\n"
+        "from AutoClass.cli import main\n"
+        f"main(['--catalog', {catalog!r}, '--register', 'conftest:Calculator', 'run', {plan_file!r}])\n"
+        "heavy = {'langchain', 'langchain_core', 'langchain_openai', 'tiktoken', 'numpy', 'multiprocessing'}\n"
+        "print(sorted(name for name in sys.modules if name.split('.')[0] in heavy))\n"
+    )
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([os.path.dirname(tests), tests]))
+    out = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, env=env, check=True).stdout
+    assert out.splitlines()[-1] == "[]"
@@ -0,0 +1,53 @@
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from AutoClass.Agent import Agent
+from AutoClass.llm import ScriptedLLM
+
+from conftest import Calculator, pipeline
+
+
+def test_catalog_views_are_copies(agent):
+    methods = agent.list_methods()
+    methods[0]["inputs"]["c"] = "int"
+    pruned = agent.get_method_context_subset({"Calculator": ["add"]})
+    pruned["classes"][0]["methods"][0]["inputs"].clear()
+    assert agent.method_docs["Calculator.add"]["inputs"] == {"a": "int or float", "b": "int or float"}
+    assert agent.list_methods()[0]["inputs"] == {"a": "int or float", "b": "int or float"}
+
+
+def test_sessions_keep_their_own_results(agent):
+    def run(n):
+        session = agent.session(f"add {n} and {n}")
+        return n, session.run(pipeline(("add", {"a": n, "b": n}), ("negate", {"a": "Calculator.add"})))
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        for n, results in pool.map(run, range(32)):
+            assert results == {"Calculator.add": 2 * n, "Calculator.negate": -2 * n}
+
+
+def test_concurrent_planning():
+    pytest.importorskip("langchain_core")
+
+    def responder(prompt):
+        numbers = re.findall(r"add (\d+) and (\d+)", prompt)
+        if "fills in input values" not in prompt:
+            return "{'Calculator': ['add']}"
+        a, b = numbers[-1]
+        return str(pipeline(("add", {"a": int(a), "b": int(b)})))
+
+    agent = Agent(llm=ScriptedLLM(responder=responder, latency=0.01))
+    agent.register_class(Calculator())
+
+    def plan_and_run(n):
+        session = agent.session(f"add {n} and {n + 1}")
+        session.plan(use_cache=False)
+        return n, session.run()
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        for n, results in pool.map(plan_and_run, range(16)):
+            assert results == {"Calculator.add": 2 * n + 1}
+    # Sessions never touch the agent-level pipeline
+    assert agent.pipeline is None
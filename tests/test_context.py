@@ -0,0 +1,52 @@
+import time
+
+from AutoClass.Agent import Agent
+from AutoClass.context import ResultStore, RunContext
+from AutoClass.llm import ScriptedLLM
+
+from conftest import pipeline
+
+
+def test_result_store_lru_and_ttl():
+    store = ResultStore(maxsize=2, ttl=0.05)
+    store.set("a", 1)
+    store.set("b", 2)
+    assert store["a"] == 1
+    store.set("c", 3)
+    assert "b" not in store and store.evictions == 1
+    assert sorted(store) == ["a", "c"]
+    time.sleep(0.1)
+    assert "a" not in store and store.get("c") is None
+    store.set("d", 4)
+    store.prune()
+    assert list(store) == ["d"] and len(store) == 1
+    store.discard("d")
+    assert len(store) == 0
+
+
+def test_run_context_layers():
+    catalog = {"classes": ()}
+    store = ResultStore()
+    store.set("A.kept", 1)
+    scope = RunContext(catalog, store)
+    scope["A.local"] = 2
+    assert scope["A.kept"] == 1 and scope["A.local"] == 2 and scope["classes"] == ()
+    # Writes stay in the run's own layer
+    assert scope.local == {"A.local": 2} and "A.local" not in store and "A.local" not in catalog
+
+
+def test_runs_leave_nothing_behind(agent):
+    for n in range(20):
+        agent.run_pipeline_with_dependencies(pipeline(("add", {"a": n, "b": 1})))
+    assert set(agent.context) == {"classes"}
+    assert len(agent.result_store) == 0
+
+
+def test_persisted_results_reach_later_runs(calculator):
+    agent = Agent(llm=ScriptedLLM(), persist={"Calculator.add"}, result_store=ResultStore(maxsize=1))
+    agent.register_class(calculator)
+    agent.run_pipeline_with_dependencies(pipeline(("add", {"a": 2, "b": 3}), ("multiply", {"a": 2, "b": 2})))
+    assert dict(agent.result_store) == {"Calculator.add": 5}
+    results = agent.run_pipeline_with_dependencies(pipeline(("negate", {"a": "Calculator.add"})))
+    assert results == {"Calculator.negate": -5}
+    assert calculator.calls["add"] == 1
@@ -0,0 +1,138 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from AutoClass.scheduler import CancelToken, DependencyGraph, PipelineScheduler, StepCancelled, StepTimeout
+
+from conftest import MODES, arithmetic, run, sleeper, statuses, step
+
+
+def recording(seconds):
+    """
+    (invoke, started): sleeper(seconds) that appends the key of every step it starts to started.
+    """
+    started = []
+    invoke = sleeper(seconds)
+
+    def record(step, inputs):
+        started.append(f"{step['class']}.{step['method_name']}")
+        return invoke(step, inputs)
+    return record, started
+
+
+@pytest.mark.parametrize("mode", MODES)
+def test_step_timeout(mode):
+    graph = DependencyGraph([step("A.slow"), step("A.after", x="A.slow"), step("A.fast")])
+    scheduler = PipelineScheduler(graph, max_workers=2, step_timeout=0.1)
+    started = time.perf_counter()
+    events = run(scheduler, sleeper(2.0), mode)
+    assert time.perf_counter() - started < 1.0
+    assert statuses(events) == {"A.slow": "timeout", "A.after": "skipped", "A.fast": "ok"}
+    assert isinstance(scheduler.failed["A.slow"], StepTimeout)
+
+
+def test_step_timeout_entry_overrides_default():
+    graph = DependencyGraph([dict(step("A.slow"), timeout=0.1)])
+    scheduler = PipelineScheduler(graph, max_workers=1, step_timeout=5.0)
+    assert statuses(run(scheduler, sleeper(2.0), "sync")) == {"A.slow": "timeout"}
+
+
+@pytest.mark.parametrize("mode", MODES)
+def test_run_timeout(mode):
+    graph = DependencyGraph([step("A.fast"), step("A.slow", x="A.fast"), step("A.after", x="A.slow")])
+    scheduler = PipelineScheduler(graph, max_workers=2, timeout=0.2)
+    started = time.perf_counter()
+    events = run(scheduler, sleeper(2.0), mode)
+    assert time.perf_counter() - started < 1.0
+    assert statuses(events) == {"A.fast": "ok", "A.slow": "timeout", "A.after": "skipped"}
+    assert scheduler.results == {"A.fast": 1}
+
+
+@pytest.mark.parametrize("mode", MODES)
+def test_cancellation(mode):
+    graph = DependencyGraph([step("A.slow"), step("A.after", x="A.slow")])
+    scheduler = PipelineScheduler(graph, max_workers=1)
+    cancel = CancelToken()
+    threading.Timer(0.1, cancel.cancel).start()
+    started = time.perf_counter()
+    events = run(scheduler, sleeper(2.0), mode, cancel=cancel)
+    assert time.perf_counter() - started < 1.0
+    assert statuses(events) == {"A.slow": "cancelled", "A.after": "skipped"}
+    assert isinstance(scheduler.failed["A.slow"], StepCancelled)
+    assert scheduler.outcomes["A.after"]["cause"] == "A.slow"
+
+
+@pytest.mark.parametrize("mode", MODES)
+def test_cancelled_before_start_skips_everything(mode):
+    graph = DependencyGraph([step("A.a", x=1), step("A.b", x="A.a")])
+    cancel = CancelToken()
+    cancel.cancel("stopped")
+    scheduler = PipelineScheduler(graph, max_workers=1)
+    events = run(scheduler, arithmetic, mode, cancel=cancel)
+    assert statuses(events) == {"A.a": "skipped", "A.b": "skipped"}
+    assert scheduler.outcomes["A.a"]["cause"] == "stopped"
+    assert scheduler.results == {}
+
+
+def test_async_coroutine_step_is_cancelled_on_timeout():
+    graph = DependencyGraph([step("A.slow")])
+    scheduler = PipelineScheduler(graph, step_timeout=0.1)
+    finished = []
+
+    async def ainvoke(step, inputs):
+        await asyncio.sleep(2.0)
+        finished.append(step["method_name"])
+
+    async def collect():
+        return [event async for event in scheduler.aiter_run(ainvoke, {})]
+    assert statuses(asyncio.run(collect())) == {"A.slow": "timeout"}
+    assert finished == []
+
+
+@pytest.mark.parametrize("mode", MODES)
+def test_queued_steps_get_their_own_deadline(mode):
+    # With one worker b and c wait for a; their deadline must only start once they run
+    graph = DependencyGraph([step("A.slow"), step("B.slow"), step("C.slow")])
+    scheduler = PipelineScheduler(graph, max_workers=1, step_timeout=0.5)
+    invoke, started = recording(0.3)
+    events = run(scheduler, invoke, mode)
+    assert statuses(events) == {"A.slow": "ok", "B.slow": "ok", "C.slow": "ok"}
+    assert sorted(started) == ["A.slow", "B.slow", "C.slow"]
+
+
+@pytest.mark.parametrize("mode", MODES)
+def test_queued_steps_time_out_one_by_one(mode):
+    graph = DependencyGraph([step("A.slow"), step("B.slow"), step("C.slow")])
+    scheduler = PipelineScheduler(graph, max_workers=1, step_timeout=0.1)
+    invoke, started = recording(2.0)
+    events = run(scheduler, invoke, mode)
+    assert statuses(events) == {"A.slow": "timeout", "B.slow": "timeout", "C.slow": "timeout"}
+    assert sorted(started) == ["A.slow", "B.slow", "C.slow"]
+
+
+@pytest.mark.parametrize("mode", MODES)
+def test_run_timeout_skips_queued_steps(mode):
+    graph = DependencyGraph([step("A.slow"), step("B.slow"), step("C.slow")])
+    scheduler = PipelineScheduler(graph, max_workers=1, timeout=0.2)
+    invoke, started = recording(2.0)
+    events = run(scheduler, invoke, mode)
+    time.sleep(0.2)
+    assert statuses(events) == {"A.slow": "timeout", "B.slow": "skipped", "C.slow": "skipped"}
+    assert scheduler.outcomes["B.slow"]["cause"] == "timeout"
+    # Queued steps never start after the run has returned
+    assert started == ["A.slow"]
+
+
+@pytest.mark.parametrize("mode", MODES)
+def test_cancel_skips_queued_steps(mode):
+    graph = DependencyGraph([step("A.slow"), step("B.slow"), step("C.slow")])
+    scheduler = PipelineScheduler(graph, max_workers=1)
+    cancel = CancelToken()
+    threading.Timer(0.2, cancel.cancel).start()
+    invoke, started = recording(2.0)
+    events = run(scheduler, invoke, mode, cancel=cancel)
+    time.sleep(0.2)
+    assert statuses(events) == {"A.slow": "cancelled", "B.slow": "skipped", "C.slow": "skipped"}
+    assert started == ["A.slow"]
@@ -0,0 +1,108 @@
+import asyncio
+
+import pytest
+
+from AutoClass.Agent import Agent
+from AutoClass.fanout import batch_of, chunk_size_for, item_count, mapped_params, split_chunks
+from AutoClass.introspection import batch_variants
+from AutoClass.llm import ScriptedLLM
+
+
+class Words:
+    def __init__(self):
+        self.batches = []
+
+    def count_words(self, text):
+        '''
+        - Description: Counts the words of a text.
+        - List of parameters:
+            - param text: Input text :type: str
+        :return: Number of words :rtype: int
+        '''
+        return len(text.split())
+
+    @batch_of("count_words")
+    def count_words_many(self, text):
+        '''
+        - Description: Counts the words of several texts.
+        - List of parameters:
+            - param text: Input texts :type: list
+        :return: Number of words per text :rtype: list
+        '''
+        self.batches.append(len(text))
+        return [len(t.split()) for t in text]
+
+    def repeat(self, text, times):
+        '''
+        - Description: Repeats a text.
+        - List of parameters:
+            - param text: Input text :type: str
+            - param times: Repetitions :type: int
+        :return: Repeated text :rtype: str
+        '''
+        return text * times
+
+
+TEXTS = ["great product", "too slow", "works", "would buy again"]
+
+
+def plan(*methods):
+    return {"classes": [{"class_name": "Words", "methods": list(methods)}]}
+
+
+@pytest.fixture
+def words():
+    return Words()
+
+
+@pytest.fixture
+def word_agent(words):
+    agent = Agent(llm=ScriptedLLM(), max_workers=4)
+    agent.register_class(words)
+    yield agent
+    agent.shutdown()
+
+
+def test_helpers():
+    assert mapped_params({"map": "text"}) == ("text",) and mapped_params({}) == ()
+    assert item_count({"a": [1, 2], "b": (3, 4), "c": 5}, ("a", "b")) == 2
+    with pytest.raises(ValueError, match="different lengths"):
+        item_count({"a": [1, 2], "b": [3]}, ("a", "b"))
+    with pytest.raises(TypeError, match="must be a list"):
+        item_count({"a": 1}, ("a",))
+    assert split_chunks({"a": [1, 2, 3], "c": 5}, ("a",), 2) == [{"a": [1, 2], "c": 5}, {"a": [3], "c": 5}]
+    assert chunk_size_for(100, 4) == 7 and chunk_size_for(100, 4, 30) == 30 and chunk_size_for(0, 4) == 1
+    assert batch_variants(Words) == {"count_words": "count_words_many"}
+
+
+def test_batch_variant_is_called_once(word_agent, words):
+    results = word_agent.run_pipeline_with_dependencies(
+        plan({"method": "count_words", "inputs": {"text": TEXTS}, "map": "text"})
+    )
+    assert results == {"Words.count_words": [2, 2, 1, 3]}
+    assert words.batches == [4]
+
+
+def test_chunks_keep_item_order(word_agent):
+    texts = [f"t{n} " * n for n in range(40)]
+    results = word_agent.run_pipeline_with_dependencies(
+        plan({"method": "repeat", "inputs": {"text": texts, "times": [2] * 40}, "map": ["text", "times"], "chunk_size": 3})
+    )
+    assert results["Words.repeat"] == [text * 2 for text in texts]
+
+
+def test_map_over_a_reference(word_agent):
+    pipeline = plan(
+        {"method": "repeat", "inputs": {"text": ["a ", "b "], "times": 2}, "map": "text"},
+        {"method": "count_words", "inputs": {"text": "Words.repeat"}, "map": "text", "chunk_size": 1},
+    )
+    assert word_agent.run_pipeline_with_dependencies(pipeline)["Words.count_words"] == [2, 2]
+    results = asyncio.run(word_agent.arun_pipeline_with_dependencies(pipeline))
+    assert results["Words.count_words"] == [2, 2]
+
+
+def test_map_errors_are_step_errors(word_agent):
+    events = list(word_agent.iter_pipeline_with_dependencies(
+        plan({"method": "repeat", "inputs": {"text": "abc", "times": 2}, "map": "text"})
+    ))
+    assert events[0]["status"] == "error" and isinstance(events[0]["error"], TypeError)
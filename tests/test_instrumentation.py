@@ -0,0 +1,90 @@
+import json
+import logging
+
+import pytest
+
+from AutoClass.Agent import Agent
+from AutoClass.instrumentation import Instrumentation, usage_tokens
+from AutoClass.llm import ScriptedLLM
+
+from conftest import Calculator, pipeline
+
+
+def counters(instrumentation):
+    return {(c["name"], tuple(sorted(c["labels"].items()))): c["value"] for c in instrumentation.snapshot()["counters"]}
+
+
+def test_steps_are_timed_and_counted(agent, calculator):
+    events = []
+    agent.instrumentation.add_hook("step_start", events.append)
+    agent.instrumentation.add_hook("step_end", events.append)
+    calculator.fail.add("negate")
+    agent.run_pipeline_with_dependencies(pipeline(("add", {"a": 1, "b": 2}), ("negate", {"a": "Calculator.add"})))
+    assert [(e["event"], e["key"]) for e in events] == [
+        ("step_start", "Calculator.add"), ("step_end", "Calculator.add"),
+        ("step_start", "Calculator.negate"), ("step_end", "Calculator.negate"),
+    ]
+    assert events[1]["wall_seconds"] >= 0 and events[1]["cpu_seconds"] is not None
+    assert isinstance(events[3]["error"], ValueError)
+    values = counters(agent.instrumentation)
+    assert values[("autoclass_steps_total", (("status", "ok"), ("step", "Calculator.add")))] == 1
+    assert values[("autoclass_steps_total", (("status", "error"), ("step", "Calculator.negate")))] == 1
+
+
+def test_hooks_are_validated_and_isolated(caplog):
+    instrumentation = Instrumentation()
+    with pytest.raises(ValueError, match="Unknown instrumentation event"):
+        instrumentation.add_hook("step_done", print)
+
+    def broken(payload):
+        raise RuntimeError("hook bug")
+
+    instrumentation.add_hook("step_end", broken)
+    with caplog.at_level(logging.ERROR, logger="AutoClass"):
+        instrumentation.step_finished("A.a", instrumentation.step_started("A.a", {}))
+    assert "hook for step_end failed" in caplog.text
+    instrumentation.remove_hook("step_end", broken)
+    assert instrumentation.hooks["step_end"] == []
+
+
+def test_exports():
+    instrumentation = Instrumentation()
+    instrumentation.inc("autoclass_steps_total", {"step": 'A."a"'}, 2)
+    instrumentation.observe("autoclass_step_wall_seconds", 0.5, {"step": "A.a"})
+    instrumentation.observe("autoclass_step_wall_seconds", 1.5, {"step": "A.a"})
+    assert instrumentation.to_prometheus().splitlines() == [
+        "# TYPE autoclass_steps_total counter",
+        'autoclass_steps_total{step="A.\\"a\\""} 2.0',
+        "# TYPE autoclass_step_wall_seconds summary",
+        'autoclass_step_wall_seconds_count{step="A.a"} 2',
+        'autoclass_step_wall_seconds_sum{step="A.a"} 2.0',
+    ]
+    summary = json.loads(instrumentation.to_json())["summaries"][0]
+    assert (summary["count"], summary["min"], summary["max"]) == (2, 0.5, 1.5)
+    instrumentation.reset()
+    assert instrumentation.snapshot() == {"counters": [], "summaries": []}
+
+
+def test_usage_tokens():
+    class Message:
+        usage_metadata = None
+        response_metadata = {"token_usage": {"prompt_tokens": 12, "completion_tokens": 3}}
+
+    assert usage_tokens(Message()) == (12, 3)
+    assert usage_tokens(object()) == (None, None)
+
+
+def test_llm_calls_and_cache_hits_are_recorded():
+    pytest.importorskip("langchain_core")
+    llm = ScriptedLLM(["{'Calculator': ['add']}", str(pipeline(("add", {"a": 1, "b": 2})))])
+    agent = Agent(llm=llm)
+    agent.register_class(Calculator())
+    calls = []
+    agent.instrumentation.add_hook("llm_end", calls.append)
+    agent.plan("add 1 and 2")
+    agent.plan("add 1 and 2")
+    assert len(calls) == 2 and all(call["status"] == "ok" and call["prompt_tokens"] for call in calls)
+    values = counters(agent.instrumentation)
+    assert values[("autoclass_cache_misses_total", (("cache", "plan"),))] == 1
+    assert values[("autoclass_cache_hits_total", (("cache", "plan"),))] == 1
+    assert sum(v for (name, _), v in values.items() if name == "autoclass_llm_calls_total") == 2
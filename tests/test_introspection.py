@@ -0,0 +1,109 @@
+import pytest
+
+from AutoClass.Agent import Agent
+from AutoClass.introspection import _cache, class_source_hash, extract_class_metadata, parse_docstring
+from AutoClass.llm import ScriptedLLM
+
+from conftest import Calculator, pipeline
+
+
+def test_parse_docstring_tags():
+    parsed = parse_docstring('''
+        - Description: Fits a model.
+        - List of parameters:
+            - param data: Training rows :type: list
+        :return: Fitted model :rtype: object :execution: process
+        :pure:
+    ''')
+    assert parsed["description"] == "Fits a model." and parsed["inputs"] == {"data": "list"}
+    assert (parsed["execution"], parsed["pure"]) == ("process", True)
+    assert ":execution:" not in parsed["output"]
+    assert parse_docstring("- Description: x\n:pure: no")["pure"] is False
+
+
+class Hinted:
+    """
+    Methods typed with hints instead of docstring types.
+    """
+
+    def scale(self, value: float, factor: int = 2, **options) -> float:
+        '''
+        - Description: Scales a value.
+        - List of parameters:
+            - param extra: Extra option :type: str
+        '''
+        return value * factor
+
+    def _helper(self):
+        '''
+        - Description: Private helpers are never exposed.
+        '''
+
+    def undocumented(self):
+        return None
+
+
+def test_signature_is_the_source_of_names():
+    class_doc, methods = extract_class_metadata(Hinted)
+    assert class_doc == "Methods typed with hints instead of docstring types."
+    assert [m["method"] for m in methods] == ["scale"]
+    assert methods[0]["inputs"] == {"value": "float", "factor": "int", "extra": "str"}
+    assert methods[0]["output"] == "float"
+
+
+def test_metadata_is_cached_and_refreshed():
+    class Counter:
+        def step(self, n):
+            '''
+            - Description: Counts up.
+            - List of parameters:
+                - param n: Start :type: int
+            '''
+            return n + 1
+
+    first = extract_class_metadata(Counter)[1]
+    cached = _cache[Counter]
+    first[0]["inputs"]["m"] = "int"
+    assert extract_class_metadata(Counter)[1][0]["inputs"] == {"n": "int"}
+    assert _cache[Counter] is cached
+    before = class_source_hash(Counter)
+
+    def step(self, n):
+        '''
+        - Description: Counts down.
+        - List of parameters:
+            - param n: Start :type: int
+        '''
+        return n - 1
+
+    Counter.step = step
+    assert class_source_hash(Counter) != before
+    assert extract_class_metadata(Counter)[1][0]["method_description"] == "Counts down."
+
+
+def test_catalog_snapshot_round_trip(tmp_path, agent, calculator):
+    agent.register_class(Hinted(), execution={"scale": "process"})
+    path = str(tmp_path / "catalog.json")
+    agent.save_catalog(path)
+
+    restored = Agent(llm=ScriptedLLM())
+    restored.load_catalog(path, instances={"Calculator": calculator})
+    assert restored.list_methods() == agent.list_methods()
+    assert restored.execution_policies == agent.execution_policies
+    assert restored.run_pipeline_with_dependencies(pipeline(("add", {"a": 1, "b": 2}))) == {"Calculator.add": 3}
+    # Classes loaded without an instance can be listed but not run
+    assert "Hinted" not in restored.registered_class
+    restored.shutdown()
+
+
+def test_snapshot_version_is_checked(tmp_path):
+    path = tmp_path / "catalog.json"
+    path.write_text('{"version": -1, "classes": []}')
+    with pytest.raises(ValueError, match="snapshot version"):
+        Agent(llm=ScriptedLLM()).load_catalog(str(path))
+
+
+def test_registering_many_instances_reuses_metadata(agent):
+    for n in range(50):
+        agent.register_class(Calculator(), alias=f"Calculator{n}")
+    assert len(agent.list_methods()) == 51 * 3
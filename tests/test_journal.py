@@ -0,0 +1,74 @@
+import asyncio
+
+import pytest
+
+from AutoClass.Agent import Agent
+from AutoClass.llm import ScriptedLLM
+
+from conftest import pipeline
+
+PLAN = pipeline(
+    ("add", {"a": 2, "b": 3}),
+    ("multiply", {"a": "Calculator.add", "b": 4}),
+    ("negate", {"a": "Calculator.multiply"}),
+)
+
+
+def journaled_agent(path, calculator):
+    agent = Agent(llm=ScriptedLLM(), journal=str(path))
+    agent.register_class(calculator)
+    return agent
+
+
+@pytest.fixture
+def failed_run(tmp_path, calculator):
+    """
+    (journal path, run_id) of a run of PLAN whose multiply step failed.
+    """
+    path = tmp_path / "runs.db"
+    agent = journaled_agent(path, calculator)
+    calculator.fail.add("multiply")
+    session = agent.session("negate (2 + 3) * 4")
+    session.run(PLAN)
+    assert session.outcomes["Calculator.negate"]["status"] == "skipped"
+    assert agent.journal.run(session.run_id)["status"] == "failed"
+    agent.shutdown()
+    calculator.fail.clear()
+    return path, session.run_id
+
+
+def test_resume_runs_only_unfinished_steps(failed_run, calculator):
+    path, run_id = failed_run
+    agent = journaled_agent(path, calculator)
+    assert agent.resume_run(run_id) == {"Calculator.add": 5, "Calculator.multiply": 20, "Calculator.negate": -20}
+    # add was loaded from the journal, multiply failed once and ran again
+    assert calculator.calls == {"add": 1, "multiply": 2, "negate": 1}
+    record = agent.journal.run(run_id)
+    assert record["status"] == "completed" and record["query"] == "negate (2 + 3) * 4"
+    assert [step["key"] for step in agent.journal.steps(run_id) if step["status"] != "ok"] == [
+        "Calculator.multiply", "Calculator.negate"
+    ]
+
+
+def test_resume_completed_run_executes_nothing(failed_run, calculator):
+    path, run_id = failed_run
+    agent = journaled_agent(path, calculator)
+    agent.resume_run(run_id)
+    calls = dict(calculator.calls)
+    assert agent.resume_run(run_id)["Calculator.negate"] == -20
+    assert calculator.calls == calls
+
+
+def test_aresume_run(failed_run, calculator):
+    path, run_id = failed_run
+    agent = journaled_agent(path, calculator)
+    results = asyncio.run(agent.aresume_run(run_id))
+    assert results["Calculator.negate"] == -20
+    assert calculator.calls["add"] == 1
+
+
+def test_resume_errors(tmp_path, calculator):
+    with pytest.raises(ValueError):
+        Agent(llm=ScriptedLLM()).resume_run("missing")
+    with pytest.raises(KeyError):
+        journaled_agent(tmp_path / "runs.db", calculator).resume_run("missing")
@@ -0,0 +1,117 @@
+import time
+
+from AutoClass.memo import ResultCache, pure, stable_hash
+
+from conftest import pipeline
+
+
+class Lists:
+    def __init__(self):
+        self.calls = 0
+
+    @pure
+    def split(self, text):
+        '''
+        - Description: Splits a text into words.
+        - List of parameters:
+            - param text: Input text :type: str
+        :return: Words :rtype: list
+        '''
+        self.calls += 1
+        return text.split()
+
+    def append(self, words, word):
+        '''
+        - Description: Appends a word to a list in place.
+        - List of parameters:
+            - param words: Words :type: list
+            - param word: Word to append :type: str
+        :return: The same list :rtype: list
+        '''
+        words.append(word)
+        return words
+
+    def count(self, text):
+        '''
+        - Description: Counts the words of a text.
+        :pure:
+        - List of parameters:
+            - param text: Input text :type: str
+        :return: Number of words :rtype: int
+        '''
+        self.calls += 1
+        return len(text.split())
+
+
+def split_then_append(text):
+    return {"classes": [{"class_name": "Lists", "methods": [
+        {"method": "split", "inputs": {"text": text}},
+        {"method": "append", "inputs": {"words": "Lists.split", "word": "!"}},
+    ]}]}
+
+
+def test_pure_marks(agent):
+    agent.register_class(Lists())
+    assert "Lists.split" in agent.pure_methods and "Lists.count" in agent.pure_methods
+    assert "Lists.append" not in agent.pure_methods
+    assert pure(ttl=5)(lambda: None).__autoclass_pure__ == {"ttl": 5}
+
+
+def test_hits_skip_the_call(agent, calculator):
+    lists = Lists()
+    agent.register_class(lists)
+    plan = {"classes": [{"class_name": "Lists", "methods": [{"method": "count", "inputs": {"text": "a b c"}}]}]}
+    assert agent.session().run(plan) == agent.session().run(plan) == {"Lists.count": 3}
+    assert lists.calls == 1
+    assert agent.result_cache.stats()["hits"] == 1
+    # Non-pure methods always run
+    agent.session().run(pipeline(("add", {"a": 1, "b": 2})))
+    agent.session().run(pipeline(("add", {"a": 1, "b": 2})))
+    assert calculator.calls["add"] == 2
+
+
+def test_mutating_a_memoized_output_leaves_the_cache_alone(agent):
+    lists = Lists()
+    agent.register_class(lists)
+    for _ in range(3):
+        results = agent.session().run(split_then_append("a b"))
+        assert results["Lists.append"] == ["a", "b", "!"]
+    assert lists.calls == 1
+
+
+def test_cache_copies_mutable_values():
+    cache = ResultCache()
+    value = {"words": ["a"]}
+    cache.set("k", value)
+    value["words"].append("b")
+    hit, cached = cache.get("k")
+    assert hit and cached == {"words": ["a"]}
+    cached["words"].clear()
+    assert cache.get("k")[1] == {"words": ["a"]}
+    # Immutable values are handed out as is
+    text = "x" * 100
+    cache.set("t", text)
+    assert cache.get("t")[1] is text
+
+
+def test_lru_and_ttl():
+    cache = ResultCache(maxsize=2, ttl=0.05)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") == (False, None) and cache.get("a") == (True, 1)
+    assert cache.stats()["evictions"] == 1
+    time.sleep(0.1)
+    assert cache.get("a") == (False, None)
+    cache.set("d", 4, ttl=10)
+    time.sleep(0.1)
+    assert cache.get("d") == (True, 4)
+
+
+def test_stable_hash():
+    assert stable_hash({"b": [1, 2], "a": "x"}) == stable_hash({"a": "x", "b": [1, 2]})
+    assert stable_hash([1, 2]) != stable_hash((1, 2))
+    assert stable_hash(1) != stable_hash("1")
+    assert stable_hash(lambda: None) is None
+    assert ResultCache.make_key("Lists.count", {"f": lambda: None}) is None
@@ -0,0 +1,88 @@
+import time
+
+import pytest
+
+from AutoClass.Agent import Agent
+from AutoClass.llm import ScriptedLLM
+from AutoClass.plan_cache import PlanCache
+
+from conftest import pipeline
+
+PLAN = pipeline(("add", {"a": 2, "b": 3}))
+
+
+def test_key_keeps_literals():
+    assert PlanCache.make_key("  add 2 and 3 ", "fp") == PlanCache.make_key("add 2 and 3", "fp")
+    assert PlanCache.make_key("count words in 'Hello World'", "fp") != PlanCache.make_key(
+        "count words in 'hello world'", "fp"
+    )
+    assert PlanCache.make_key("count words in 'a  b'", "fp") != PlanCache.make_key("count words in 'a b'", "fp")
+    assert PlanCache.make_key("add 2 and 3", "fp") != PlanCache.make_key("add 2 and 3", "other")
+
+
+def test_hit_miss_and_copies():
+    cache = PlanCache()
+    assert cache.get("k") is None
+    cache.set("k", PLAN)
+    hit = cache.get("k")
+    assert hit == PLAN
+    hit["classes"].clear()
+    assert cache.get("k") == PLAN
+    assert (cache.hits, cache.misses) == (2, 1)
+
+
+def test_lru_and_ttl():
+    cache = PlanCache(maxsize=2, ttl=0.05)
+    cache.set("a", PLAN)
+    cache.set("b", PLAN)
+    cache.get("a")
+    cache.set("c", PLAN)
+    assert cache.get("b") is None and cache.get("a") == PLAN
+    time.sleep(0.1)
+    assert cache.get("a") is None
+    assert len(cache) == 1
+
+
+def test_persistent_cache(tmp_path):
+    path = str(tmp_path / "plans.db")
+    PlanCache(path=path).set("k", PLAN)
+    assert PlanCache(path=path).get("k") == PLAN
+    cache = PlanCache(path=path)
+    cache.clear()
+    assert PlanCache(path=path).get("k") is None
+
+
+class Text:
+    def echo(self, text):
+        '''
+        - Description: Returns the text unchanged.
+        - List of parameters:
+            - param text: Text :type: str
+        :return: text :rtype: str
+        '''
+        return text
+
+
+def test_registration_invalidates(agent):
+    key = agent._plan_cache_key("add 2 and 3", True)
+    assert agent._plan_cache_key("add 2 and 3", False) is None
+    agent.register_class(Text())
+    assert agent._plan_cache_key("add 2 and 3", True) != key
+
+
+def test_case_different_literals_get_their_own_plan():
+    pytest.importorskip("langchain_core")
+
+    def plan(text):
+        return str({"classes": [{"class_name": "Text", "methods": [{"method": "echo", "inputs": {"text": text}}]}]})
+
+    llm = ScriptedLLM(["{'Text': ['echo']}", plan("Hello World"), "{'Text': ['echo']}", plan("hello world")])
+    agent = Agent(llm=llm)
+    agent.register_class(Text())
+    first = agent.session("echo 'Hello World'").plan()
+    second = agent.session("echo 'hello world'").plan()
+    assert agent.session().run(first) == {"Text.echo": "Hello World"}
+    assert agent.session().run(second) == {"Text.echo": "hello world"}
+    # Surrounding whitespace still hits the cache
+    assert agent.session(" echo 'hello world' ").plan() == second
+    assert len(llm.calls) == 4
@@ -0,0 +1,68 @@
+import asyncio
+
+import pytest
+
+from AutoClass.Agent import Agent
+from AutoClass.llm import ScriptedLLM
+
+from conftest import Calculator, pipeline
+
+pytest.importorskip("langchain_core")
+
+SELECT = "{'Calculator': ['add']}"
+
+
+def planner(*responses):
+    llm = ScriptedLLM(responses)
+    agent = Agent(llm=llm)
+    agent.register_class(Calculator())
+    return agent, llm
+
+
+@pytest.mark.parametrize("mode", ["sync", "async"])
+def test_plan_many_dedupes_exact_queries_only(mode):
+    agent, llm = planner(
+        SELECT, SELECT,
+        str(pipeline(("add", {"a": 1, "b": 2}))), str(pipeline(("add", {"a": 10, "b": 20}))),
+    )
+    queries = ["add 'A' and 2", " add 'A' and 2 ", "add 'a' and 2"]
+    if mode == "sync":
+        plans = agent.plan_many(queries, use_cache=False)
+    else:
+        plans = asyncio.run(agent.aplan_many(queries, use_cache=False))
+    assert plans[0] == plans[1] == pipeline(("add", {"a": 1, "b": 2}))
+    assert plans[2] == pipeline(("add", {"a": 10, "b": 20}))
+    assert plans[0] is not plans[1]
+    assert len(llm.calls) == 4
+
+
+def test_empty_selection_skips_input_call():
+    agent, llm = planner(SELECT, "{}", str(pipeline(("add", {"a": 1, "b": 2}))))
+    plans = agent.plan_many(["add 1 and 2", "do something else"], use_cache=False)
+    assert plans == [pipeline(("add", {"a": 1, "b": 2})), {}]
+    assert len(llm.calls) == 3
+
+
+@pytest.mark.parametrize("mode", ["sync", "async"])
+def test_plan_many_repairs_invalid_entries(mode):
+    agent, llm = planner(
+        SELECT, SELECT,
+        str(pipeline(("add", {"a": "one", "b": 2}))), str(pipeline(("add", {"a": 3, "b": 4}))),
+        '[{"class_name": "Calculator", "method": "add", "inputs": {"a": 1, "b": 2}}]',
+    )
+    queries = ["add one and 2", "add 3 and 4"]
+    if mode == "sync":
+        plans = agent.plan_many(queries, use_cache=False)
+    else:
+        plans = asyncio.run(agent.aplan_many(queries, use_cache=False))
+    assert plans == [pipeline(("add", {"a": 1, "b": 2})), pipeline(("add", {"a": 3, "b": 4}))]
+    # Only the plan with an invalid input was sent back for repair
+    assert len(llm.calls) == 5 and "add one and 2" in llm.calls[-1]
+
+
+def test_run_many_uses_cache():
+    agent, llm = planner(SELECT, str(pipeline(("add", {"a": 1, "b": 2}))))
+    first = agent.run_many(["add 1 and 2"])
+    second = agent.run_many(["add 1 and 2"])
+    assert first[0]["results"] == second[0]["results"] == {"Calculator.add": 3}
+    assert len(llm.calls) == 2
@@ -0,0 +1,109 @@
+import pytest
+
+from AutoClass.Agent import Agent
+from AutoClass.llm import ScriptedLLM
+from AutoClass.plan_parser import PlanParseError, PlanValidator, extract_structure, merge_repaired
+
+from conftest import Calculator, pipeline
+
+
+@pytest.mark.parametrize("text", [
+    '{"Calculator": ["add"]}',
+    "{'Calculator': ['add']}",
+    'Sure! Here is the selection:\n```json\n{"Calculator": ["add"],}\n```\nLet me know.',
+    'The answer is {"Calculator": ["add"]} as requested.',
+])
+def test_extract_structure(text):
+    assert extract_structure(text) == {"Calculator": ["add"]}
+
+
+def test_extract_structure_swaps_constants():
+    assert extract_structure("{'a': true, 'b': null}") == {"a": True, "b": None}
+    assert extract_structure('{"a": True, "b": None,}') == {"a": True, "b": None}
+    assert extract_structure("[1, 2, 3]") == [1, 2, 3]
+
+
+@pytest.mark.parametrize("text", ["", "no structure here", "{'a': "])
+def test_extract_structure_fails(text):
+    with pytest.raises(PlanParseError):
+        extract_structure(text)
+
+
+@pytest.fixture
+def validator(agent):
+    return PlanValidator(agent.method_docs, agent.registered_class)
+
+
+def test_selection_repairs(validator):
+    selection, repairs = validator.validate_selection(
+        {"calculator": ["ADD", "Calculator.multiply", "divide"], "Unknown": "x"}
+    )
+    assert selection == {"Calculator": ["add", "multiply"]}
+    assert "dropped unknown method calculator.divide" in repairs
+    assert "dropped unknown method Unknown.x" in repairs
+    with pytest.raises(PlanParseError):
+        validator.validate_selection(["Calculator.add"])
+
+
+def test_pipeline_repairs(validator):
+    fixed, issues, repairs = validator.validate_pipeline({"classes": [
+        {"class_name": "calculator", "methods": [
+            {"method": "Add", "inputs": {"a": "12", "b": 1.5, "c": 3}},
+            {"method": "multiply", "inputs": {"a": "Calculator.add", "b": "2"}},
+            {"method": "unknown", "inputs": {}},
+        ]},
+        {"class_name": "Nope", "methods": []},
+    ]})
+    assert fixed == pipeline(("add", {"a": 12, "b": 1.5}), ("multiply", {"a": "Calculator.add", "b": 2}))
+    assert issues == []
+    assert "dropped unknown input Calculator.add.c" in repairs
+    assert "dropped unknown method Calculator.unknown" in repairs
+    assert "dropped unknown class Nope" in repairs
+
+
+def test_pipeline_issues(validator):
+    fixed, issues, _ = validator.validate_pipeline(pipeline(("add", {"a": "twelve"}), ("negate", "oops")))
+    assert {(i["key"], i["param"]) for i in issues} == {
+        ("Calculator.add", "a"), ("Calculator.add", "b"), ("Calculator.negate", None)
+    }
+    # Entries with issues are kept so they can be re-asked
+    assert [m["method"] for m in fixed["classes"][0]["methods"]] == ["add", "negate"]
+    with pytest.raises(PlanParseError):
+        validator.validate_pipeline({"steps": []})
+
+
+def test_map_repairs(validator):
+    fixed, issues, repairs = validator.validate_pipeline({"classes": [{"class_name": "Calculator", "methods": [
+        {"method": "negate", "inputs": {"a": [1, 2]}, "map": ["a", "b"]},
+        {"method": "add", "inputs": {"a": 1, "b": 2}, "map": "a"},
+    ]}]})
+    negate, add = fixed["classes"][0]["methods"]
+    assert negate["map"] == "a"
+    assert "dropped unknown mapped input Calculator.negate.b" in repairs
+    assert issues == [{"key": "Calculator.add", "param": "a", "problem": "mapped input must be a list"}]
+
+
+def test_merge_repaired():
+    merged = merge_repaired(
+        pipeline(("add", {"a": "x", "b": 1}), ("negate", {"a": 1})),
+        [{"class_name": "Calculator", "method": "add", "inputs": {"a": 2, "b": 1}}]
+    )
+    assert merged == pipeline(("add", {"a": 2, "b": 1}), ("negate", {"a": 1}))
+
+
+def test_plan_repairs_only_invalid_entries():
+    pytest.importorskip("langchain_core")
+    llm = ScriptedLLM([
+        "```json\n{'calculator': ['add', 'negate']}\n```",
+        '{"classes": [{"class_name": "Calculator", "methods": ['
+        '{"method": "add", "inputs": {"a": "two", "b": "3"}},'
+        '{"method": "negate", "inputs": {"a": "Calculator.add"}}]}]}',
+        '[{"class_name": "Calculator", "method": "add", "inputs": {"a": 2, "b": 3}}]',
+    ])
+    agent = Agent(llm=llm)
+    agent.register_class(Calculator())
+    planned = agent.session("negate 2 + 3").plan(use_cache=False)
+    assert planned == pipeline(("add", {"a": 2, "b": 3}), ("negate", {"a": "Calculator.add"}))
+    # One call to select, one to fill the inputs and one to repair just the add entry
+    assert len(llm.calls) == 3
+    assert agent.session().run(planned) == {"Calculator.add": 5, "Calculator.negate": -5}
@@ -0,0 +1,57 @@
+import pytest
+
+from AutoClass.prepared import PreparedPipeline
+
+from conftest import pipeline
+
+PLAN = pipeline(
+    ("add", {"a": 2, "b": 3}),
+    ("multiply", {"a": "Calculator.add", "b": 4}),
+    ("negate", {"a": "Calculator.multiply"}),
+)
+
+
+@pytest.fixture
+def prepared(agent):
+    return agent.compile_pipeline(PLAN, parameters={"x": "Calculator.add.a"})
+
+
+def test_slots_and_defaults(prepared):
+    assert prepared.order == ("Calculator.add", "Calculator.multiply", "Calculator.negate")
+    assert prepared.defaults() == {"x": 2, "Calculator.add.b": 3, "Calculator.multiply.b": 4}
+    assert prepared.steps["Calculator.multiply"]["inputs"]["a"] == ("ref", "Calculator.add")
+    with pytest.raises(AttributeError):
+        prepared.order = ()
+
+
+def test_binding_runs_without_llm(agent, calculator, prepared):
+    runner = prepared.bind(agent)
+    assert runner.run() == {"Calculator.add": 5, "Calculator.multiply": 20, "Calculator.negate": -20}
+    assert runner.run(x=7)["Calculator.negate"] == -40
+    assert runner.run({"Calculator.multiply.b": 1}, x=0)["Calculator.negate"] == -3
+    with pytest.raises(KeyError, match="Unknown parameter slot"):
+        runner.run(y=1)
+    assert calculator.calls["add"] == 3
+    assert agent.pipeline is None
+
+
+def test_json_round_trip(agent, prepared):
+    restored = PreparedPipeline.from_json(prepared.to_json())
+    assert restored.to_dict() == prepared.to_dict()
+    assert restored.bind(agent).run(x=1)["Calculator.negate"] == -16
+
+
+def test_compile_errors(agent):
+    with pytest.raises(ValueError, match="Unknown parameter paths"):
+        agent.compile_pipeline(PLAN, parameters={"x": "Calculator.add.c"})
+    with pytest.raises(ValueError, match="can't be compiled"):
+        agent.compile_pipeline(pipeline(("negate", {"a": "Calculator.missing"})))
+    with pytest.raises(ValueError, match="prepared pipeline version"):
+        PreparedPipeline.from_dict({"version": -1})
+
+
+def test_bind_needs_registered_classes(agent):
+    prepared = agent.compile_pipeline(PLAN)
+    agent.registered_class = {}
+    with pytest.raises(ValueError, match="not registered"):
+        prepared.bind(agent)
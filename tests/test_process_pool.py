@@ -0,0 +1,71 @@
+import asyncio
+import os
+
+import pytest
+
+from AutoClass.Agent import Agent
+from AutoClass.llm import ScriptedLLM
+
+from conftest import Calculator, pipeline
+
+
+class Worker:
+    def pid(self):
+        '''
+        - Description: Returns the id of the process running the method.
+        :return: Process id :rtype: int
+        '''
+        return os.getpid()
+
+    def square(self, a):
+        '''
+        - Description: Squares a number.
+        - List of parameters:
+            - param a: Number :type: int
+        :return: a * a :rtype: int :execution: process
+        '''
+        return a * a
+
+
+@pytest.fixture
+def process_agent():
+    agent = Agent(llm=ScriptedLLM(), process_workers=2)
+    yield agent
+    agent.shutdown()
+
+
+def test_policies(process_agent):
+    process_agent.register_class(Worker())
+    assert process_agent.execution_policies == {"Worker.pid": "thread", "Worker.square": "process"}
+    process_agent.register_class(Worker(), execution={"pid": "process", "square": "thread"})
+    assert process_agent.execution_policies == {"Worker.pid": "process", "Worker.square": "thread"}
+    with pytest.raises(ValueError, match="Unknown execution policy"):
+        process_agent.register_class(Worker(), execution="fiber")
+
+
+def test_process_steps_run_in_workers(process_agent):
+    calculator = Calculator()
+    process_agent.register_class(calculator, execution="process")
+    process_agent.register_class(Worker(), execution="process")
+    plan = {"classes": [
+        {"class_name": "Worker", "methods": [{"method": "pid", "inputs": {}}]},
+        *pipeline(("add", {"a": 2, "b": 3}), ("multiply", {"a": "Calculator.add", "b": 4}))["classes"],
+    ]}
+    results = process_agent.run_pipeline_with_dependencies(plan)
+    assert results["Worker.pid"] != os.getpid()
+    assert results["Calculator.multiply"] == 20
+    # Workers hold their own copy of the instance
+    assert calculator.calls == {}
+    results = asyncio.run(process_agent.arun_pipeline_with_dependencies(plan))
+    assert results["Worker.pid"] != os.getpid() and results["Calculator.multiply"] == 20
+
+
+def test_re_registration_restarts_workers(process_agent):
+    calculator = Calculator()
+    process_agent.register_class(calculator, execution="process")
+    plan = pipeline(("add", {"a": 1, "b": 2}))
+    assert process_agent.run_pipeline_with_dependencies(plan) == {"Calculator.add": 3}
+    calculator.fail.add("add")
+    process_agent.register_class(calculator, execution="process")
+    with pytest.raises(ValueError, match="add failed"):
+        process_agent.process_runner.submit("Calculator", "add", {"a": 1, "b": 2}).result()
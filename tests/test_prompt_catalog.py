@@ -0,0 +1,94 @@
+import logging
+
+import pytest
+
+from AutoClass.Agent import Agent
+from AutoClass.llm import ScriptedLLM
+from AutoClass.prompt_catalog import PromptCatalog
+
+from conftest import Calculator
+
+
+class Weather:
+    """
+    Looks up weather forecasts.
+    """
+
+    def forecast(self, city):
+        '''
+        - Description: Returns the weather forecast for a city.
+        - List of parameters:
+            - param city: City name :type: str
+        :return: Forecast text :rtype: str
+        '''
+        return f"Sunny in {city}"
+
+
+@pytest.fixture
+def catalog(agent):
+    return agent.prompt_catalog
+
+
+def test_fragments_follow_registration(agent, catalog):
+    assert catalog.keys() == ["Calculator.add", "Calculator.multiply", "Calculator.negate"]
+    assert catalog.render_selection().splitlines()[0] == (
+        "Class: Calculator — Method: add — Description: Adds two numbers."
+    )
+    # Re-registering replaces the class instead of duplicating it
+    agent.register_class(Calculator())
+    assert len(catalog.keys()) == 3
+
+
+def test_keys_restrict_and_order(catalog):
+    text = catalog.render_selection(["Calculator.negate", "Calculator.add", "Calculator.unknown"])
+    assert [line.split(" — ")[1] for line in text.splitlines()] == ["Method: negate", "Method: add"]
+
+
+def test_compact_groups_signatures(catalog):
+    assert catalog.render_plan(compact=True).splitlines() == [
+        "Class: Calculator",
+        "  Inputs: a (int or float), b (int or float) | Output: int or float",
+        "    - add: Adds two numbers.",
+        "    - multiply: Multiplies two numbers.",
+        "  Inputs: a (int or float) | Output: int or float",
+        "    - negate: Negates a number.",
+    ]
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_budget_keeps_best_ranked(catalog, compact):
+    full = catalog.render_selection(compact=compact)
+    dropped = []
+    keys = ["Calculator.negate", "Calculator.multiply", "Calculator.add"]
+    budget = catalog.token_count(full) // 2
+    text = catalog.render_selection(keys, budget=budget, compact=compact, dropped=dropped)
+    assert "negate" in text and "add" not in text
+    assert dropped and dropped[-1] == "Calculator.add"
+    dropped = []
+    assert catalog.render_selection(keys, budget=10000, compact=compact, dropped=dropped) and dropped == []
+
+
+def test_token_counts_are_cached():
+    catalog = PromptCatalog()
+    assert catalog.token_count("") == 0
+    assert catalog.token_count("add two numbers") == catalog.token_count("add two numbers") > 0
+
+
+def test_budget_ranks_whole_catalog_by_query(caplog):
+    agent = Agent(llm=ScriptedLLM(), prompt_token_budget=40)
+    agent.register_class(Calculator())
+    agent.register_class(Weather())
+    keys = agent._catalog_keys("weather forecast for Paris")
+    assert keys[0] == "Weather.forecast" and len(keys) == 4
+    # Without a budget the prompt keeps registration order
+    agent.prompt_token_budget = None
+    assert agent._catalog_keys("weather forecast for Paris") is None
+
+    agent.prompt_token_budget = 40
+    pytest.importorskip("langchain_core")
+    with caplog.at_level(logging.WARNING, logger="AutoClass"):
+        message = agent._choose_class_method_message("weather forecast for Paris")
+    assert "Weather" in message.content
+    assert "left out" in caplog.text
+    counters = {name: value for (name, _), value in agent.instrumentation.counters.items()}
+    assert counters["autoclass_prompt_methods_dropped_total"] > 0
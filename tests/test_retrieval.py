@@ -0,0 +1,84 @@
+from AutoClass.Agent import Agent
+from AutoClass.llm import ScriptedLLM
+from AutoClass.retrieval import MethodIndex, tokenize
+
+
+def test_tokenize():
+    assert tokenize("countWords in the text_value") == ["count", "words", "text", "value"]
+    assert tokenize(None) == []
+
+
+def index():
+    index = MethodIndex()
+    index.add("Text.count_words", "Text", "count_words", "Counts the words of a text", "text")
+    index.add("Text.reverse", "Text", "reverse", "Reverses a text", "text")
+    index.add("Math.add", "Math", "add", "Adds two numbers", "a b")
+    return index
+
+
+def test_search_ranks_and_thresholds():
+    hits = index().search("how many words are in this text?", k=3)
+    assert hits[0] == ("Text.count_words", 1.0)
+    assert [key for key, _ in hits] == ["Text.count_words", "Text.reverse"]
+    assert index().search("how many words are in this text?", k=3, threshold=0.99) == [("Text.count_words", 1.0)]
+    assert index().search("add numbers", k=1) == [("Math.add", 1.0)]
+    assert index().search("5 * 2") == []
+
+
+def test_remove_and_re_add():
+    methods = index()
+    methods.remove("Math.add")
+    assert methods.search("add numbers") == []
+    methods.add("Text.reverse", "Text", "reverse", "Mirrors characters")
+    assert [key for key, _ in methods.search("mirrors")] == ["Text.reverse"]
+    assert methods.search("reverses") == []
+    methods.remove_prefix("Text.")
+    assert len(methods) == 0 and methods.total_length == 0 and not methods.postings
+
+
+class Text:
+    def count_words(self, text):
+        '''
+        - Description: Counts the words of a text.
+        - List of parameters:
+            - param text: Input text :type: str
+        :return: Number of words :rtype: int
+        '''
+        return len(text.split())
+
+    def reverse(self, text):
+        '''
+        - Description: Reverses a text.
+        - List of parameters:
+            - param text: Input text :type: str
+        :return: Reversed text :rtype: str
+        '''
+        return text[::-1]
+
+
+class SmallText:
+    def shout(self, text):
+        '''
+        - Description: Upper-cases a text.
+        - List of parameters:
+            - param text: Input text :type: str
+        :return: Upper-cased text :rtype: str
+        '''
+        return text.upper()
+
+
+def test_shortlist_follows_registration(agent):
+    agent.shortlist_k = 2
+    agent.register_class(Text())
+    assert agent.shortlist_methods("count the words of a text") == ["Text.count_words", "Text.reverse"]
+    assert agent.shortlist_methods("5 * 2") is None
+    # Re-registering under the same name drops the methods the new class doesn't have
+    agent.register_class(SmallText(), alias="Text")
+    assert agent.shortlist_methods("count the words of a text") == ["Text.shout"]
+    assert not any(key.startswith("Text.") and key != "Text.shout" for key in agent.method_index.docs)
+
+
+def test_shortlist_off_by_default():
+    agent = Agent(llm=ScriptedLLM())
+    agent.register_class(Text())
+    assert agent.shortlist_methods("count the words") is None
@@ -0,0 +1,121 @@
+import asyncio
+import time
+
+import pytest
+
+from AutoClass.scheduler import DependencyGraph, PipelineScheduler
+
+from conftest import MODES, arithmetic, run, statuses, step
+
+
+def test_graph_order_and_dependencies():
+    graph = DependencyGraph([step("A.c", x="A.b"), step("A.b", x="A.a"), step("A.a", x=1)])
+    assert graph.order == ["A.a", "A.b", "A.c"]
+    assert graph.dependencies["A.c"] == {"A.b"}
+    assert graph.dependents["A.a"] == {"A.b"}
+    assert not graph.cycles and not graph.missing
+
+
+def test_graph_references_nested_and_context():
+    graph = DependencyGraph(
+        [step("A.a", x=1), step("A.b", x=["A.a", {"y": "A.a"}], z="Ctx.value"), step("A.c", x="A.missing")],
+        context={"Ctx.value": 3}, known_classes=["A"]
+    )
+    assert graph.dependencies["A.b"] == {"A.a"}
+    assert graph.missing == {"A.c": ["A.missing"]}
+    assert graph.blocked() == {"A.c"}
+
+
+def test_graph_detects_cycles():
+    graph = DependencyGraph([step("A.a", x="A.b"), step("A.b", x="A.a"), step("A.c", x="A.b"), step("A.d", x=1)])
+    assert len(graph.cycles) == 1 and sorted(graph.cycles[0]) == ["A.a", "A.b"]
+    assert graph.blocked() == {"A.a", "A.b", "A.c"}
+    assert graph.order == ["A.d"]
+
+
+@pytest.mark.parametrize("mode", MODES)
+@pytest.mark.parametrize("workers", [1, 4])
+def test_runs_in_dependency_order(mode, workers):
+    graph = DependencyGraph([
+        step("A.a", x=1), step("A.b", x=2), step("A.c", x="A.a", y="A.b"), step("A.d", x="A.c", y=10)
+    ])
+    scheduler = PipelineScheduler(graph, max_workers=workers)
+    events = run(scheduler, arithmetic, mode)
+    keys = [event["key"] for event in events]
+    assert keys.index("A.c") > max(keys.index("A.a"), keys.index("A.b"))
+    assert keys[-1] == "A.d"
+    assert scheduler.results == {"A.a": 1, "A.b": 2, "A.c": 3, "A.d": 13}
+    assert set(statuses(events).values()) == {"ok"}
+
+
+@pytest.mark.parametrize("mode", MODES)
+def test_independent_steps_overlap(mode):
+    graph = DependencyGraph([step(f"A.slow{i}") for i in range(4)])
+
+    def invoke(step, inputs):
+        time.sleep(0.2)
+        return step["method_name"]
+
+    started = time.perf_counter()
+    run(PipelineScheduler(graph, max_workers=4), invoke, mode)
+    assert time.perf_counter() - started < 0.6
+
+
+@pytest.mark.parametrize("mode", MODES)
+def test_cycle_is_skipped_as_blocked(mode):
+    graph = DependencyGraph([step("A.a", x="A.b"), step("A.b", x="A.a"), step("A.c", x="A.a"), step("A.d", x=4)])
+    scheduler = PipelineScheduler(graph, max_workers=2)
+    events = run(scheduler, arithmetic, mode)
+    assert statuses(events) == {"A.a": "skipped", "A.b": "skipped", "A.c": "skipped", "A.d": "ok"}
+    assert {event["cause"] for event in events if event["status"] == "skipped"} == {"blocked"}
+    assert scheduler.results == {"A.d": 4}
+
+
+@pytest.mark.parametrize("mode", MODES)
+@pytest.mark.parametrize("workers", [1, 4])
+def test_failure_skips_dependents(mode, workers):
+    graph = DependencyGraph([
+        step("A.fail", x=1), step("A.b", x="A.fail"), step("A.c", x="A.b"), step("A.d", x=2)
+    ])
+    scheduler = PipelineScheduler(graph, max_workers=workers)
+    events = run(scheduler, arithmetic, mode)
+    assert statuses(events) == {"A.fail": "error", "A.b": "skipped", "A.c": "skipped", "A.d": "ok"}
+    assert scheduler.outcomes["A.b"]["cause"] == "A.fail"
+    assert scheduler.outcomes["A.c"]["cause"] == "A.fail"
+    assert isinstance(scheduler.failed["A.fail"], ValueError)
+    # Dependents are reported as soon as the failure is known, not at the end of the run
+    keys = [event["key"] for event in events]
+    assert keys.index("A.b") == keys.index("A.fail") + 1
+
+
+def test_async_dependents_skipped_before_other_steps_finish():
+    graph = DependencyGraph([step("A.fail", x=1), step("A.b", x="A.fail"), step("A.d", x=2)])
+    scheduler = PipelineScheduler(graph, max_workers=4)
+
+    async def ainvoke(step, inputs):
+        if step["method_name"] == "fail":
+            raise ValueError("boom")
+        await asyncio.sleep(0)
+        return 1
+
+    async def collect():
+        return [event["key"] async for event in scheduler.aiter_run(ainvoke, {})]
+
+    assert asyncio.run(collect()) == ["A.fail", "A.b", "A.d"]
+
+
+@pytest.mark.parametrize("mode", MODES)
+def test_completed_and_skip(mode):
+    graph = DependencyGraph([step("A.a", x=1), step("A.b", x="A.a"), step("A.c", x=3), step("A.d", x="A.c")])
+    scheduler = PipelineScheduler(graph, max_workers=2)
+    if mode == "sync":
+        events = list(scheduler.iter_run(arithmetic, {}, completed={"A.a": 5}, skip=["A.c"]))
+    else:
+        async def ainvoke(step, inputs):
+            return arithmetic(step, inputs)
+
+        async def collect():
+            return [e async for e in scheduler.aiter_run(ainvoke, {}, completed={"A.a": 5}, skip=["A.c"])]
+        events = asyncio.run(collect())
+    assert statuses(events) == {"A.b": "ok", "A.d": "skipped"}
+    assert scheduler.results["A.b"] == 5
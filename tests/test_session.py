@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+
+from conftest import pipeline
+
+PLAN = pipeline(
+    ("add", {"a": 2, "b": 3}),
+    ("multiply", {"a": "Calculator.add", "b": 4}),
+    ("negate", {"a": "Calculator.multiply"}),
+)
+
+
+def test_dirty_after_run(agent):
+    session = agent.session()
+    session.run(PLAN)
+    assert session.dirty(PLAN) == set()
+    assert session.dirty(session.edit({"Calculator.multiply": {"b": 5}})) == {
+        "Calculator.multiply", "Calculator.negate"
+    }
+    assert session.dirty(session.edit({"Calculator.add": {"a": 1}})) == {
+        "Calculator.add", "Calculator.multiply", "Calculator.negate"
+    }
+    assert session.dirty(session.edit({"Calculator.negate": {"a": 7}})) == {"Calculator.negate"}
+
+
+def test_dirty_includes_new_and_failed_steps(agent, calculator):
+    session = agent.session()
+    calculator.fail.add("multiply")
+    session.run(PLAN)
+    # The failed step and the step skipped after it run again even though the plan didn't change
+    assert session.dirty(PLAN) == {"Calculator.multiply", "Calculator.negate"}
+    calculator.fail.clear()
+    session.run(pipeline(("add", {"a": 2, "b": 3})))
+    assert session.dirty(PLAN) == {"Calculator.multiply", "Calculator.negate"}
+
+
+def test_rerun_executes_only_dirty_steps(agent, calculator):
+    session = agent.session()
+    session.run(PLAN)
+    results = session.rerun({"Calculator.multiply": {"b": 10}})
+    assert results == {"Calculator.add": 5, "Calculator.multiply": 50, "Calculator.negate": -50}
+    assert calculator.calls == {"add": 1, "multiply": 2, "negate": 2}
+    assert set(session.outcomes) == set(results)
+    # Nothing changed since the last rerun
+    session.rerun()
+    assert calculator.calls == {"add": 1, "multiply": 2, "negate": 2}
+
+
+def test_rerun_after_failure(agent, calculator):
+    session = agent.session()
+    calculator.fail.add("multiply")
+    session.run(PLAN)
+    calculator.fail.clear()
+    assert session.rerun()["Calculator.negate"] == -20
+    assert calculator.calls == {"add": 1, "multiply": 2, "negate": 1}
+
+
+def test_arerun(agent, calculator):
+    session = agent.session()
+    session.run(PLAN)
+    results = asyncio.run(session.arerun({"Calculator.add": {"b": 0}}))
+    assert results["Calculator.negate"] == -8
+    assert calculator.calls == {"add": 2, "multiply": 2, "negate": 2}
+
+
+def test_rerun_errors(agent):
+    session = agent.session()
+    with pytest.raises(ValueError):
+        session.rerun()
+    session.run(PLAN)
+    with pytest.raises(KeyError):
+        session.edit({"Calculator.divide": {"a": 1}})
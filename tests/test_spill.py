@@ -0,0 +1,93 @@
+import gc
+import os
+import pickle
+
+import pytest
+
+from AutoClass.Agent import Agent
+from AutoClass.journal import RunJournal
+from AutoClass.llm import ScriptedLLM
+from AutoClass.results import ArrayHandle, SpillStore, from_handles, to_handles
+
+np = pytest.importorskip("numpy")
+
+
+class Arrays:
+    def ones(self, n):
+        '''
+        - Description: Returns an array of n ones.
+        - List of parameters:
+            - param n: Length :type: int
+        :return: Array of ones :rtype: ndarray
+        '''
+        return np.ones(n)
+
+    def total(self, values):
+        '''
+        - Description: Sums an array.
+        - List of parameters:
+            - param values: Array :type: ndarray
+        :return: Sum :rtype: float
+        '''
+        return float(values.sum())
+
+
+PLAN = {"classes": [{"class_name": "Arrays", "methods": [
+    {"method": "ones", "inputs": {"n": 1000}},
+    {"method": "total", "inputs": {"values": "Arrays.ones"}},
+]}]}
+
+
+def test_spill_threshold(tmp_path):
+    store = SpillStore(threshold=1000, directory=str(tmp_path))
+    small = np.ones(10)
+    assert store.spill(small) is small
+    spilled = store.spill(np.arange(1000.0))
+    assert isinstance(spilled, np.memmap) and not spilled.flags.writeable
+    assert spilled[999] == 999.0
+    path = spilled.filename
+    assert os.path.exists(path)
+    del spilled
+    gc.collect()
+    assert not os.path.exists(path)
+
+
+def test_handles_round_trip():
+    store = SpillStore(threshold=1)
+    spilled = store.spill(np.arange(12.0).reshape(3, 4))
+    inputs = to_handles({"values": spilled, "n": 3})
+    handle = pickle.loads(pickle.dumps(inputs["values"]))
+    assert isinstance(handle, ArrayHandle) and handle.shape == (3, 4) and inputs["n"] == 3
+    assert np.array_equal(from_handles({"values": handle})["values"], spilled)
+    directory = store.path()
+    store.cleanup()
+    assert not os.path.exists(directory)
+
+
+def test_spilled_outputs_reach_dependents():
+    agent = Agent(llm=ScriptedLLM(), spill_threshold=1000)
+    agent.register_class(Arrays())
+    results = agent.run_pipeline_with_dependencies(PLAN)
+    assert isinstance(results["Arrays.ones"], np.memmap) and results["Arrays.total"] == 1000.0
+    agent.shutdown()
+
+
+def test_journal_stores_a_handle_to_spilled_outputs(tmp_path):
+    agent = Agent(llm=ScriptedLLM(), spill_threshold=1000, journal=str(tmp_path / "runs.db"))
+    agent.register_class(Arrays())
+    session = agent.session("sum 1000 ones")
+    results = session.run(PLAN)
+    (blob,) = agent.journal._db.execute("SELECT output FROM steps WHERE key = 'Arrays.ones'").fetchone()
+    # Only the file reference is journaled, not the 8000 bytes of data
+    assert isinstance(pickle.loads(blob), ArrayHandle) and len(blob) < 1000
+    journaled = RunJournal(str(tmp_path / "runs.db")).completed(session.run_id)
+    assert np.array_equal(journaled["Arrays.ones"][1], np.ones(1000))
+
+    # Once the spill file is gone the step is recomputed on resume instead
+    path = results["Arrays.ones"].filename
+    del results, session
+    gc.collect()
+    assert not os.path.exists(path)
+    journal = RunJournal(str(tmp_path / "runs.db"))
+    assert "Arrays.ones" not in journal.completed(journal.runs()[0]["run_id"])
+    agent.shutdown()
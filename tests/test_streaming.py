@@ -0,0 +1,75 @@
+import asyncio
+
+import pytest
+
+from AutoClass.Agent import Agent
+from AutoClass.llm import ScriptedLLM
+from AutoClass.streaming import PlanStreamParser
+
+from conftest import Calculator, pipeline
+
+PLAN = pipeline(
+    ("add", {"a": 2, "b": 3}),
+    ("multiply", {"a": 4, "b": 5}),
+    ("negate", {"a": "Calculator.add"}),
+)
+
+
+def test_parser_picks_entries_as_they_close():
+    text = str(PLAN)
+    parser = PlanStreamParser()
+    found = []
+    for start in range(0, len(text), 7):
+        for class_name, entry in parser.feed(text[start:start + 7]):
+            found.append((class_name, entry["method"], start + 7 >= len(text)))
+    assert [(c, m) for c, m, _ in found] == [("Calculator", "add"), ("Calculator", "multiply"), ("Calculator", "negate")]
+    # The first entries are complete well before the plan is
+    assert not found[0][2]
+    assert parser.feed(text) == []
+
+
+def test_parser_ignores_braces_in_strings():
+    parser = PlanStreamParser()
+    found = parser.feed('{"classes": [{"class_name": "Text", "methods": [{"method": "echo", "inputs": {"text": "}{"}}')
+    assert found == [("Text", {"method": "echo", "inputs": {"text": "}{"}})]
+
+
+def test_iter_yields_one_event_per_step(agent, calculator):
+    calculator.fail.add("add")
+    events = list(agent.iter_pipeline_with_dependencies(PLAN))
+    outcomes = {event["key"]: event for event in events}
+    assert len(events) == 3
+    assert outcomes["Calculator.multiply"]["output"] == 20
+    assert outcomes["Calculator.add"]["status"] == "error"
+    assert outcomes["Calculator.negate"]["status"] == "skipped"
+    assert outcomes["Calculator.negate"]["cause"] == "Calculator.add"
+    assert all(event["duration"] >= 0 for event in events)
+
+
+def test_aiter_yields_one_event_per_step(agent):
+    async def collect():
+        return [event async for event in agent.aiter_pipeline_with_dependencies(PLAN)]
+
+    events = asyncio.run(collect())
+    assert {event["key"]: event["output"] for event in events} == {
+        "Calculator.add": 5, "Calculator.multiply": 20, "Calculator.negate": -5,
+    }
+    assert events[-1]["key"] == "Calculator.negate"
+
+
+def test_stream_pipeline_starts_steps_before_the_plan_is_complete():
+    pytest.importorskip("langchain_core")
+    agent = Agent(llm=ScriptedLLM([str(PLAN)], chunk_size=8))
+    agent.register_class(Calculator())
+    events = list(agent.stream_pipeline("negate 2 + 3 and multiply 4 by 5"))
+    kinds = [event["type"] for event in events]
+    plan_at = kinds.index("plan")
+    early = [event["key"] for event in events[:plan_at] if event["type"] == "step"]
+    assert "Calculator.negate" not in early
+    assert [event["key"] for event in events if event["type"] == "plan_step"] == [
+        "Calculator.add", "Calculator.multiply", "Calculator.negate",
+    ]
+    steps = {event["key"]: event for event in events if event["type"] == "step"}
+    assert len(steps) == 3 and steps["Calculator.negate"]["output"] == -5
+    assert events[plan_at]["pipeline"] == PLAN
+    agent.shutdown()
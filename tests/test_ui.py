@@ -0,0 +1,62 @@
+import pytest
+
+pytest.importorskip("streamlit")
+pytest.importorskip("streamlit_flow")
+
+from AutoClass.scheduler import DependencyGraph
+from AutoClass.ui import AgentUI, layered_layout, pipeline_steps
+
+from conftest import pipeline
+
+DIAMOND = pipeline(
+    ("add", {"a": 1, "b": 2}),
+    ("multiply", {"a": "Calculator.add", "b": 3}),
+    ("negate", {"a": "Calculator.add"}),
+)
+
+
+def test_layered_layout():
+    plan = {"classes": DIAMOND["classes"] + [{"class_name": "Sum", "methods": [
+        {"method": "total", "inputs": {"a": "Calculator.multiply", "b": "Calculator.negate", "c": "3.5"}},
+    ]}]}
+    layout = layered_layout(DependencyGraph(pipeline_steps(plan)))
+    assert layout == {
+        "Calculator.add": (0, 0), "Calculator.multiply": (1, 0), "Calculator.negate": (1, 1), "Sum.total": (2, 0),
+    }
+    cyclic = DependencyGraph([
+        {"class": "A", "method_name": "a", "inputs": {"x": "A.b"}},
+        {"class": "A", "method_name": "b", "inputs": {"x": "A.a"}},
+        {"class": "A", "method_name": "c", "inputs": {"x": 1}},
+    ])
+    assert layered_layout(cyclic) == {"A.a": (1, 0), "A.b": (1, 1), "A.c": (0, 0)}
+
+
+def test_layout_kept_until_structure_changes():
+    ui = AgentUI()
+    assert ui.set_pipeline(DIAMOND)
+    assert sorted(edge.id for edge in ui.edges) == ["Calculator.add->Calculator.multiply", "Calculator.add->Calculator.negate"]
+    for key in ui.status:
+        ui.update({"key": key, "status": "ok", "output": 1, "error": None, "duration": 0.0})
+    edited = pipeline(
+        ("add", {"a": 1, "b": 2}),
+        ("multiply", {"a": "Calculator.add", "b": 4}),
+        ("negate", {"a": "Calculator.add"}),
+    )
+    assert not ui.set_pipeline(edited)
+    assert ui.status == {"Calculator.add": "ok", "Calculator.multiply": "pending", "Calculator.negate": "ok"}
+    assert ui.set_pipeline(pipeline(("add", {"a": 1, "b": 2})))
+    assert ui.status == {"Calculator.add": "pending"}
+
+
+def test_events_update_only_their_node(agent, calculator):
+    ui = AgentUI()
+    ui.set_pipeline(DIAMOND)
+    nodes = dict(ui._nodes)
+    calculator.fail.add("multiply")
+    events = list(agent.iter_pipeline_with_dependencies(DIAMOND))
+    ui.update(events[0])
+    assert ui._nodes["Calculator.negate"] is nodes["Calculator.negate"]
+    assert ui._nodes["Calculator.add"] is not nodes["Calculator.add"]
+    ui.apply({event["key"]: event for event in events})
+    assert ui.counts() == {"ok": 2, "error": 1}
+    assert "multiply failed" in ui._content("Calculator.multiply")